@@ -0,0 +1,166 @@
+"""
+End-to-end capacity benchmark: how many robots can one core host?
+
+Spins up N Strategy instances against FakeExchange, each running trade_once in
+a tight loop for a fixed duration, and reports cycles/second, event loop lag,
+CPU and RSS for every N. Since CPU time per cycle is roughly independent of N,
+robots per core is estimated as ``cycle_interval / cpu_per_cycle`` where
+``cycle_interval`` is the pause between two cycles of a live robot (10s in
+Bot.start).
+
+    python -m benchmarks.bench_capacity --robots 1 10 50 100 --duration 10
+    python -m benchmarks.bench_capacity --loop uvloop
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import resource
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.bench_strategy import PARAMETERS
+from bot.exchanges.fake import FakeExchange
+from bot.lifecycle import EVENT_LOOPS, use_event_loop
+from bot.metrics import Metrics
+from bot.monitor import LoopLagMonitor
+from bot.strategy import Strategy
+
+
+def current_rss() -> int:
+    """
+    Resident set size of this process in bytes.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak rather than current RSS, but better than nothing (kB on linux,
+        # bytes on macOS)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+def make_robot(latency: float, jitter: float, seed: int) -> Strategy:
+    exchange = FakeExchange(latency=latency, jitter=jitter, seed=seed)
+    strategy = Strategy(exchange)
+    strategy.set_trading_context(
+        {
+            "pair": "ETHUSDT",
+            "target_currency": "USDT",
+            "market_type": "linear_perpetual",
+            "price_precision": exchange.price_precision("ETHUSDT"),
+            "price_tick": exchange.price_ticker("ETHUSDT"),
+            "qty_precision": exchange.qty_precision("ETHUSDT"),
+        }
+    )
+    strategy.parameters = dict(PARAMETERS, maxRw=100)
+    return strategy
+
+
+async def _robot_loop(strategy: Strategy, stop: asyncio.Event, counter: List[int]):
+    while not stop.is_set():
+        await strategy.trade_once()
+        counter[0] += 1
+        # Drain log messages as Bot.log_task would
+        while not strategy.log_queue.empty():
+            strategy.log_queue.get_nowait()
+
+
+async def run_scenario(
+    n: int, *, duration: float, latency: float, jitter: float
+) -> Dict[str, Any]:
+    robots = [make_robot(latency, jitter, seed=i) for i in range(n)]
+    stop = asyncio.Event()
+    counters = [[0] for _ in robots]
+    monitor = LoopLagMonitor(interval=0.01, window=100000, metrics=Metrics())
+
+    rss_before = current_rss()
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+
+    tasks = [
+        asyncio.create_task(_robot_loop(r, stop, c)) for r, c in zip(robots, counters)
+    ]
+    monitor.start()
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    await monitor.stop()
+
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+    cycles = sum(c[0] for c in counters)
+    lags = monitor.percentiles()
+    return {
+        "robots": n,
+        "cycles": cycles,
+        "wall_s": round(wall, 3),
+        "cycles_per_s": round(cycles / wall, 2),
+        "cpu_s": round(cpu, 3),
+        "cpu_utilization": round(cpu / wall, 3),
+        "cpu_ms_per_cycle": round(cpu / cycles * 1000, 3) if cycles else None,
+        "loop_lag_ms": {k: round(v * 1000, 3) for k, v in lags.items()},
+        "loop_blocked_count": monitor.blocked_count,
+        "rss_mb": round(current_rss() / 2**20, 1),
+        "rss_delta_mb": round((current_rss() - rss_before) / 2**20, 1),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Robots per core benchmark.")
+    parser.add_argument("--robots", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument(
+        "--latency", type=float, default=0.03, help="Exchange round trip (s)."
+    )
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument(
+        "--cycle-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between two cycles of a live robot.",
+    )
+    parser.add_argument("--loop", choices=EVENT_LOOPS, default="asyncio")
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args(argv)
+
+    print("Event loop: {}".format(use_event_loop(args.loop)))
+    results = []
+    for n in args.robots:
+        # trade_once and the strategy logging are noisy on stdout
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = asyncio.run(
+                run_scenario(
+                    n,
+                    duration=args.duration,
+                    latency=args.latency,
+                    jitter=args.jitter,
+                )
+            )
+        if result["cpu_ms_per_cycle"]:
+            result["est_robots_per_core"] = int(
+                args.cycle_interval * 1000 / result["cpu_ms_per_cycle"]
+            )
+        results.append(result)
+        print(
+            "robots={robots:<5} cycles/s={cycles_per_s:<9} cpu={cpu_utilization:<6} "
+            "cpu/cycle={cpu_ms_per_cycle}ms lag p50/p99/max={lag[p50]}/{lag[p99]}/"
+            "{lag[max]}ms rss={rss_mb}MB est_robots_per_core={est}".format(
+                lag=result["loop_lag_ms"],
+                est=result.get("est_robots_per_core"),
+                **result
+            )
+        )
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
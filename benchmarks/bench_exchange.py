@@ -0,0 +1,158 @@
+"""
+Compare the ccxt backed and the native Binance futures adapters.
+
+Both adapters run against the mock Binance server (bot.exchanges.mock_binance)
+started in a subprocess, so the CPU time measured here is only the client
+side: request building, signing, response parsing and unification. Import
+time and RSS are measured in a fresh interpreter per adapter.
+
+    python -m benchmarks.bench_exchange --calls 200
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import socket
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from bot.enums import OrderType
+from bot.exchanges.binance import Binance
+from bot.exchanges.binance_native import BinanceNative
+from bot.exchanges.mock_binance import point_to
+
+ADAPTERS = {
+    "ccxt": ("bot.exchanges.binance", Binance),
+    "native": ("bot.exchanges.binance_native", BinanceNative),
+}
+
+IMPORT_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "import_ms": round(elapsed * 1000, 1),
+    "max_rss_mb": round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1),
+    "modules": len(sys.modules),
+}}))
+"""
+
+
+def measure_import(module: str) -> Dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(module=module)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def calls(exchange) -> Dict[str, Callable]:
+    async def place_and_cancel():
+        await exchange.place_order(
+            pair="ETHUSDT", order_type=OrderType.limit, side=1, qty=0.01, price=100
+        )
+        await exchange.cancel_current_orders("ETHUSDT")
+
+    return {
+        "fetch_last_price": lambda: exchange.fetch_last_price("ETHUSDT"),
+        "fetch_order_book_ticker": lambda: exchange.fetch_order_book_ticker("ETHUSDT"),
+        "fetch_candles": lambda: exchange.fetch_candles("ETHUSDT", "5m"),
+        "fetch_position": lambda: exchange.fetch_position("ETHUSDT"),
+        "fetch_current_orders": lambda: exchange.fetch_current_orders("ETHUSDT"),
+        "place_order+cancel": place_and_cancel,
+    }
+
+
+async def run_adapter(name: str, base_url: str, n: int) -> Dict[str, Any]:
+    exchange = ADAPTERS[name][1]()
+    exchange.set_market_type("linear_perpetual")
+    exchange.auth({"api_key": "key", "secret": "secret"})
+    point_to(exchange, base_url)
+    await exchange.prepare()
+
+    results = {}
+    try:
+        for call_name, call in calls(exchange).items():
+            await call()  # warm up
+            cpu_before = time.process_time()
+            wall_before = time.perf_counter()
+            for _ in range(n):
+                await call()
+            results[call_name] = {
+                "cpu_us": round((time.process_time() - cpu_before) / n * 1e6, 1),
+                "wall_us": round((time.perf_counter() - wall_before) / n * 1e6, 1),
+            }
+    finally:
+        await exchange.close()
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="ccxt vs native Binance adapter.")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--adapters", nargs="+", default=list(ADAPTERS))
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args(argv)
+
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "bot.exchanges.mock_binance", "--port", str(port)],
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = "http://127.0.0.1:{}".format(port)
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+                break
+            except OSError:
+                time.sleep(0.05)
+
+        results: Dict[str, Any] = {}
+        for name in args.adapters:
+            results[name] = {
+                "import": measure_import(ADAPTERS[name][0]),
+                "calls": asyncio.run(run_adapter(name, base_url, args.calls)),
+            }
+    finally:
+        server.terminate()
+        server.wait()
+
+    names: List[str] = args.adapters
+    print("{:<36}".format("") + "".join("{:>20}".format(n) for n in names))
+    for key in ("import_ms", "max_rss_mb", "modules"):
+        print(
+            "{:<36}".format(key)
+            + "".join("{:>20}".format(results[n]["import"][key]) for n in names)
+        )
+    for call_name in results[names[0]]["calls"]:
+        print(
+            "{:<36}".format(call_name + " cpu/wall us")
+            + "".join(
+                "{:>20}".format(
+                    "{cpu_us}/{wall_us}".format(**results[n]["calls"][call_name])
+                )
+                for n in names
+            )
+        )
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Startup cost of a robot process: import time, RSS and loaded module count.
+
+Every scenario runs in a fresh interpreter. ``eager`` reproduces the former
+behaviour of bot.exchanges, which imported ccxt.async_support (and with it
+every exchange ccxt ships) as soon as the package was imported.
+
+    python -m benchmarks.bench_import --repeat 5
+"""
+
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+SCENARIOS = {
+    "baseline (python only)": "pass",
+    "eager: bot.strategy + ccxt": (
+        "import bot.strategy, ccxt.async_support\n"
+        "from bot.exchanges import exchange_factory\n"
+        "exchange_factory('binance')()"
+    ),
+    "lazy: bot.strategy": "import bot.strategy",
+    "lazy: bot.strategy + ccxt adapter": (
+        "import bot.strategy\n"
+        "from bot.exchanges import exchange_factory\n"
+        "exchange_factory('binance')()"
+    ),
+    "lazy: bot.strategy + native adapter": (
+        "import bot.strategy\n"
+        "from bot.exchanges import exchange_factory\n"
+        "exchange_factory('binance', native=True)()"
+    ),
+}
+
+SCRIPT = """
+import json, os, sys, time
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+with open("/proc/self/statm") as f:
+    rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+print(json.dumps({{"import_ms": elapsed * 1000, "rss_mb": rss / 2**20,
+                  "modules": len(sys.modules)}}))
+"""
+
+
+def run_scenario(code: str, repeat: int) -> Dict[str, Any]:
+    samples: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(code=code)],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(json.loads(output.splitlines()[-1]))
+    return {
+        "import_ms": round(statistics.median(s["import_ms"] for s in samples), 1),
+        "rss_mb": round(statistics.median(s["rss_mb"] for s in samples), 1),
+        "modules": samples[-1]["modules"],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Robot process startup cost.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, code in SCENARIOS.items():
+        result = results[name] = run_scenario(code, args.repeat)
+        print(
+            "{:<38} import={import_ms:>7}ms rss={rss_mb:>6}MB "
+            "modules={modules}".format(name, **result)
+        )
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
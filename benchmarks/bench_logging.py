@@ -0,0 +1,88 @@
+"""
+Per call cost of logging on the calling (event loop) thread.
+
+Compares the old setup, console and rotating file handlers attached directly
+to the logger, with the queue based setup from bot.log where the handlers run
+on a listener thread.
+
+    python -m benchmarks.bench_logging
+"""
+
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import tempfile
+
+from benchmarks.harness import case, main
+from bot.log import (
+    DEFAULT_LOGGING,
+    JsonFormatter,
+    LogQueueHandler,
+    RoutingQueueListener,
+)
+
+
+def _handlers(directory: str, formatter: logging.Formatter):
+    console = logging.StreamHandler(open(os.devnull, "w"))
+    file = logging.handlers.RotatingFileHandler(
+        os.path.join(directory, "bench.log"),
+        maxBytes=5 * 1024 * 1024,
+        backupCount=2,
+        encoding="utf-8",
+    )
+    for handler in (console, file):
+        handler.setFormatter(formatter)
+    return [console, file]
+
+
+def _logger(name: str, handlers) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    for handler in handlers:
+        logger.addHandler(handler)
+    return logger
+
+
+def build_cases(directory: str):
+    default = DEFAULT_LOGGING["formatters"]["default"]
+    formatter = logging.Formatter(default["format"], default["datefmt"])
+
+    direct = _logger("bench.direct", _handlers(directory, formatter))
+
+    listeners = []
+    queued = {}
+    for name, fmt in (("text", formatter), ("json", JsonFormatter())):
+        log_queue = queue.SimpleQueue()
+        listener = RoutingQueueListener(log_queue, {"bench": _handlers(directory, fmt)})
+        listener.start()
+        listeners.append(listener)
+        queued[name] = _logger(
+            "bench.queue.{}".format(name), [LogQueueHandler(log_queue)]
+        )
+
+    def log(logger):
+        return lambda: logger.info(
+            "Indicator {side: %d, rw: %.4f}", 1, 0.1234, extra={"robot": 3}
+        )
+
+    cases = [
+        case("logger.info[direct]", log(direct)),
+        case("logger.info[queue]", log(queued["text"])),
+        case("logger.info[queue,json]", log(queued["json"])),
+        case("logger.debug[disabled]", lambda: direct.log(5, "disabled %s", 1)),
+    ]
+    return cases, listeners
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        cases, listeners = build_cases(tmp)
+        try:
+            code = main("logging", cases)
+        finally:
+            for listener in listeners:
+                listener.stop()
+    sys.exit(code)
@@ -0,0 +1,118 @@
+"""
+Default asyncio event loop vs uvloop.
+
+Two workloads run under every loop:
+
+* cycles: N robots running trade_once against FakeExchange in a tight loop,
+  as in bench_capacity, reporting cycles/s and CPU per cycle;
+* websocket: a local aiohttp websocket server pushes timestamped messages in
+  bursts to bot.exchanges.hub.websocket_stream, reporting the latency from
+  send to parse and the message throughput.
+
+    python -m benchmarks.bench_loop --robots 50 --duration 5 --messages 20000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import pathlib
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+import aiohttp
+from aiohttp import web
+
+from benchmarks.bench_capacity import run_scenario
+from bot.exchanges.hub import websocket_stream
+from bot.lifecycle import use_event_loop
+
+
+async def websocket_latency(messages: int, burst: int) -> Dict[str, Any]:
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        for i in range(messages):
+            await ws.send_str(json.dumps({"i": i, "t": time.perf_counter()}))
+            if i % burst == burst - 1:
+                await asyncio.sleep(0.001)
+        await ws.close()
+        return ws
+
+    app = web.Application()
+    app.router.add_get("/ws", handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    url = "http://127.0.0.1:{}/ws".format(runner.addresses[0][1])
+
+    latencies: List[float] = []
+    cpu_before = time.process_time()
+    wall_before = time.perf_counter()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async for message in websocket_stream(session, url, lambda m: m):
+                latencies.append(time.perf_counter() - message["t"])
+    finally:
+        await runner.cleanup()
+    wall = time.perf_counter() - wall_before
+    cpu = time.process_time() - cpu_before
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "messages": n,
+        "messages_per_s": round(n / wall),
+        "cpu_us_per_message": round(cpu / n * 1e6, 2),
+        "latency_us": {
+            "p50": round(statistics.median(latencies) * 1e6, 1),
+            "p99": round(latencies[int(n * 0.99) - 1] * 1e6, 1),
+            "max": round(latencies[-1] * 1e6, 1),
+        },
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="asyncio vs uvloop.")
+    parser.add_argument("--loops", nargs="+", default=["asyncio", "uvloop"])
+    parser.add_argument("--robots", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Exchange round trip (s)."
+    )
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--burst", type=int, default=20)
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.loops:
+        use_event_loop(name)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            cycles = asyncio.run(
+                run_scenario(
+                    args.robots, duration=args.duration, latency=args.latency, jitter=0
+                )
+            )
+        websocket = asyncio.run(websocket_latency(args.messages, args.burst))
+        results[name] = {"cycles": cycles, "websocket": websocket}
+        print(
+            "{name:<8} cycles/s={c[cycles_per_s]:<9} cpu/cycle={c[cpu_ms_per_cycle]}ms "
+            "lag p99={c[loop_lag_ms][p99]}ms | ws msgs/s={w[messages_per_s]:<7} "
+            "cpu/msg={w[cpu_us_per_message]}us latency p50/p99/max="
+            "{w[latency_us][p50]}/{w[latency_us][p99]}/{w[latency_us][max]}us".format(
+                name=name, c=cycles, w=websocket
+            )
+        )
+    use_event_loop("asyncio")
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Simulated order matching (bot.exchanges.matching.OrderBook).
+
+Two workloads:
+
+* candles: a grid of resting buy/sell limits and stops around a random walk
+  of N candles; every filled order is placed again around the fill price,
+  as the strategy does with its fib, entry, TP and SL orders. Reports
+  candles/s and fills/s.
+* book size: insert, cancel and sweep cost against the number of resting
+  orders, next to a linear scan of the orders, to show they stay
+  logarithmic.
+
+    python -m benchmarks.bench_matching --candles 1000000 --grid 20
+"""
+
+import argparse
+import json
+import pathlib
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from bot.enums import OrderType
+from bot.exchanges.matching import OrderBook
+from bot.records import Order
+
+TICK = 0.01
+
+
+def random_walk(n: int, seed: int = 0) -> np.ndarray:
+    """
+    ``n`` rows of open, high, low, close rounded to the tick.
+    """
+    rng = np.random.default_rng(seed)
+    close = 350.0 * np.exp(np.cumsum(rng.normal(0, 0.001, n)))
+    open_ = np.concatenate(([350.0], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.0008, (2, n))) * close
+    high = np.maximum(open_, close) + spread[0]
+    low = np.minimum(open_, close) - spread[1]
+    return np.round(np.stack([open_, high, low, close], axis=1), 2)
+
+
+def grid_order(n: int, price: float, offset: int, side: int) -> Order:
+    # Limits below (buys) or above (sells) the price, stops on the other side
+    if n % 2:
+        order_type, ticks = OrderType.limit, -side * offset
+    else:
+        order_type, ticks = OrderType.trigger, side * offset
+    return Order(
+        "ETHUSDT",
+        order_type,
+        side,
+        1.0,
+        round(price + ticks * TICK, 2),
+        client_order_id=str(n),
+    )
+
+
+def bench_candles(candles: int, grid: int, seed: int) -> Dict[str, Any]:
+    rows = random_walk(candles, seed).tolist()
+    book = OrderBook(TICK)
+    rng = random.Random(seed)
+    ids = iter(range(10**12))
+    for _ in range(grid):
+        book.add(grid_order(next(ids), 350.0, rng.randint(5, 200), rng.choice((1, -1))))
+
+    fills = 0
+    started = time.perf_counter()
+    for open_, high, low, close in rows:
+        for fill in book.sweep_candle(open_, high, low, close):
+            fills += 1
+            book.add(
+                grid_order(
+                    next(ids),
+                    fill.price,
+                    rng.randint(5, 200),
+                    rng.choice((1, -1)),
+                )
+            )
+    elapsed = time.perf_counter() - started
+    return {
+        "candles": candles,
+        "grid": grid,
+        "fills": fills,
+        "seconds": round(elapsed, 3),
+        "candles_per_s": round(candles / elapsed),
+        "fills_per_s": round(fills / elapsed),
+    }
+
+
+def linear_sweep(orders: List[Order], price: float) -> List[Order]:
+    return [
+        o
+        for o in orders
+        if (o.order_type == OrderType.limit and (o.price - price) * o.side >= 0)
+        or (o.order_type == OrderType.trigger and (price - o.price) * o.side >= 0)
+    ]
+
+
+def bench_book_size(size: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    orders = [
+        grid_order(i, 350.0, rng.randint(1, 100000), rng.choice((1, -1)))
+        for i in range(size)
+    ]
+    book = OrderBook(TICK)
+    started = time.perf_counter()
+    for order in orders:
+        book.add(order)
+    insert_us = (time.perf_counter() - started) / size * 1e6
+
+    # Sweeps at the current price, crossing nothing
+    sweeps = 1000
+    started = time.perf_counter()
+    for _ in range(sweeps):
+        for _ in book.match(350.0, 350.0):
+            pass
+    sweep_us = (time.perf_counter() - started) / sweeps * 1e6
+
+    linear_us = None
+    if size <= 100000:
+        resting = list(book.orders())
+        started = time.perf_counter()
+        for _ in range(10):
+            linear_sweep(resting, 350.0)
+        linear_us = round((time.perf_counter() - started) / 10 * 1e6, 2)
+
+    started = time.perf_counter()
+    for order in orders:
+        book.cancel(order.client_order_id)
+    cancel_us = (time.perf_counter() - started) / size * 1e6
+    return {
+        "orders": size,
+        "insert_us": round(insert_us, 3),
+        "cancel_us": round(cancel_us, 3),
+        "sweep_us": round(sweep_us, 3),
+        "linear_sweep_us": linear_us,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Simulated order matching.")
+    parser.add_argument("--candles", type=int, default=1000000)
+    parser.add_argument("--grid", type=int, default=20)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 10000, 1000000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args(argv)
+
+    result = bench_candles(args.candles, args.grid, args.seed)
+    print(
+        "candles={candles} grid={grid} fills={fills} in {seconds}s: "
+        "{candles_per_s} candles/s, {fills_per_s} fills/s".format(**result)
+    )
+    sizes = []
+    for size in args.sizes:
+        sizes.append(bench_book_size(size, args.seed))
+        print(
+            "orders={orders:<8} insert={insert_us}us cancel={cancel_us}us "
+            "sweep={sweep_us}us linear sweep={linear}".format(
+                linear="{}us".format(sizes[-1]["linear_sweep_us"] or "-"), **sizes[-1]
+            )
+        )
+
+    if args.output:
+        pathlib.Path(args.output).write_text(
+            json.dumps({"candles": result, "sizes": sizes}, indent=2)
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
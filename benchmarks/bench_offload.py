@@ -0,0 +1,118 @@
+"""
+Event loop lag while computing indicators inline vs on a worker pool.
+
+N robots share one loop, each computing the trend indicator of its own pair
+in a tight loop (no caching), on candle series of growing length so the cost
+of one computation grows. For every executor ("none", "thread", "process")
+the loop lag percentiles are reported with the computation throughput:
+inline, the lag grows with the indicator cost; offloaded, it stays flat.
+
+    python -m benchmarks.bench_offload --candles 1000 10000 100000 --duration 3
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import random
+import sys
+import time
+from typing import Any, Dict
+
+from bot.indicators import IndicatorService, indicator_spec
+from bot.metrics import Metrics
+from bot.monitor import LoopLagMonitor
+from bot.records import Candles
+
+TREND = indicator_spec("trend")
+
+
+class CandleSource:
+    """
+    Stands for an exchange, serving a prebuilt series of ``size`` candles.
+    """
+
+    code = "bench"
+
+    def __init__(self, size: int, seed: int = 0):
+        rng = random.Random(seed)
+        price = 350.0
+        rows = []
+        for i in range(size):
+            price *= 1 + rng.gauss(0, 0.002)
+            rows.append([i * 60000, price, price, price, price, 1.0])
+        self.candles = Candles.from_ohlcv(rows)
+
+    async def fetch_candles(self, pair: str, period: str) -> Candles:
+        return self.candles
+
+
+async def run_scenario(
+    executor: str, size: int, robots: int, duration: float, workers: int
+) -> Dict[str, Any]:
+    service = IndicatorService(ttl=0)
+    service.configure(
+        {"executor": executor, "workers": workers, "offloadThreshold": 0.001}
+    )
+    source = CandleSource(size)
+    monitor = LoopLagMonitor(interval=0.005, threshold=10, metrics=Metrics())
+    monitor.start()
+    computations = 0
+
+    async def robot(i: int):
+        nonlocal computations
+        key = service.subscribe(source, "PAIR{}".format(i), "1m", TREND)
+        while True:
+            await service.get(source, key)
+            computations += 1
+            # A robot does other things between two indicator computations
+            await asyncio.sleep(0)
+
+    tasks = [asyncio.ensure_future(robot(i)) for i in range(robots)]
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - started
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    lags = monitor.percentiles()
+    await monitor.stop()
+    service.shutdown()
+    return {
+        "computations_per_s": round(computations / elapsed, 1),
+        "offloaded": service.offload_count,
+        "loop_lag_ms": {k: round(v * 1000, 2) for k, v in lags.items()},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Indicator offloading.")
+    parser.add_argument("--executors", nargs="+", default=["none", "thread", "process"])
+    parser.add_argument("--candles", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--robots", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Dict[int, Any]] = {}
+    for executor in args.executors:
+        for size in args.candles:
+            result = asyncio.run(
+                run_scenario(executor, size, args.robots, args.duration, args.workers)
+            )
+            results.setdefault(executor, {})[size] = result
+            print(
+                "{executor:<8} candles={size:<7} computations/s={r[computations_per_s]:<8} "
+                "lag p50/p99/max={l[p50]}/{l[p99]}/{l[max]}ms".format(
+                    executor=executor, size=size, r=result, l=result["loop_lag_ms"]
+                )
+            )
+
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(results, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Benchmarks for the Strategy hot paths.
+
+    python -m benchmarks.bench_strategy                    # compare with baseline
+    python -m benchmarks.bench_strategy --output out.json  # keep raw results
+    python -m benchmarks.bench_strategy --update-baseline
+"""
+
+import random
+import sys
+
+import pandas as pd
+
+from benchmarks.harness import case, main
+from bot.enums import Side
+from bot.exchanges.binance import Binance
+from bot.exchanges.fake import FakeExchange
+from bot.indicators import _cal_indicator
+from bot.records import Position
+from bot.strategy import Strategy
+from bot.utils.math import cal_ewm, fib
+
+PARAMETERS = {
+    "openPosPercent": 0.01,
+    "longAdditionDistance": 0.05,
+    "shortAdditionDistance": 0.05,
+    "maxLeverage": 3,
+    "longTakeProfitDistance": 0.5,
+    "shortTakeProfitDistance": 0.5,
+    "longStopLossDistance": 10,
+    "shortStopLossDistance": 10,
+    "maxRw": 0.5,
+    "maxOpenPosCount": 10,
+    "trendFollowing": True,
+    "allowLong": True,
+    "allowShort": True,
+    "candlePeriod": "5m",
+    "restInterval": 0,
+}
+
+POSITION = {
+    "qty": 1.5,
+    "side": Side.long,
+    "liq_price": 300.0,
+    "avg_price": 359.1,
+    "unrealized_pnl": 0.0,
+}
+
+RAW_POSITION = {
+    "symbol": "ETHUSDT",
+    "positionAmt": "-1.500",
+    "entryPrice": "349.10000",
+    "markPrice": "350.12000000",
+    "unRealizedProfit": "-1.53000000",
+    "liquidationPrice": "999.99",
+    "leverage": "20",
+    "maxNotionalValue": "250000",
+    "marginType": "cross",
+    "isolatedMargin": "0.00000000",
+    "isAutoAddMargin": "false",
+    "positionSide": "BOTH",
+}
+
+RAW_TRIGGER_ORDER = {
+    "id": "8389765493837034219",
+    "clientOrderId": "x-xcKtGhcu2e5b1fa6d7a94b3a8b0a45",
+    "timestamp": None,
+    "datetime": None,
+    "lastTradeTimestamp": None,
+    "symbol": "ETH/USDT",
+    "type": "stop_market",
+    "side": "sell",
+    "price": None,
+    "amount": 1.5,
+    "info": {"stopPrice": "349.10", "updateTime": 1604400000000},
+}
+
+
+def make_strategy(exchange=None, position=None) -> Strategy:
+    strategy = Strategy(exchange or FakeExchange(seed=1))
+    strategy.set_trading_context(
+        {
+            "pair": "ETHUSDT",
+            "target_currency": "USDT",
+            "market_type": "linear_perpetual",
+            "price_precision": 2,
+            "price_tick": 0.01,
+            "qty_precision": 3,
+        }
+    )
+    strategy.parameters = PARAMETERS
+    strategy._balance = 10000
+    strategy._position = Position(pair="ETHUSDT", **(position or POSITION))
+    strategy.sync_store(last_price=350)
+    return strategy
+
+
+def make_prices(n: int = 201) -> pd.Series:
+    rng = random.Random(7)
+    price = 350.0
+    prices = []
+    for _ in range(n):
+        price *= 1 + rng.gauss(0, 0.001)
+        prices.append(price)
+    return pd.Series(prices)
+
+
+def ensure_order_case(matched: bool, snapshot: bool = True):
+    exchange = FakeExchange(seed=1)
+    exchange.set_position(POSITION)
+    strategy = make_strategy(exchange)
+
+    async def run():
+        if not matched:
+            exchange._orders.clear()
+        if snapshot:
+            strategy.orders.invalidate()
+        await strategy.ensure_order()
+
+    # Seed the fake exchange with the expected TP/SL orders
+    exchange._orders.extend(
+        [strategy.get_take_profit_order(), strategy.get_stop_loss_order()]
+    )
+    return run
+
+
+def build_cases():
+    prices = make_prices()
+    strategy = make_strategy()
+    flat_strategy = make_strategy(
+        position={"qty": 0.0, "side": 0, "liq_price": 0.0, "avg_price": 0.0}
+    )
+
+    return [
+        case("cal_ewm[201]", lambda: cal_ewm(prices, span=14)),
+        case("_cal_indicator[201]", lambda: _cal_indicator(prices)),
+        case("fib[1..8]", lambda: [fib(n) for n in range(1, 9)]),
+        case("sync_store[linear]", lambda: strategy.sync_store(last_price=350)),
+        case(
+            "prepare_open_pos_orders",
+            lambda: flat_strategy.prepare_open_pos_orders(side=1, base_price=350),
+        ),
+        case(
+            "prepare_add_pos_orders",
+            lambda: strategy.prepare_add_pos_orders(side=1, base_price=350),
+        ),
+        case("ensure_order[matched]", ensure_order_case(matched=True), is_async=True),
+        case("ensure_order[empty]", ensure_order_case(matched=False), is_async=True),
+        case(
+            "ensure_order[tracked]",
+            ensure_order_case(matched=True, snapshot=False),
+            is_async=True,
+        ),
+        case("Binance.parse_position", lambda: Binance.parse_position(RAW_POSITION)),
+        case(
+            "Binance._adapt_ccxt_trigger_order",
+            lambda: Binance._adapt_ccxt_trigger_order(
+                RAW_TRIGGER_ORDER, pair="ETHUSDT"
+            ),
+        ),
+    ]
+
+
+if __name__ == "__main__":
+    sys.exit(main("strategy", build_cases()))
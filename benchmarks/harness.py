@@ -0,0 +1,179 @@
+"""
+Minimal benchmark harness: time callables, dump JSON results and compare them
+against a stored baseline.
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import platform
+import statistics
+import sys
+import time
+from collections import namedtuple
+from typing import Any, Callable, Dict, List, Optional
+
+Case = namedtuple("Case", ["name", "func", "is_async"])
+Result = namedtuple("Result", ["name", "min_ns", "median_ns", "number", "repeat"])
+
+BASELINE_DIR = pathlib.Path(__file__).parent / "baselines"
+
+
+def case(name: str, func: Callable, is_async: bool = False) -> Case:
+    return Case(name=name, func=func, is_async=is_async)
+
+
+def _calibrate(run: Callable[[int], float], target: float) -> int:
+    number = 1
+    while True:
+        elapsed = run(number)
+        if elapsed >= target:
+            return number
+        number *= 10 if elapsed < target / 10 else 2
+
+
+def measure(c: Case, *, repeat: int = 5, target: float = 0.2) -> Result:
+    if c.is_async:
+        loop = asyncio.new_event_loop()
+
+        async def _many(number):
+            func = c.func
+            start = time.perf_counter()
+            for _ in range(number):
+                await func()
+            return time.perf_counter() - start
+
+        def run(number):
+            return loop.run_until_complete(_many(number))
+
+    else:
+
+        def run(number):
+            func = c.func
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            return time.perf_counter() - start
+
+    try:
+        number = _calibrate(run, target)
+        timings = [run(number) / number * 1e9 for _ in range(repeat)]
+    finally:
+        if c.is_async:
+            loop.close()
+
+    return Result(
+        name=c.name,
+        min_ns=min(timings),
+        median_ns=statistics.median(timings),
+        number=number,
+        repeat=repeat,
+    )
+
+
+def to_json(results: List[Result]) -> Dict[str, Any]:
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "created": int(time.time()),
+        },
+        "benchmarks": {
+            r.name: {
+                "min_ns": round(r.min_ns, 1),
+                "median_ns": round(r.median_ns, 1),
+                "number": r.number,
+                "repeat": r.repeat,
+            }
+            for r in results
+        },
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """
+    Return a description of every benchmark slower than its baseline by more
+    than ``tolerance`` (a fraction, 0.25 means 25%).
+    """
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        base = baseline["benchmarks"].get(name)
+        if base is None:
+            continue
+        ratio = current["min_ns"] / base["min_ns"]
+        if ratio > 1 + tolerance:
+            regressions.append(
+                "{}: {:.0f}ns -> {:.0f}ns ({:+.1%})".format(
+                    name, base["min_ns"], current["min_ns"], ratio - 1
+                )
+            )
+    return regressions
+
+
+def main(suite: str, cases: List[Case], argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run {} benchmarks.".format(suite))
+    parser.add_argument("--output", help="Write JSON results to this file.")
+    parser.add_argument(
+        "--baseline",
+        default=str(BASELINE_DIR / "{}.json".format(suite)),
+        help="Baseline JSON file to compare against.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.3,
+        help="Allowed slowdown relative to baseline before failing.",
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Overwrite the baseline with the current results.",
+    )
+    parser.add_argument("--filter", default="", help="Only run matching cases.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = []
+    for c in cases:
+        if args.filter not in c.name:
+            continue
+        result = measure(c, repeat=args.repeat)
+        results.append(result)
+        print(
+            "{:<45} {:>12.0f} ns/op (median {:.0f}, n={})".format(
+                result.name, result.min_ns, result.median_ns, result.number
+            )
+        )
+
+    data = to_json(results)
+    if args.output:
+        pathlib.Path(args.output).write_text(json.dumps(data, indent=2))
+
+    baseline_file = pathlib.Path(args.baseline)
+    if args.update_baseline:
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        baseline_file.write_text(json.dumps(data, indent=2) + "\n")
+        print("Baseline written to {}".format(baseline_file))
+        return 0
+
+    if not baseline_file.exists():
+        print("No baseline at {}, skipping comparison".format(baseline_file))
+        return 0
+
+    regressions = compare(data, json.loads(baseline_file.read_text()), args.tolerance)
+    if regressions:
+        print("\nRegressions (tolerance {:.0%}):".format(args.tolerance))
+        for line in regressions:
+            print("  " + line)
+        return 1
+
+    print("\nNo regressions against {}".format(baseline_file))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit("Run a suite module instead, e.g. python -m benchmarks.bench_strategy")
@@ -0,0 +1,476 @@
+"""
+Offline evaluation of Strategy parameters on historical candles.
+
+A backtest replays candles through the strategy's own decision and order
+building code (should_trade, prepare_open_pos_orders, prepare_add_pos_orders,
+the TP/SL builders) against a PaperExchange filling the resting orders along
+the path of the next candle. Two evaluation modes are built on it, both
+running their backtests on a process pool:
+
+* walk_forward: on rolling windows, pick the best parameters of a grid on the
+  train window, then trade them on the following test window.
+* monte_carlo: trade the parameters on synthetic series resampled from the
+  candle returns.
+
+Both report the distribution of P&L and max drawdown across windows/paths.
+
+    python -m bot.backtest walk-forward candles.csv --parameters params.json \\
+        --grid grid.json --train 5000 --test 1000
+    python -m bot.backtest monte-carlo candles.csv --parameters params.json \\
+        --paths 500 --block 12
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import pathlib
+import sys
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from bot.exchanges.binance import Binance
+from bot.exchanges.fake import FakeExchange
+from bot.exchanges.paper import PaperExchange, PaperMarket
+from bot.indicators import Indicator, trend_series
+from bot.records import Order, OrderBookTicker, Position
+from bot.strategy import Strategy
+from bot.utils.math import percentile
+
+__all__ = ["load_candles", "monte_carlo", "resample", "run_backtest", "walk_forward"]
+
+PAIR = "BACKTEST"
+# Candles before the first traded one: the longest EMA span of the trend
+# indicator, and at most the history a robot fetches
+WARMUP = 21
+HISTORY = 200
+
+OBJECTIVES = {
+    "pnl": lambda result: result["pnl"],
+    "calmar": lambda result: result["pnl"] / max(result["max_drawdown"], 1e-9),
+}
+
+
+class HistoricalMarket(FakeExchange):
+    """
+    Market of the replayed pair: precisions and order extras of Binance
+    futures, no market data.
+    """
+
+    get_trigger_order_extras = staticmethod(Binance.get_trigger_order_extras)
+    get_tp_order_extras = staticmethod(Binance.get_tp_order_extras)
+
+
+class ReplayStrategy(Strategy):
+    """
+    Strategy making the decisions of trade_once from given balance, position,
+    price and indicator instead of exchange calls.
+    """
+
+    def orders_for(
+        self, balance: float, position: Position, price: float, indicator: Indicator
+    ) -> List[Order]:
+        """
+        The orders open at the end of a trading cycle, ``price`` standing
+        for the last price and the order book ticker.
+        """
+        self._balance = balance
+        self._position = position
+        self.sync_store(last_price=price)
+        if position.side:
+            orders = [self.get_take_profit_order(), self.get_stop_loss_order()]
+        else:
+            orders = []
+
+        if not self._parameters["trendFollowing"]:
+            indicator = Indicator(side=-indicator.side, rw=indicator.rw)
+        if self.should_trade(indicator).code == 0:
+            return orders
+        if position.side == 0:
+            return self.prepare_open_pos_orders(side=indicator.side, base_price=price)
+        return self.prepare_add_pos_orders(side=indicator.side, base_price=price)
+
+
+def _decimals(values: np.ndarray) -> int:
+    for precision in range(9):
+        if np.allclose(values, np.round(values, precision), rtol=0, atol=1e-9):
+            return precision
+    return 8
+
+
+def load_candles(path: str) -> np.ndarray:
+    """
+    Open, high, low, close rows of a ``timestamp,open,high,low,close[,volume]``
+    CSV file, a header line is skipped.
+    """
+    rows = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            try:
+                rows.append([float(v) for v in row[1:5]])
+            except ValueError:
+                if rows:
+                    raise
+    return np.array(rows, dtype=float)
+
+
+def run_backtest(
+    ohlc: np.ndarray,
+    parameters: Dict[str, Any],
+    account: Optional[Dict[str, Any]] = None,
+    start: int = WARMUP,
+) -> Dict[str, Any]:
+    """
+    Trade ``parameters`` on the candles of ``ohlc`` from index ``start``,
+    the candles before only feed the indicator.
+
+    ``account`` is a "paperTrading" section (balance, leverage, fees), plus
+    the "pricePrecision" and "qtyPrecision" of the pair (default: guessed
+    from the prices, 3). The strategy decides at the close of every candle,
+    its orders are matched along the next one.
+    """
+    account = account or {}
+    price_precision = account.get("pricePrecision")
+    if price_precision is None:
+        price_precision = _decimals(ohlc[: HISTORY + start])
+    market = PaperMarket(
+        HistoricalMarket(
+            price_precision=price_precision,
+            qty_precision=account.get("qtyPrecision", 3),
+        ),
+        ttl=0,
+    )
+    exchange = PaperExchange.from_config(market, account)
+    strategy = ReplayStrategy(exchange)
+    strategy.set_trading_context(
+        {
+            "pair": PAIR,
+            "target_currency": "USDT",
+            "market_type": "linear_perpetual",
+            "price_precision": price_precision,
+            "price_tick": exchange.price_ticker(PAIR),
+            "qty_precision": exchange.qty_precision(PAIR),
+            "client_order_prefix": "bt",
+        }
+    )
+    strategy.parameters = parameters
+
+    sides, rws = trend_series(np.ascontiguousarray(ohlc[:, 3]))
+    initial = peak = exchange.balance
+    max_drawdown = 0.0
+    rejected = 0
+    rows = ohlc.tolist()
+    for i in range(max(start, 1), len(rows)):
+        open_, high, low, close = rows[i]
+        exchange.sweep_candle(PAIR, open_, high, low, close)
+        position = exchange.mark_position(PAIR, close)
+        equity = exchange.balance + position.unrealized_pnl
+        if equity > peak:
+            peak = equity
+        elif peak > 0:
+            max_drawdown = max(max_drawdown, (peak - equity) / peak)
+        if exchange.balance <= 0:
+            break
+        if i == len(rows) - 1:
+            break
+
+        indicator = Indicator(side=int(sides[i]), rw=float(rws[i]))
+        orders = strategy.orders_for(exchange.balance, position, close, indicator)
+        quote = OrderBookTicker(ask0=close, bid0=close)
+        rejected += exchange.replace_orders(PAIR, orders, quote)
+
+    summary = exchange.summary()
+    equity = exchange.balance + exchange.mark_position(PAIR, rows[-1][3]).unrealized_pnl
+    return {
+        "candles": max(0, len(rows) - start),
+        "pnl": equity - initial,
+        "return": (equity - initial) / initial,
+        "max_drawdown": max_drawdown,
+        "fills": summary["fills"],
+        "fees": summary["fees"],
+        "liquidations": summary["liquidations"],
+        "rejected": rejected,
+    }
+
+
+def resample(ohlc: np.ndarray, rng: np.random.Generator, block: int = 1) -> np.ndarray:
+    """
+    A synthetic series as long as ``ohlc``, starting at its first candle,
+    made of candles drawn with replacement in blocks of ``block`` consecutive
+    candles (moving block bootstrap; 1 for iid draws). A drawn candle keeps
+    its close to close return, its open relative to the previous close and
+    its high and low relative to its close.
+    """
+    close = ohlc[:, 3]
+    returns = np.log(close[1:] / close[:-1])
+    open_rel = ohlc[1:, 0] / close[:-1]
+    high_rel = ohlc[1:, 1] / close[1:]
+    low_rel = ohlc[1:, 2] / close[1:]
+
+    n = len(returns)
+    block = max(1, min(block, n))
+    starts = rng.integers(0, n - block + 1, size=-(-n // block))
+    index = (starts[:, None] + np.arange(block)).ravel()[:n]
+
+    path_close = close[0] * np.exp(np.cumsum(returns[index]))
+    previous = np.concatenate(([close[0]], path_close[:-1]))
+    path_open = previous * open_rel[index]
+    path_high = np.maximum.reduce([path_close * high_rel[index], path_open, path_close])
+    path_low = np.minimum.reduce([path_close * low_rel[index], path_open, path_close])
+    path = np.stack([path_open, path_high, path_low, path_close], axis=1)
+    precision = _decimals(ohlc[:HISTORY])
+    return np.concatenate((ohlc[:1], np.round(path, precision)))
+
+
+def distribution(values: Sequence[float]) -> Dict[str, float]:
+    values = list(values)
+    if not values:
+        return {}
+    mean = sum(values) / len(values)
+    return {
+        "mean": mean,
+        "std": math.sqrt(sum((v - mean) ** 2 for v in values) / len(values)),
+        "min": min(values),
+        "p5": percentile(values, 0.05),
+        "p25": percentile(values, 0.25),
+        "p50": percentile(values, 0.5),
+        "p75": percentile(values, 0.75),
+        "p95": percentile(values, 0.95),
+        "max": max(values),
+    }
+
+
+# A backtest on candles [begin, end) of the shared series trading from
+# ``begin + start``, or on a path resampled from them if seed is not None
+_Task = namedtuple(
+    "_Task", ["begin", "end", "start", "parameters", "account", "seed", "block"]
+)
+
+_candles: Optional[np.ndarray] = None
+
+
+def _share(ohlc: Optional[np.ndarray]) -> None:
+    global _candles
+    _candles = ohlc
+
+
+def _run_task(task: _Task) -> Dict[str, Any]:
+    ohlc = _candles[task.begin : task.end]
+    if task.seed is not None:
+        ohlc = resample(ohlc, np.random.default_rng(task.seed), task.block)
+    return run_backtest(ohlc, task.parameters, task.account, task.start)
+
+
+def _run_all(
+    ohlc: np.ndarray, tasks: List[_Task], workers: Optional[int]
+) -> List[Dict[str, Any]]:
+    """
+    Run ``tasks`` on ``workers`` processes (default: one per core), each
+    receiving ``ohlc`` once. ``workers=1`` runs them in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        _share(ohlc)
+        try:
+            return [_run_task(task) for task in tasks]
+        finally:
+            _share(None)
+    with concurrent.futures.ProcessPoolExecutor(
+        min(workers, len(tasks)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_share,
+        initargs=(ohlc,),
+    ) as executor:
+        chunksize = max(1, len(tasks) // (workers * 4))
+        return list(executor.map(_run_task, tasks, chunksize=chunksize))
+
+
+def parameter_grid(
+    parameters: Dict[str, Any], grid: Dict[str, List[Any]]
+) -> List[Dict[str, Any]]:
+    """
+    ``parameters`` updated with every combination of the values of ``grid``.
+    """
+    keys = sorted(grid)
+    return [
+        dict(parameters, **dict(zip(keys, values)))
+        for values in itertools.product(*(grid[k] for k in keys))
+    ]
+
+
+def walk_forward(
+    ohlc: np.ndarray,
+    parameters: Dict[str, Any],
+    grid: Dict[str, List[Any]],
+    *,
+    train: int,
+    test: int,
+    step: Optional[int] = None,
+    objective: str = "pnl",
+    account: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Walk-forward evaluation: windows of ``train`` then ``test`` candles move
+    by ``step`` (default ``test``). On each train window every combination of
+    ``grid`` is backtested and the best one by ``objective`` is traded on the
+    test window, both starting flat with the account balance.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError("Unknown objective: {}".format(objective))
+    step = step or test
+    candidates = parameter_grid(parameters, grid)
+    windows = list(range(WARMUP, len(ohlc) - train - test + 1, step))
+    if not windows:
+        raise ValueError(
+            "{} candles are too few for train={} test={}".format(len(ohlc), train, test)
+        )
+
+    def task(begin, end, params):
+        history = max(0, begin - HISTORY)
+        return _Task(history, end, begin - history, params, account, None, 1)
+
+    train_tasks = [
+        task(begin, begin + train, params) for begin in windows for params in candidates
+    ]
+    train_results = _run_all(ohlc, train_tasks, workers)
+    score = OBJECTIVES[objective]
+    best = []
+    for w in range(len(windows)):
+        results = train_results[w * len(candidates) : (w + 1) * len(candidates)]
+        index = max(range(len(results)), key=lambda k: score(results[k]))
+        best.append((candidates[index], results[index]))
+
+    test_tasks = [
+        task(begin + train, begin + train + test, params)
+        for begin, (params, _) in zip(windows, best)
+    ]
+    test_results = _run_all(ohlc, test_tasks, workers)
+
+    report = []
+    for begin, (params, train_result), test_result in zip(windows, best, test_results):
+        report.append(
+            {
+                "train": [begin, begin + train],
+                "test": [begin + train, begin + train + test],
+                "parameters": {k: params[k] for k in grid},
+                "train_result": train_result,
+                "test_result": test_result,
+            }
+        )
+    return {
+        "mode": "walk-forward",
+        "windows": report,
+        "candidates": len(candidates),
+        "pnl": distribution(r["pnl"] for r in test_results),
+        "max_drawdown": distribution(r["max_drawdown"] for r in test_results),
+        "total_pnl": sum(r["pnl"] for r in test_results),
+        "liquidations": sum(r["liquidations"] for r in test_results),
+    }
+
+
+def monte_carlo(
+    ohlc: np.ndarray,
+    parameters: Dict[str, Any],
+    *,
+    paths: int = 100,
+    block: int = 1,
+    seed: int = 0,
+    account: Optional[Dict[str, Any]] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Monte Carlo evaluation: backtest ``parameters`` on ``paths`` series
+    resampled from ``ohlc`` (see resample), plus the original series.
+    """
+    original = run_backtest(ohlc, parameters, account)
+    tasks = [
+        _Task(0, len(ohlc), WARMUP, parameters, account, seed + i, block)
+        for i in range(paths)
+    ]
+    results = _run_all(ohlc, tasks, workers)
+    return {
+        "mode": "monte-carlo",
+        "paths": paths,
+        "block": block,
+        "original": original,
+        "pnl": distribution(r["pnl"] for r in results),
+        "max_drawdown": distribution(r["max_drawdown"] for r in results),
+        "loss_probability": sum(r["pnl"] < 0 for r in results) / max(paths, 1),
+        "liquidation_probability": (
+            sum(r["liquidations"] > 0 for r in results) / max(paths, 1)
+        ),
+    }
+
+
+def _load_json(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    return json.loads(pathlib.Path(path).read_text())
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate strategy parameters.")
+    modes = parser.add_subparsers(dest="mode", required=True)
+    walk = modes.add_parser("walk-forward", help="Rolling train/test windows.")
+    walk.add_argument("--grid", required=True, help="JSON file, key: [values].")
+    walk.add_argument("--train", type=int, required=True)
+    walk.add_argument("--test", type=int, required=True)
+    walk.add_argument("--step", type=int)
+    walk.add_argument("--objective", choices=sorted(OBJECTIVES), default="pnl")
+    carlo = modes.add_parser("monte-carlo", help="Resampled candle returns.")
+    carlo.add_argument("--paths", type=int, default=100)
+    carlo.add_argument("--block", type=int, default=1)
+    carlo.add_argument("--seed", type=int, default=0)
+    for sub in (walk, carlo):
+        sub.add_argument("candles", help="CSV file: timestamp,open,high,low,close.")
+        sub.add_argument("--parameters", required=True, help="JSON file.")
+        sub.add_argument(
+            "--account", help='JSON file, e.g. {"balance": 10000, "leverage": 20}.'
+        )
+        sub.add_argument("--workers", type=int, help="Default: one per core.")
+        sub.add_argument("--output", help="Write the JSON report to this file.")
+    args = parser.parse_args(argv)
+
+    ohlc = load_candles(args.candles)
+    parameters = _load_json(args.parameters)
+    account = _load_json(args.account)
+    if args.mode == "walk-forward":
+        report = walk_forward(
+            ohlc,
+            parameters,
+            _load_json(args.grid),
+            train=args.train,
+            test=args.test,
+            step=args.step,
+            objective=args.objective,
+            account=account,
+            workers=args.workers,
+        )
+    else:
+        report = monte_carlo(
+            ohlc,
+            parameters,
+            paths=args.paths,
+            block=args.block,
+            seed=args.seed,
+            account=account,
+            workers=args.workers,
+        )
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        pathlib.Path(args.output).write_text(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+from typing import Dict, Iterable, Optional
+
+from bot.records import Candle, Candles
+
+PERIOD_SECONDS = {
+    "1m": 60,
+    "3m": 3 * 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "30m": 30 * 60,
+    "1h": 60 * 60,
+    "2h": 2 * 60 * 60,
+    "4h": 4 * 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+
+def period_milliseconds(period: str) -> int:
+    return PERIOD_SECONDS[period] * 1000
+
+
+def _merge(a: Candle, b: Candle, timestamp: int) -> Candle:
+    return Candle(
+        timestamp,
+        a.open,
+        max(a.high, b.high),
+        min(a.low, b.low),
+        b.close,
+        a.volume + b.volume,
+    )
+
+
+class _Timeframe:
+    __slots__ = ("period_ms", "completed", "partial", "head", "maxlen")
+
+    def __init__(self, period_ms: int, maxlen: int):
+        self.period_ms = period_ms
+        self.maxlen = maxlen
+        self.completed = Candles()
+        # Aggregate of the closed base candles of the current bucket
+        self.partial: Optional[Candle] = None
+        # In progress candle of the exchange, given by a seed
+        self.head: Optional[Candle] = None
+
+    def fold(self, candle: Candle) -> None:
+        bucket = candle.timestamp - candle.timestamp % self.period_ms
+        partial = self.partial
+        if partial is not None and partial.timestamp == bucket:
+            self.partial = _merge(partial, candle, bucket)
+            return
+
+        if partial is not None:
+            self.push(partial)
+        self.partial = candle._replace(timestamp=bucket)
+
+    def merge_head(self, last: Optional[Candle]) -> None:
+        """
+        Complete the current bucket with ``head``, which also covers the base
+        candles of the bucket from before our history. Its volume is shared
+        with the base candles of the bucket seen so far, closed (``partial``)
+        or in progress (``last``).
+        """
+        head, self.head = self.head, None
+        bucket = head.timestamp
+        partial = self.partial
+        if partial is not None and partial.timestamp > bucket:
+            # A later bucket started since
+            return
+        if partial is not None and partial.timestamp < bucket:
+            self.push(partial)
+            partial = None
+
+        covered = 0.0 if partial is None else partial.volume
+        if (
+            last is not None
+            and last.timestamp - last.timestamp % self.period_ms == bucket
+        ):
+            covered += last.volume
+        before = head._replace(volume=max(0.0, head.volume - covered))
+        if partial is None:
+            self.partial = before
+        else:
+            self.partial = _merge(before, partial, bucket)
+
+    def push(self, candle: Candle) -> None:
+        completed = self.completed
+        if len(completed) and candle.timestamp <= completed.timestamp[-1]:
+            return
+        completed.append(*candle)
+        if len(completed) > 2 * self.maxlen:
+            for column in Candles.__slots__:
+                del getattr(completed, column)[: -self.maxlen]
+
+    def view(self, last: Optional[Candle]) -> Candles:
+        result = Candles()
+        current = self.partial
+        if last is not None:
+            bucket = last.timestamp - last.timestamp % self.period_ms
+            if current is None:
+                current = last._replace(timestamp=bucket)
+            elif current.timestamp == bucket:
+                current = _merge(current, last, bucket)
+            else:
+                # The partial bucket is closed, `last` opened a new one
+                self._extend(result, current.timestamp)
+                result.append(*current)
+                current = last._replace(timestamp=bucket)
+
+        if current is None:
+            self._extend(result, None)
+            return result
+
+        if not len(result):
+            self._extend(result, current.timestamp)
+        result.append(*current)
+        return result
+
+    def _extend(self, result: Candles, before: Optional[int]) -> None:
+        completed = self.completed
+        end = len(completed)
+        if before is not None:
+            while end and completed.timestamp[end - 1] >= before:
+                end -= 1
+        start = max(0, end - self.maxlen)
+        for column in Candles.__slots__:
+            getattr(result, column).extend(getattr(completed, column)[start:end])
+
+
+class CandleAggregator:
+    """
+    Build higher timeframe candles incrementally from one base candle stream.
+
+    Feed the base candles (e.g. the latest 1m candles fetched every cycle) with
+    ``update``; only candles at or after the last seen one are processed, and
+    the last base candle is treated as still in progress so later updates of it
+    replace the previous values. ``seed`` preloads history of a higher
+    timeframe once so indicators have enough candles right away.
+    """
+
+    def __init__(
+        self,
+        base_period: str = "1m",
+        periods: Iterable[str] = ("5m", "15m", "1h", "4h"),
+        maxlen: int = 500,
+    ):
+        self.base_period = base_period
+        self.maxlen = maxlen
+        base_ms = period_milliseconds(base_period)
+        self._timeframes: Dict[str, _Timeframe] = {}
+        for period in periods:
+            period_ms = period_milliseconds(period)
+            if period_ms % base_ms:
+                raise ValueError(
+                    "{} is not a multiple of {}".format(period, base_period)
+                )
+            self._timeframes[period] = _Timeframe(period_ms, maxlen)
+        self._base = _Timeframe(base_ms, maxlen)
+        self._last: Optional[Candle] = None
+
+    @property
+    def periods(self):
+        return [self.base_period] + list(self._timeframes)
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        return None if self._last is None else self._last.timestamp
+
+    def seed(self, period: str, candles: Candles) -> None:
+        """
+        Preload completed candles of ``period``. The last one, in progress,
+        completes the current bucket at the next ``update``, which should get
+        base candles fetched at the same time.
+        """
+        timeframe = self._timeframe(period)
+        for i in range(len(candles) - 1):
+            timeframe.push(candles[i])
+        if len(candles):
+            timeframe.head = candles[-1]
+
+    def update(self, candles: Candles) -> int:
+        """
+        Merge base candles, return the number of new base candles.
+        """
+        last = self._last
+        new = 0
+        for i in range(len(candles)):
+            timestamp = candles.timestamp[i]
+            if last is not None and timestamp < last.timestamp:
+                continue
+
+            candle = candles[i]
+            if last is not None and timestamp > last.timestamp:
+                # The previous candle is closed now
+                self._base.push(last)
+                for timeframe in self._timeframes.values():
+                    timeframe.fold(last)
+            if last is None or timestamp > last.timestamp:
+                new += 1
+            last = candle
+        self._last = last
+        for timeframe in self._timeframes.values():
+            if timeframe.head is not None:
+                timeframe.merge_head(last)
+        return new
+
+    def candles(self, period: str) -> Candles:
+        if period == self.base_period:
+            return self._base.view(self._last)
+        return self._timeframe(period).view(self._last)
+
+    def _timeframe(self, period: str) -> _Timeframe:
+        if period == self.base_period:
+            return self._base
+        try:
+            return self._timeframes[period]
+        except KeyError:
+            raise ValueError("Unsupported period {}".format(period)) from None
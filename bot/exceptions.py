@@ -40,3 +40,15 @@ class ExchangeException(BotException):
 
 class ServerUnavailable(BotException):
     pass
+
+
+class StreamClosed(ExchangeException):
+    pass
+
+
+class OrderNotFound(ExchangeException):
+    pass
+
+
+class CircuitOpen(ExchangeException):
+    pass
@@ -1,11 +1,28 @@
-from bot.exchanges.binance import Binance
+import importlib
 
 __all__ = ["exchange_factory"]
 
+# Adapters are imported on first use, so a robot process only loads the
+# adapter (and the exchange library) it trades with.
 EXCHANGE_TABLE = {
-    "binance": Binance,
+    "binance": "bot.exchanges.binance:Binance",
 }
 
+# Adapters calling the exchange API directly rather than through ccxt
+NATIVE_EXCHANGE_TABLE = {
+    "binance": "bot.exchanges.binance_native:BinanceNative",
+}
+
+
+def exchange_factory(exchange_code: str, native: bool = False):
+    exchange_code = exchange_code.lower()
+    path = None
+    if native:
+        path = NATIVE_EXCHANGE_TABLE.get(exchange_code)
+    if path is None:
+        path = EXCHANGE_TABLE.get(exchange_code)
+    if path is None:
+        return None
 
-def exchange_factory(exchange_code: str):
-    return EXCHANGE_TABLE.get(exchange_code.lower())
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
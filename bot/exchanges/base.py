@@ -1,43 +1,81 @@
 import asyncio
+import importlib
 import logging
-from collections import namedtuple
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
 
-import ccxt.async_support as ccxt
+import aiohttp
 
 from bot.enums import OrderType
-from bot.exceptions import ExchangeException
-
-OrderBookTicker = namedtuple("OrderBookTicker", ["ask0", "bid0"])
+from bot.exceptions import ExchangeException, OrderNotFound
+from bot.records import Candles, Order, OrderBookTicker, Position
 
 logger = logging.getLogger(__name__)
 
+# ccxt.async_support imports every exchange ccxt ships (hundreds of modules),
+# so it is only imported by the first ccxt backed adapter instance.
+ccxt = None
+
+
+def _import_ccxt():
+    global ccxt
+    if ccxt is None:
+        ccxt = importlib.import_module("ccxt.async_support")
+    return ccxt
+
+
+_CCXT_ORDER_TYPES = {
+    "limit": OrderType.limit,
+    "market": OrderType.market,
+}
+_CCXT_SIDES = {"sell": -1, "buy": 1}
+
+
+def error_causes(exc: BaseException) -> Iterator[BaseException]:
+    """
+    ``exc`` and the errors it was raised from, adapters raising every library
+    error as an ExchangeException ``from`` it.
+    """
+    while exc is not None:
+        yield exc
+        exc = exc.__cause__ or exc.__context__
+
+
+def _ccxt_error(exc: BaseException, name: str) -> bool:
+    return ccxt is not None and isinstance(exc, getattr(ccxt, name))
+
 
 class Exchange:
     code: str = ""
     name: str = ""
-    ccxt_exchange_class: Optional[ccxt.Exchange] = ccxt.Exchange
+    # Name of the ccxt.async_support class backing the adapter, None for
+    # adapters not using ccxt
+    ccxt_exchange_id: Optional[str] = "Exchange"
     trigger_order_type_table: Dict[str, str] = {}
+    # ccxt param identifying an order to fetch or cancel by client order id
+    cancel_client_order_id_param: str = "clientOrderId"
+    test_net: bool = False
 
     def __init__(self):
-        self._ccxt_exchange = self.ccxt_exchange_class(
+        ccxt_exchange_class = getattr(_import_ccxt(), self.ccxt_exchange_id)
+        self._ccxt_exchange = ccxt_exchange_class(
             {
                 "enableRateLimit": True,
                 "verbose": False,
                 "options": {"adjustForTimeDifference": True},
             }
         )
-        self._ccxt_exchange.aiohttp_proxy = 'http://127.0.0.1:7890'
+        self._ccxt_exchange.aiohttp_proxy = "http://127.0.0.1:7890"
         self._ccxt_exchange.aiohttp_trust_env = True
 
         # Public market data
+
     async def fetch_last_price(self, pair: str) -> float:
         ccxt_symbol = self._pair_to_ccxt_symbol(pair)
         try:
             ticker = await self._ccxt_exchange.fetch_ticker(ccxt_symbol)
         except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
             logger.exception(exc)
-            raise ExchangeException("Failed to fetch last price")
+            raise ExchangeException("Failed to fetch last price") from exc
         return ticker["last"]
 
     async def fetch_order_book_ticker(self, pair: str) -> OrderBookTicker:
@@ -46,14 +84,14 @@ class Exchange:
             order_book = await self._ccxt_exchange.fetch_order_book(ccxt_symbol)
         except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
             logger.exception(exc)
-            raise ExchangeException("Failed to fetch order book ticker")
+            raise ExchangeException("Failed to fetch order book ticker") from exc
 
         return OrderBookTicker(
             ask0=order_book["asks"][0][0],
             bid0=order_book["bids"][0][0],
         )
 
-    async def fetch_candles(self, pair: str, period: str):
+    async def fetch_candles(self, pair: str, period: str) -> Candles:
         ccxt_symbol = self._pair_to_ccxt_symbol(pair)
         try:
             result = await self._ccxt_exchange.fetch_ohlcv(
@@ -61,17 +99,16 @@ class Exchange:
             )
         except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
             logger.exception(exc)
-            raise ExchangeException("Failed to fetch candles")
+            raise ExchangeException("Failed to fetch candles") from exc
 
-        return result
+        return Candles.from_ohlcv(result)
 
     async def fetch_total_balance(self, currency: str) -> float:
         try:
             balance = await self._ccxt_exchange.fetch_total_balance()
-            print('balance', balance)
         except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
             logger.exception(exc)
-            raise ExchangeException("Failed to fetch total balance")
+            raise ExchangeException("Failed to fetch total balance") from exc
 
         return balance.get(currency, 0)
 
@@ -90,7 +127,7 @@ class Exchange:
             await ccxt_cancel_all_orders_method(ccxt_symbol)
         except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
             logger.exception(exc)
-            raise ExchangeException("Failed to cancel current orders")
+            raise ExchangeException("Failed to cancel current orders") from exc
 
     def auth(self, credential_key: Dict[str, str]) -> None:
         api_key = credential_key.get("api_key", "")
@@ -103,10 +140,33 @@ class Exchange:
 
     def use_test_net(self) -> None:
         self._ccxt_exchange.set_sandbox_mode(enabled=True)
+        self.test_net = True
+
+    def market_key(self) -> Tuple[Hashable, ...]:
+        """
+        Identify the market data served by the adapter: the same pair has other
+        prices on the test net or on another market type.
+        """
+        return (
+            self.code,
+            self.test_net,
+            self._ccxt_exchange.options.get("defaultType"),
+        )
 
-    async def place_orders_batch(self, orders: List[Dict[str, Any]]):
-        place_order_tasks = [self.place_order(**order) for order in orders]
-        await asyncio.gather(*place_order_tasks, return_exceptions=False)
+    async def place_orders_batch(self, orders: List[Order]) -> List[Order]:
+        place_order_tasks = [
+            self.place_order(
+                pair=o.pair,
+                order_type=o.order_type,
+                side=o.side,
+                qty=o.qty,
+                price=o.price,
+                extras=o.extras,
+                client_order_id=o.client_order_id,
+            )
+            for o in orders
+        ]
+        return await asyncio.gather(*place_order_tasks, return_exceptions=False)
 
     async def place_order(
         self,
@@ -117,7 +177,8 @@ class Exchange:
         qty,
         price=None,
         extras=None,
-    ):
+        client_order_id: Optional[str] = None,
+    ) -> Order:
         logger.debug(
             "Order args {pair: %s, order_type: %s, side: %s, qty: %s, price: %s}",
             pair,
@@ -126,12 +187,14 @@ class Exchange:
             qty,
             price,
         )
-        if extras is None:
-            extras = {}
+        extras = dict(extras) if extras else {}
+        if client_order_id is not None:
+            extras["clientOrderId"] = client_order_id
 
         ccxt_symbol = self._pair_to_ccxt_symbol(pair)
+        ccxt_order_type = order_type
         if order_type == OrderType.trigger:
-            order_type = self.trigger_order_type_table[OrderType.trigger]
+            ccxt_order_type = self.trigger_order_type_table[OrderType.trigger]
             price = self._ccxt_exchange.price_to_precision(ccxt_symbol, price)
             trigger_order_extras = self.get_trigger_order_extras(price)
             extras.update(trigger_order_extras)
@@ -141,9 +204,9 @@ class Exchange:
             price = self._ccxt_exchange.price_to_precision(ccxt_symbol, price)
 
         try:
-            await self._ccxt_exchange.create_order(
+            result = await self._ccxt_exchange.create_order(
                 symbol=ccxt_symbol,
-                type=order_type,
+                type=ccxt_order_type,
                 side={-1: "sell", 1: "buy"}[side],
                 amount=qty,
                 price=price,
@@ -151,7 +214,80 @@ class Exchange:
             )
         except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
             logger.exception(exc)
-            raise ExchangeException("Failed to place order")
+            raise ExchangeException("Failed to place order") from exc
+
+        return Order(
+            pair=pair,
+            order_type=order_type,
+            side=side,
+            qty=float(qty),
+            price=None if price is None else float(price),
+            order_id=result.get("id"),
+            client_order_id=result.get("clientOrderId") or client_order_id,
+            timestamp=result.get("timestamp"),
+        )
+
+    async def cancel_order(self, pair: str, client_order_id: str):
+        ccxt_symbol = self._pair_to_ccxt_symbol(pair)
+        try:
+            await self._ccxt_exchange.cancel_order(
+                None,
+                ccxt_symbol,
+                {self.cancel_client_order_id_param: client_order_id},
+            )
+        except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
+            logger.exception(exc)
+            raise ExchangeException("Failed to cancel order") from exc
+
+    async def fetch_order(self, pair: str, client_order_id: str) -> Optional[Order]:
+        """
+        Order placed with ``client_order_id``, whatever its status, None if the
+        exchange does not know it.
+        """
+        ccxt_symbol = self._pair_to_ccxt_symbol(pair)
+        try:
+            order = await self._ccxt_exchange.fetch_order(
+                None,
+                ccxt_symbol,
+                {self.cancel_client_order_id_param: client_order_id},
+            )
+        except ccxt.OrderNotFound:
+            return None
+        except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
+            logger.exception(exc)
+            raise ExchangeException("Failed to fetch order") from exc
+
+        if order["type"] in _CCXT_ORDER_TYPES:
+            return self._adapt_ccxt_open_order(order, pair=pair)
+        return self._adapt_ccxt_trigger_order(order, pair=pair)
+
+    async def modify_order(self, order: Order, new: Order) -> Order:
+        """
+        Move an open order to the price/qty of ``new``, keeping its client
+        order id. Without an amend endpoint, or when ``new`` has another side
+        or type, the order is cancelled and ``new`` placed instead.
+        """
+        amendable = self.amendable(order, new)
+        await self.cancel_order(order.pair, order.client_order_id)
+        return await self.place_order(
+            pair=order.pair,
+            order_type=new.order_type,
+            side=new.side,
+            qty=new.qty,
+            price=new.price,
+            extras=new.extras,
+            client_order_id=(
+                order.client_order_id if amendable else new.client_order_id
+            ),
+        )
+
+    @staticmethod
+    def amendable(order: Order, new: Order) -> bool:
+        """
+        Whether ``order`` can become ``new`` by an amend: only price and
+        quantity may change.
+        """
+        return order.side == new.side and order.order_type == new.order_type
 
     async def prepare(self):
         await self._ccxt_exchange.load_markets()
@@ -159,10 +295,10 @@ class Exchange:
     async def close(self):
         await self._ccxt_exchange.close()
 
-    async def fetch_position(self, pair: str) -> Dict[str, Any]:
+    async def fetch_position(self, pair: str) -> Position:
         raise NotImplementedError()
 
-    async def fetch_current_orders(self, pair: str) -> List[Dict[str, Any]]:
+    async def fetch_current_orders(self, pair: str) -> List[Order]:
         try:
             active_order_task = self._fetch_active_orders(pair)
             trigger_order_task = self._fetch_trigger_orders(pair)
@@ -172,7 +308,7 @@ class Exchange:
             )
         except (ccxt.ExchangeError, ccxt.NetworkError) as exc:
             logger.exception(exc)
-            raise ExchangeException("Failed to fetch current orders")
+            raise ExchangeException("Failed to fetch current orders") from exc
 
         return open_orders + trigger_orders
 
@@ -184,12 +320,9 @@ class Exchange:
             )
         except Exception as exc:
             logger.exception(exc)
-            raise ExchangeException("Failed to fetch active orders")
+            raise ExchangeException("Failed to fetch active orders") from exc
 
-        return [
-            self._adapt_ccxt_open_order(o, overrides={"pair": pair})
-            for o in open_orders
-        ]
+        return [self._adapt_ccxt_open_order(o, pair=pair) for o in open_orders]
 
     async def _fetch_trigger_orders(self, pair: str):
         raise NotImplementedError()
@@ -211,31 +344,61 @@ class Exchange:
         ccxt_symbol = self._pair_to_ccxt_symbol(pair)
         return self._ccxt_exchange.markets[ccxt_symbol]["precision"]["amount"]
 
+    def stream_url(self, pair: str, stream: str) -> Optional[str]:
+        """
+        Websocket URL of a market data stream (see bot.exchanges.hub), None if
+        the stream has to be polled through REST.
+        """
+        return None
+
+    def parse_stream_message(self, stream: str, message: Dict[str, Any]) -> Any:
+        raise NotImplementedError()
+
+    # Errors, see bot.exchanges.retry
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        """
+        Whether the call failing with ``exc`` is worth sending again: network
+        errors, timeouts, rate limits and 5xx answers.
+        """
+        for e in error_causes(exc):
+            if isinstance(
+                e, (asyncio.TimeoutError, aiohttp.ClientError, ConnectionError)
+            ):
+                return True
+            if _ccxt_error(e, "NetworkError"):
+                return True
+            if _ccxt_error(e, "BaseError"):
+                return False
+        return False
+
+    def is_order_not_found(self, exc: BaseException) -> bool:
+        return any(
+            isinstance(e, OrderNotFound) or _ccxt_error(e, "OrderNotFound")
+            for e in error_causes(exc)
+        )
+
+    def is_duplicate_order(self, exc: BaseException) -> bool:
+        """
+        Whether an order creation failed for its client order id being taken.
+        """
+        return any(_ccxt_error(e, "DuplicateOrderId") for e in error_causes(exc))
+
     @staticmethod
-    def _adapt_ccxt_open_order(order, overrides=None):
-        if overrides is None:
-            overrides = {}
-
-        order_type_table = {
-            "limit": OrderType.limit,
-            "market": OrderType.market,
-        }
-        adapted = {
-            "order_id": order["id"],
-            "client_order_id": order["clientOrderId"],
-            "timestamp": order["timestamp"],  # in milliseconds
-            "datetime": order["datetime"],
-            "price": order["price"],
-            "qty": order["amount"],
-            "pair": order["symbol"],
-            "order_type": order_type_table[order["type"]],
-            "side": {"sell": -1, "buy": 1}[order["side"]],
-        }
-        adapted.update(overrides)
-        return adapted
+    def _adapt_ccxt_open_order(order, pair: Optional[str] = None) -> Order:
+        return Order(
+            pair=pair or order["symbol"],
+            order_type=_CCXT_ORDER_TYPES[order["type"]],
+            side=_CCXT_SIDES[order["side"]],
+            qty=order["amount"],
+            price=order["price"],
+            order_id=order["id"],
+            client_order_id=order["clientOrderId"],
+            timestamp=order["timestamp"],
+        )
 
     @staticmethod
-    def _adapt_ccxt_trigger_order(order, overrides=None):
+    def _adapt_ccxt_trigger_order(order, pair: Optional[str] = None) -> Order:
         raise NotImplementedError()
 
     @staticmethod
@@ -1,11 +1,10 @@
 import logging
-from typing import Any, Dict, List
-
-import ccxt.async_support as ccxt
+from typing import Any, Dict, List, Optional
 
 from bot.enums import OrderType
 from bot.exceptions import ExchangeException, PositionException
 from bot.exchanges.base import Exchange
+from bot.records import Candle, Order, OrderBookTicker, OrderUpdate, Position
 
 logger = logging.getLogger(__name__)
 
@@ -13,12 +12,20 @@ logger = logging.getLogger(__name__)
 class Binance(Exchange):
     code: str = "binance"
     name: str = "Binance"
-    ccxt_exchange_class = ccxt.binance
+    ccxt_exchange_id = "binance"
     trigger_order_type_table = {
         OrderType.trigger: "stop_market",
     }
+    cancel_client_order_id_param = "origClientOrderId"
+    ws_base_url = "wss://fstream.binance.com/ws/"
+    ws_test_net_url = "wss://stream.binancefuture.com/ws/"
+    # https://binance-docs.github.io/apidocs/futures/en/#websocket-market-streams
+    stream_table = {
+        "ticker": "aggTrade",
+        "book_ticker": "bookTicker",
+    }
 
-    async def fetch_position(self, pair: str):
+    async def fetch_position(self, pair: str) -> Position:
         assert (
             self._ccxt_exchange.options["defaultType"] != "spot"
         ), "Doesn't support spots currently"
@@ -39,15 +46,15 @@ class Binance(Exchange):
             logger.exception(
                 "Failed to fetch position. Error from %s: %s", self.name, exc
             )
-            raise ExchangeException()
+            raise ExchangeException() from exc
 
         positions = []
         for p in response:
             parsed = self.parse_position(p)
-            if parsed["qty"] == 0:
+            if parsed.qty == 0:
                 continue
 
-            if parsed["pair"] != pair:
+            if parsed.pair != pair:
                 continue
 
             positions.append(parsed)
@@ -56,17 +63,11 @@ class Binance(Exchange):
             raise PositionException("Does not support multi positions of same pair.")
 
         if len(positions) == 0:
-            return {
-                "qty": 0.0,
-                "side": 0,
-                "liq_price": 0.0,
-                "avg_price": 0.0,
-                "unrealized_pnl": 0.0,
-            }
+            return Position(pair=pair)
 
         return positions[0]
 
-    async def fetch_current_orders(self, pair: str) -> List[Dict[str, Any]]:
+    async def fetch_current_orders(self, pair: str) -> List[Order]:
         # binance return all current orders(including trigger orders) at same time.
         # This is a little different from other exchanges which ones usually separate
         # active orders and trigger orders to different API.
@@ -79,22 +80,61 @@ class Binance(Exchange):
             logger.exception(
                 "Failed to fetch current orders. Error from %s: %s", self.name, exc
             )
-            raise ExchangeException()
+            raise ExchangeException() from exc
 
         ret_orders = []
         for order in open_orders:
             if order["type"] == "limit":
-                ret_orders.append(
-                    self._adapt_ccxt_open_order(order, overrides={"pair": pair})
-                )
+                ret_orders.append(self._adapt_ccxt_open_order(order, pair=pair))
             else:
-                ret_orders.append(
-                    self._adapt_ccxt_trigger_order(order, overrides={"pair": pair})
-                )
+                ret_orders.append(self._adapt_ccxt_trigger_order(order, pair=pair))
         return ret_orders
 
+    async def modify_order(self, order: Order, new: Order) -> Order:
+        # https://binance-docs.github.io/apidocs/futures/en/#modify-order-trade
+        method = getattr(self._ccxt_exchange, "fapiPrivatePutOrder", None)
+        if (
+            method is None
+            or order.order_type != OrderType.limit
+            or not self.amendable(order, new)
+            or self._ccxt_exchange.options["defaultType"] != "future"
+        ):
+            return await super().modify_order(order, new)
+
+        ccxt_symbol = self._pair_to_ccxt_symbol(order.pair)
+        try:
+            result = await method(
+                {
+                    "symbol": order.pair,
+                    "origClientOrderId": order.client_order_id,
+                    "side": "BUY" if order.side == 1 else "SELL",
+                    "quantity": self._ccxt_exchange.amount_to_precision(
+                        ccxt_symbol, new.qty
+                    ),
+                    "price": self._ccxt_exchange.price_to_precision(
+                        ccxt_symbol, new.price
+                    ),
+                }
+            )
+        except Exception as exc:
+            logger.exception(
+                "Failed to modify order. Error from %s: %s", self.name, exc
+            )
+            raise ExchangeException("Failed to modify order") from exc
+
+        return Order(
+            pair=order.pair,
+            order_type=order.order_type,
+            side=order.side,
+            qty=float(result["origQty"]),
+            price=float(result["price"]),
+            order_id=str(result["orderId"]),
+            client_order_id=result["clientOrderId"],
+            timestamp=result["updateTime"],
+        )
+
     @staticmethod
-    def parse_position(position) -> Dict[str, Any]:
+    def parse_position(position) -> Position:
         qty = position["positionAmt"]
         qty_in_float = float(qty)
         side = 0
@@ -103,39 +143,95 @@ class Binance(Exchange):
         if qty_in_float < 0:
             side = -1
 
-        return {
+        return Position(
             # todo: by market type
-            "pair": position["symbol"],
-            "qty": abs(qty_in_float),  # always > 0
-            "side": side,
-            "liq_price": float(position["liquidationPrice"]),
-            "avg_price": float(position["entryPrice"]),
-            "unrealized_pnl": float(position["unRealizedProfit"]),
-        }
+            pair=position["symbol"],
+            qty=abs(qty_in_float),  # always > 0
+            side=side,
+            liq_price=float(position["liquidationPrice"]),
+            avg_price=float(position["entryPrice"]),
+            unrealized_pnl=float(position["unRealizedProfit"]),
+        )
 
     @staticmethod
-    def _adapt_ccxt_trigger_order(order, overrides=None):
-        if overrides is None:
-            overrides = {}
-
+    def _adapt_ccxt_trigger_order(order, pair: Optional[str] = None) -> Order:
         if order["side"] == "buy":
             side = 1
         else:
             side = -1
-        adapted = {
-            "order_id": order["id"],
-            "client_order_id": order["clientOrderId"],
-            "timestamp": order["timestamp"]
-            or order["info"]["updateTime"],  # in milliseconds
-            "datetime": order["datetime"],
-            "price": float(order["info"]["stopPrice"]),
-            "qty": order["amount"],
-            "pair": order["symbol"],
-            "order_type": OrderType.trigger,
-            "side": side,
-        }
-        adapted.update(overrides)
-        return adapted
+        return Order(
+            pair=pair or order["symbol"],
+            order_type=OrderType.trigger,
+            side=side,
+            qty=order["amount"],
+            price=float(order["info"]["stopPrice"]),
+            order_id=order["id"],
+            client_order_id=order["clientOrderId"],
+            # in milliseconds
+            timestamp=order["timestamp"] or order["info"]["updateTime"],
+        )
+
+    def use_test_net(self) -> None:
+        super().use_test_net()
+        self.ws_base_url = self.ws_test_net_url
+
+    def stream_url(self, pair: str, stream: str) -> Optional[str]:
+        # Only USDⓈ-M futures streams are supported, others are polled
+        if self._ccxt_exchange.options["defaultType"] != "future":
+            return None
+        name = self.stream_table.get(stream)
+        if name is None and stream.startswith("kline_"):
+            name = stream
+        if name is None:
+            return None
+        return "{}{}@{}".format(self.ws_base_url, pair.lower(), name)
+
+    def parse_stream_message(self, stream: str, message: Dict[str, Any]) -> Any:
+        event = message.get("e")
+        if event == "aggTrade":
+            return float(message["p"])
+        if event == "kline":
+            k = message["k"]
+            return Candle(
+                k["t"],
+                float(k["o"]),
+                float(k["h"]),
+                float(k["l"]),
+                float(k["c"]),
+                float(k["v"]),
+            )
+        if event == "bookTicker":
+            return OrderBookTicker(ask0=float(message["a"]), bid0=float(message["b"]))
+        if event == "ORDER_TRADE_UPDATE":
+            return self.parse_order_update(message)
+        return None
+
+    @staticmethod
+    def parse_order_update(message: Dict[str, Any]) -> OrderUpdate:
+        # https://binance-docs.github.io/apidocs/futures/en/#event-order-update
+        o = message["o"]
+        order_type = {"LIMIT": OrderType.limit, "MARKET": OrderType.market}.get(
+            o["o"], OrderType.trigger
+        )
+        if order_type == OrderType.trigger:
+            price = float(o["sp"])
+        elif order_type == OrderType.limit:
+            price = float(o["p"])
+        else:
+            price = None
+        return OrderUpdate(
+            status=o["X"],
+            order=Order(
+                pair=o["s"],
+                order_type=order_type,
+                side=1 if o["S"] == "BUY" else -1,
+                qty=float(o["q"]),
+                price=price,
+                order_id=str(o["i"]),
+                client_order_id=o["c"],
+                timestamp=o["T"],
+            ),
+        )
 
     def set_market_type(self, market_type: str):
         market_type_mapping = {
@@ -238,21 +334,21 @@ async def main():
 
     await exchange.place_orders_batch(
         [
-            dict(
+            Order(
                 pair="ETHUSDT",
                 order_type=OrderType.limit,
                 side=-1,
                 qty=0.001,
                 price=500,
             ),
-            dict(
+            Order(
                 pair="ETHUSDT",
                 order_type=OrderType.limit,
                 side=1,
                 qty=0.001,
                 price=100,
             ),
-            dict(
+            Order(
                 pair="ETHUSDT",
                 order_type=OrderType.trigger,
                 side=1,
@@ -0,0 +1,470 @@
+"""
+Binance USDⓈ-M futures adapter talking to the REST API directly.
+
+The ccxt backed Binance adapter pays for market unification on every call
+(and for importing ccxt). This one only implements what the bot uses, signs
+requests itself and parses the raw payloads into records. Select it for a
+robot with ``"nativeExchange": true`` in its config.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import time
+from decimal import Decimal
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import aiohttp
+
+from bot.enums import OrderType
+from bot.exceptions import ExchangeException, UnsupportedMarketType
+from bot.exchanges.base import Exchange, error_causes
+from bot.exchanges.binance import Binance
+from bot.records import Candles, Order, OrderBookTicker, Position
+
+logger = logging.getLogger(__name__)
+
+_ORDER_TYPES = {
+    "LIMIT": OrderType.limit,
+    "MARKET": OrderType.market,
+    "STOP_MARKET": OrderType.trigger,
+}
+_BINANCE_ORDER_TYPES = {
+    OrderType.limit: "LIMIT",
+    OrderType.market: "MARKET",
+    OrderType.trigger: "STOP_MARKET",
+}
+_SIDES = {"BUY": 1, "SELL": -1}
+
+# https://binance-docs.github.io/apidocs/futures/en/#error-codes
+UNKNOWN_ORDER_SENT = -2011
+ORDER_DOES_NOT_EXIST = -2013
+DUPLICATED_CLIENT_ORDER_ID = -4116
+RETRYABLE_CODES = {
+    -1000,  # UNKNOWN
+    -1001,  # DISCONNECTED
+    -1003,  # TOO_MANY_REQUESTS
+    -1007,  # TIMEOUT, execution status unknown
+    -1008,  # SERVER_BUSY
+    -1021,  # INVALID_TIMESTAMP
+}
+RETRYABLE_HTTP_STATUSES = {408, 429}
+
+
+def _decimals(step: str) -> int:
+    return max(0, -Decimal(step).normalize().as_tuple().exponent)
+
+
+class BinanceAPIError(ExchangeException):
+    def __init__(self, status: int, code: Optional[int], msg: str):
+        super().__init__("HTTP {} (code {}): {}".format(status, code, msg))
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+class BinanceFuturesClient:
+    """
+    Signed REST client for https://binance-docs.github.io/apidocs/futures/en/.
+    """
+
+    base_url = "https://fapi.binance.com"
+    test_net_url = "https://testnet.binancefuture.com"
+
+    def __init__(
+        self,
+        api_key: str = "",
+        secret: str = "",
+        base_url: Optional[str] = None,
+        recv_window: int = 5000,
+        timeout: float = 10.0,
+    ):
+        self.api_key = api_key
+        self.secret = secret
+        if base_url is not None:
+            self.base_url = base_url
+        self.recv_window = recv_window
+        self.timeout = timeout
+        # Server time minus local time, in milliseconds
+        self.time_offset = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def sign(self, params: Dict[str, Any]) -> str:
+        params["recvWindow"] = self.recv_window
+        params["timestamp"] = int(time.time() * 1000) + self.time_offset
+        query = urlencode(params)
+        signature = hmac.new(
+            self.secret.encode(), query.encode(), hashlib.sha256
+        ).hexdigest()
+        return "{}&signature={}".format(query, signature)
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        signed: bool = False,
+    ) -> Any:
+        params = dict(params) if params else {}
+        headers = {}
+        if signed:
+            query = self.sign(params)
+            headers["X-MBX-APIKEY"] = self.api_key
+        else:
+            query = urlencode(params)
+        url = self.base_url + path
+        if query:
+            url = "{}?{}".format(url, query)
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout), trust_env=True
+            )
+        try:
+            async with self._session.request(method, url, headers=headers) as resp:
+                text = await resp.text()
+                status = resp.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            raise ExchangeException(
+                "{} {} failed: {!r}".format(method, path, exc)
+            ) from exc
+
+        try:
+            data = json.loads(text)
+        except ValueError:
+            data = None
+        if status >= 400:
+            if isinstance(data, dict):
+                raise BinanceAPIError(status, data.get("code"), data.get("msg", ""))
+            raise BinanceAPIError(status, None, text[:200])
+        return data
+
+    async def sync_time(self) -> None:
+        data = await self.request("GET", "/fapi/v1/time")
+        self.time_offset = data["serverTime"] - int(time.time() * 1000)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class BinanceNative(Exchange):
+    code: str = "binance"
+    name: str = "Binance"
+    ccxt_exchange_id = None
+    ws_base_url = Binance.ws_base_url
+    ws_test_net_url = Binance.ws_test_net_url
+    stream_table = Binance.stream_table
+
+    def __init__(self):
+        self._client = BinanceFuturesClient()
+        # symbol: (tick size, step size)
+        self._markets: Dict[str, tuple] = {}
+
+    # Public market data
+
+    async def fetch_last_price(self, pair: str) -> float:
+        data = await self._request(
+            "Failed to fetch last price", "GET", "/fapi/v1/ticker/price", pair=pair
+        )
+        return float(data["price"])
+
+    async def fetch_order_book_ticker(self, pair: str) -> OrderBookTicker:
+        data = await self._request(
+            "Failed to fetch order book ticker",
+            "GET",
+            "/fapi/v1/ticker/bookTicker",
+            pair=pair,
+        )
+        return OrderBookTicker(
+            ask0=float(data["askPrice"]), bid0=float(data["bidPrice"])
+        )
+
+    async def fetch_candles(self, pair: str, period: str) -> Candles:
+        rows = await self._request(
+            "Failed to fetch candles",
+            "GET",
+            "/fapi/v1/klines",
+            pair=pair,
+            interval=period,
+            limit=201,
+        )
+        candles = Candles()
+        for row in rows:
+            candles.append(
+                row[0],
+                float(row[1]),
+                float(row[2]),
+                float(row[3]),
+                float(row[4]),
+                float(row[5]),
+            )
+        return candles
+
+    # Account
+
+    async def fetch_total_balance(self, currency: str) -> float:
+        balances = await self._request(
+            "Failed to fetch total balance", "GET", "/fapi/v2/balance", signed=True
+        )
+        for balance in balances:
+            if balance["asset"] == currency:
+                return float(balance["balance"])
+        return 0
+
+    async def fetch_position(self, pair: str) -> Position:
+        response = await self._request(
+            "Failed to fetch position",
+            "GET",
+            "/fapi/v2/positionRisk",
+            signed=True,
+            pair=pair,
+        )
+        for p in response:
+            if p["symbol"] == pair and float(p["positionAmt"]) != 0:
+                return self.parse_position(p)
+        return Position(pair=pair)
+
+    async def fetch_current_orders(self, pair: str) -> List[Order]:
+        orders = await self._request(
+            "Failed to fetch current orders",
+            "GET",
+            "/fapi/v1/openOrders",
+            signed=True,
+            pair=pair,
+        )
+        return [self.parse_order(o) for o in orders]
+
+    async def cancel_current_orders(self, pair: str):
+        await self._request(
+            "Failed to cancel current orders",
+            "DELETE",
+            "/fapi/v1/allOpenOrders",
+            signed=True,
+            pair=pair,
+        )
+
+    async def place_order(
+        self,
+        *,
+        pair: str,
+        order_type: OrderType,
+        side: int,
+        qty,
+        price=None,
+        extras=None,
+        client_order_id: Optional[str] = None,
+    ) -> Order:
+        logger.debug(
+            "Order args {pair: %s, order_type: %s, side: %s, qty: %s, price: %s}",
+            pair,
+            order_type,
+            side,
+            qty,
+            price,
+        )
+        params = {
+            "symbol": pair,
+            "side": "BUY" if side == 1 else "SELL",
+            "type": _BINANCE_ORDER_TYPES[order_type],
+            "quantity": self._format_qty(pair, qty),
+        }
+        if client_order_id is not None:
+            params["newClientOrderId"] = client_order_id
+        if order_type == OrderType.trigger:
+            params["stopPrice"] = self._format_price(pair, price)
+            extras = dict(self.get_trigger_order_extras(price), **(extras or {}))
+        elif order_type == OrderType.limit:
+            params["price"] = self._format_price(pair, price)
+            params["timeInForce"] = "GTC"
+        for key, value in (extras or {}).items():
+            if key == "stopPrice":
+                continue
+            params[key] = str(value).lower() if isinstance(value, bool) else value
+
+        result = await self._request(
+            "Failed to place order", "POST", "/fapi/v1/order", params, signed=True
+        )
+        return self.parse_order(result)
+
+    async def cancel_order(self, pair: str, client_order_id: str):
+        await self._request(
+            "Failed to cancel order",
+            "DELETE",
+            "/fapi/v1/order",
+            signed=True,
+            pair=pair,
+            origClientOrderId=client_order_id,
+        )
+
+    async def fetch_order(self, pair: str, client_order_id: str) -> Optional[Order]:
+        params = {"symbol": pair, "origClientOrderId": client_order_id}
+        try:
+            order = await self._client.request(
+                "GET", "/fapi/v1/order", params, signed=True
+            )
+        except BinanceAPIError as exc:
+            if exc.code == ORDER_DOES_NOT_EXIST:
+                return None
+            logger.exception(exc)
+            raise ExchangeException("Failed to fetch order") from exc
+        except ExchangeException as exc:
+            logger.exception(exc)
+            raise ExchangeException("Failed to fetch order") from exc
+        return self.parse_order(order)
+
+    async def modify_order(self, order: Order, new: Order) -> Order:
+        if order.order_type != OrderType.limit or not self.amendable(order, new):
+            # Only limit orders can be modified, keeping their side
+            return await super().modify_order(order, new)
+
+        result = await self._request(
+            "Failed to modify order",
+            "PUT",
+            "/fapi/v1/order",
+            signed=True,
+            pair=order.pair,
+            origClientOrderId=order.client_order_id,
+            side="BUY" if order.side == 1 else "SELL",
+            quantity=self._format_qty(order.pair, new.qty),
+            price=self._format_price(order.pair, new.price),
+        )
+        return self.parse_order(result)
+
+    # Lifecycle and configuration
+
+    def auth(self, credential_key: Dict[str, str]) -> None:
+        self._client.api_key = credential_key.get("api_key", "")
+        self._client.secret = credential_key.get("secret", "")
+
+    def use_test_net(self) -> None:
+        self._client.base_url = self._client.test_net_url
+        self.ws_base_url = self.ws_test_net_url
+        self.test_net = True
+
+    def market_key(self) -> Tuple[Hashable, ...]:
+        # USDⓈ-M futures only, the endpoint tells the test net (or a mock)
+        return (self.code, self._client.base_url)
+
+    def set_market_type(self, market_type: str):
+        if market_type not in {"linear_perpetual", "linear_delivery"}:
+            raise UnsupportedMarketType(
+                "Native Binance adapter only supports USDⓈ-M futures, got {}".format(
+                    market_type
+                )
+            )
+
+    async def prepare(self):
+        await self._client.sync_time()
+        info = await self._request(
+            "Failed to load markets", "GET", "/fapi/v1/exchangeInfo"
+        )
+        for symbol in info["symbols"]:
+            filters = {f["filterType"]: f for f in symbol["filters"]}
+            self._markets[symbol["symbol"]] = (
+                filters["PRICE_FILTER"]["tickSize"],
+                filters["LOT_SIZE"]["stepSize"],
+            )
+
+    async def close(self):
+        await self._client.close()
+
+    def price_precision(self, pair: str) -> int:
+        return _decimals(self._markets[pair][0])
+
+    def price_ticker(self, pair: str) -> float:
+        return float(self._markets[pair][0])
+
+    def qty_precision(self, pair: str) -> int:
+        return _decimals(self._markets[pair][1])
+
+    def stream_url(self, pair: str, stream: str) -> Optional[str]:
+        name = self.stream_table.get(stream)
+        if name is None and stream.startswith("kline_"):
+            name = stream
+        if name is None:
+            return None
+        return "{}{}@{}".format(self.ws_base_url, pair.lower(), name)
+
+    def _api_error(self, exc: BaseException) -> Optional[BinanceAPIError]:
+        for e in error_causes(exc):
+            if isinstance(e, BinanceAPIError):
+                return e
+        return None
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        error = self._api_error(exc)
+        if error is None:
+            return super().is_retryable(exc)
+        return (
+            error.status >= 500
+            or error.status in RETRYABLE_HTTP_STATUSES
+            or error.code in RETRYABLE_CODES
+        )
+
+    def is_order_not_found(self, exc: BaseException) -> bool:
+        error = self._api_error(exc)
+        if error is None:
+            return super().is_order_not_found(exc)
+        return error.code in (UNKNOWN_ORDER_SENT, ORDER_DOES_NOT_EXIST)
+
+    def is_duplicate_order(self, exc: BaseException) -> bool:
+        error = self._api_error(exc)
+        return error is not None and error.code == DUPLICATED_CLIENT_ORDER_ID
+
+    parse_stream_message = Binance.parse_stream_message
+    parse_order_update = staticmethod(Binance.parse_order_update)
+    parse_position = staticmethod(Binance.parse_position)
+    get_trigger_order_extras = staticmethod(Binance.get_trigger_order_extras)
+    get_tp_order_extras = staticmethod(Binance.get_tp_order_extras)
+
+    @staticmethod
+    def parse_order(order: Dict[str, Any]) -> Order:
+        # Any other type (TAKE_PROFIT_MARKET, TRAILING_STOP_MARKET, STOP...)
+        # is a trigger order, as in the ccxt adapter
+        order_type = _ORDER_TYPES.get(order["type"], OrderType.trigger)
+        if order_type == OrderType.trigger:
+            price = float(order.get("stopPrice") or 0) or None
+        elif order_type == OrderType.limit:
+            price = float(order["price"])
+        else:
+            price = None
+        return Order(
+            pair=order["symbol"],
+            order_type=order_type,
+            side=_SIDES[order["side"]],
+            qty=float(order["origQty"]),
+            price=price,
+            order_id=str(order["orderId"]),
+            client_order_id=order["clientOrderId"],
+            timestamp=order.get("updateTime") or order.get("time"),
+        )
+
+    async def _request(
+        self,
+        error: str,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        signed: bool = False,
+        pair: Optional[str] = None,
+        **kwargs,
+    ) -> Any:
+        params = dict(params or {}, **kwargs)
+        if pair is not None:
+            params["symbol"] = pair
+        try:
+            return await self._client.request(method, path, params, signed=signed)
+        except ExchangeException as exc:
+            logger.exception(exc)
+            raise ExchangeException(error) from exc
+
+    def _format_price(self, pair: str, price: float) -> str:
+        return "{:.{}f}".format(price, self.price_precision(pair))
+
+    def _format_qty(self, pair: str, qty: float) -> str:
+        return "{:.{}f}".format(qty, self.qty_precision(pair))
@@ -0,0 +1,162 @@
+"""
+Circuit breaker for exchange outages.
+
+While the exchange keeps failing there is no point in sending it the whole
+trading cycle every 10 seconds. After ``failure_threshold`` consecutive
+failures, or ``slow_call_limit`` consecutive calls slower than
+``slow_call_threshold`` seconds, the breaker opens: non-essential calls
+(candles, tickers, balance) are rejected locally with CircuitOpen and only
+the calls keeping the position protected (position, orders, TP/SL) still
+reach the exchange. After ``reset_timeout`` seconds the breaker is
+half-open and lets one probe through; its outcome closes or reopens it.
+"""
+
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+from bot.exceptions import CircuitOpen
+from bot.metrics import Metrics, registry
+
+__all__ = ["CLOSED", "OPEN", "HALF_OPEN", "CircuitBreaker"]
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Metrics are reported as ``<prefix>circuit_<field>`` until ``close``.
+    """
+
+    def __init__(
+        self,
+        name: str = "exchange",
+        failure_threshold: int = 5,
+        slow_call_threshold: float = 5.0,
+        slow_call_limit: int = 3,
+        reset_timeout: float = 30.0,
+        metrics: Metrics = registry,
+        clock: Callable[[], float] = time.monotonic,
+        prefix: str = "",
+    ):
+        self.name = name
+        self.prefix = prefix
+        self.failure_threshold = failure_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.slow_call_limit = slow_call_limit
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._failures = 0
+        self._slow_calls = 0
+        self._probing = False
+        self.open_count = 0
+        self.rejected = 0
+        self._metrics = metrics
+        metrics.register(self._report)
+
+    @classmethod
+    def from_config(
+        cls, name: str, config: Optional[Dict[str, Any]], **kwargs
+    ) -> "CircuitBreaker":
+        config = config or {}
+        breaker = cls(name, **kwargs)
+        breaker.failure_threshold = config.get(
+            "failureThreshold", breaker.failure_threshold
+        )
+        breaker.slow_call_threshold = config.get(
+            "slowCallThreshold", breaker.slow_call_threshold
+        )
+        breaker.slow_call_limit = config.get("slowCallLimit", breaker.slow_call_limit)
+        breaker.reset_timeout = config.get("resetTimeout", breaker.reset_timeout)
+        return breaker
+
+    @property
+    def state(self) -> str:
+        if (
+            self._state == OPEN
+            and self._clock() - self._opened_at >= self.reset_timeout
+        ):
+            self._state = HALF_OPEN
+            logger.info("Circuit %s half-open, probing the exchange", self.name)
+        return self._state
+
+    @property
+    def degraded(self) -> bool:
+        return self.state != CLOSED
+
+    def before_call(self, essential: bool = False) -> bool:
+        """
+        Raise CircuitOpen if the call may not be sent to the exchange, return
+        whether the call is the half-open probe.
+        """
+        state = self.state
+        if state == CLOSED:
+            return False
+        if state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        if not essential:
+            self.rejected += 1
+            raise CircuitOpen(
+                "Circuit {} is {}, call suspended".format(self.name, state)
+            )
+        return False
+
+    def abort_probe(self) -> None:
+        """
+        The probe ended without an outcome (e.g. cancelled), let the next call
+        probe again.
+        """
+        self._probing = False
+
+    def on_success(self, elapsed: float) -> None:
+        if elapsed > self.slow_call_threshold:
+            self._slow_calls += 1
+            if self._slow_calls >= self.slow_call_limit or self.state == HALF_OPEN:
+                self._open("{} slow calls ({:.1f}s)".format(self._slow_calls, elapsed))
+            return
+
+        self._failures = 0
+        self._slow_calls = 0
+        if self.state == HALF_OPEN:
+            self._state = CLOSED
+            self._probing = False
+            logger.info("Circuit %s closed, exchange recovered", self.name)
+
+    def on_failure(self) -> None:
+        self._failures += 1
+        state = self.state
+        if state == HALF_OPEN or (
+            state == CLOSED and self._failures >= self.failure_threshold
+        ):
+            self._open("{} consecutive failures".format(self._failures))
+
+    def _open(self, reason: str) -> None:
+        if self._state != OPEN:
+            self.open_count += 1
+            logger.warning(
+                "Circuit %s open after %s, suspending non-essential calls for %ss",
+                self.name,
+                reason,
+                self.reset_timeout,
+            )
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._probing = False
+
+    def close(self) -> None:
+        self._metrics.unregister(self._report)
+
+    def _report(self) -> Dict[str, Any]:
+        prefix = self.prefix
+        return {
+            prefix + "circuit_state": self.state,
+            prefix + "circuit_open_count": self.open_count,
+            prefix + "circuit_rejected": self.rejected,
+        }
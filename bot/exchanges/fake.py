@@ -0,0 +1,198 @@
+import asyncio
+import itertools
+import random
+import time
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from bot.candles import PERIOD_SECONDS
+from bot.enums import OrderType
+from bot.exceptions import OrderNotFound
+from bot.exchanges.base import Exchange
+from bot.records import Candles, Order, OrderBookTicker, Position
+
+
+class FakeExchange(Exchange):
+    """
+    In-process exchange keeping all state in memory, for tests and benchmarks.
+
+    Every call awaits ``latency`` seconds (plus up to ``jitter``) to mimic a
+    network round trip. Orders are stored but never filled; use
+    ``set_position`` to simulate fills.
+    """
+
+    code: str = "fake"
+    name: str = "Fake"
+    ccxt_exchange_id = None
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        price: float = 350.0,
+        balance: float = 10000.0,
+        price_precision: int = 2,
+        qty_precision: int = 3,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._price = price
+        self._balance = balance
+        self._price_precision = price_precision
+        self._qty_precision = qty_precision
+        self._orders: List[Order] = []
+        self._order_ids = itertools.count(1)
+        self._position = Position()
+        self.request_count = 0
+
+    async def _round_trip(self):
+        self.request_count += 1
+        delay = self.latency
+        if self.jitter:
+            delay += self._random.uniform(0, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+
+    def _walk(self) -> float:
+        tick = self.price_ticker("")
+        self._price = round(
+            self._price + self._random.choice((-1, 0, 1)) * tick,
+            self._price_precision,
+        )
+        return self._price
+
+    def set_position(self, position: Dict[str, Any]) -> None:
+        for key, value in position.items():
+            setattr(self._position, key, value)
+
+    async def fetch_last_price(self, pair: str) -> float:
+        await self._round_trip()
+        return self._walk()
+
+    async def fetch_order_book_ticker(self, pair: str) -> OrderBookTicker:
+        await self._round_trip()
+        bid0 = self._walk()
+        return OrderBookTicker(
+            ask0=round(bid0 + self.price_ticker(pair), self._price_precision),
+            bid0=bid0,
+        )
+
+    async def fetch_candles(self, pair: str, period: str) -> Candles:
+        await self._round_trip()
+        step = PERIOD_SECONDS.get(period, 60) * 1000
+        now = int(time.time() * 1000)
+        start = now - now % step - 200 * step
+        rng = random.Random(start)
+        close = self._price
+        candles = Candles()
+        for i in range(201):
+            open_ = close
+            close = round(open_ * (1 + rng.gauss(0, 0.001)), self._price_precision)
+            candles.append(
+                start + i * step,
+                open_,
+                max(open_, close),
+                min(open_, close),
+                close,
+                rng.uniform(10, 1000),
+            )
+        return candles
+
+    async def fetch_total_balance(self, currency: str) -> float:
+        await self._round_trip()
+        return self._balance
+
+    async def fetch_position(self, pair: str) -> Position:
+        await self._round_trip()
+        position = self._position.copy()
+        position.pair = pair
+        return position
+
+    async def fetch_current_orders(self, pair: str) -> List[Order]:
+        await self._round_trip()
+        return list(self._orders)
+
+    async def cancel_current_orders(self, pair: str):
+        await self._round_trip()
+        self._orders.clear()
+
+    async def place_order(
+        self,
+        *,
+        pair: str,
+        order_type: OrderType,
+        side: int,
+        qty,
+        price=None,
+        extras=None,
+        client_order_id: Optional[str] = None,
+    ) -> Order:
+        await self._round_trip()
+        order_id = next(self._order_ids)
+        order = Order(
+            pair=pair,
+            order_type=order_type,
+            side=side,
+            qty=qty,
+            price=price,
+            order_id=str(order_id),
+            client_order_id=client_order_id or "fake{}".format(order_id),
+            timestamp=int(time.time() * 1000),
+        )
+        self._orders.append(order)
+        return order
+
+    async def cancel_order(self, pair: str, client_order_id: str):
+        await self._round_trip()
+        for order in self._orders:
+            if order.client_order_id == client_order_id:
+                self._orders.remove(order)
+                return
+        raise OrderNotFound("Unknown order {}".format(client_order_id))
+
+    async def fetch_order(self, pair: str, client_order_id: str) -> Optional[Order]:
+        await self._round_trip()
+        for order in self._orders:
+            if order.client_order_id == client_order_id:
+                return order
+        return None
+
+    async def modify_order(self, order: Order, new: Order) -> Order:
+        if not self.amendable(order, new):
+            return await super().modify_order(order, new)
+        await self._round_trip()
+        for current in self._orders:
+            if current.client_order_id == order.client_order_id:
+                current.price = new.price
+                current.qty = new.qty
+                current.timestamp = int(time.time() * 1000)
+                return current
+        raise OrderNotFound("Unknown order {}".format(order.client_order_id))
+
+    def auth(self, credential_key: Dict[str, str]) -> None:
+        pass
+
+    def use_test_net(self) -> None:
+        self.test_net = True
+
+    def market_key(self) -> Tuple[Hashable, ...]:
+        return (self.code, self.test_net)
+
+    def set_market_type(self, market_type: str):
+        pass
+
+    async def prepare(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def price_precision(self, pair: str) -> int:
+        return self._price_precision
+
+    def qty_precision(self, pair: str) -> int:
+        return self._qty_precision
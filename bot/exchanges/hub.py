@@ -0,0 +1,310 @@
+"""
+Market data shared by all the robots of a process.
+
+Robots trading the same pair on the same exchange subscribe to the hub rather
+than polling the exchange each on their own. The hub keeps a single upstream
+per (market, pair, stream), the market being the exchange and its endpoint
+(see ``Exchange.market_key``): a websocket when the exchange provides one (see
+``Exchange.stream_url``), REST polling otherwise. Updates are fanned out to a
+bounded buffer per consumer.
+
+Streams are ``ticker`` (last price), ``book_ticker`` (OrderBookTicker) and
+``kline_<period>`` (the Candle in progress, e.g. ``kline_5m``).
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Hashable, List, Optional, Tuple
+
+import aiohttp
+
+from bot.exceptions import CircuitOpen, StreamClosed
+from bot.metrics import Metrics, registry
+
+logger = logging.getLogger(__name__)
+
+StreamKey = Tuple[Hashable, str, str]
+
+
+def _conflation_key(stream: str, update: Any) -> Hashable:
+    # A pending kline is only superseded by an update of the same candle, any
+    # pending ticker is superseded by a newer one
+    if stream.startswith("kline_"):
+        return update.timestamp
+    return None
+
+
+class Subscription:
+    """
+    Consumer side of a hub stream.
+
+    Updates wait in a buffer of at most ``maxsize`` items. A new update
+    replaces the pending one it supersedes (conflation) and the oldest pending
+    update is dropped when the buffer is full, so a slow consumer gets fewer
+    but fresher updates and never holds up the upstream or other consumers.
+    ``latest`` is always the last update received, whether consumed or not.
+    """
+
+    def __init__(
+        self, hub: "MarketDataHub", key: StreamKey, maxsize: int, exchange=None
+    ):
+        self.key = key
+        self.maxsize = maxsize
+        self.latest: Any = None
+        self.updated_at = float("-inf")
+        self.received = 0
+        self.conflated = 0
+        self.dropped = 0
+        self.closed = False
+        self._hub = hub
+        # Exchange of the subscriber, the upstream may go through it
+        self._exchange = exchange
+        self._buffer: deque = deque()
+        self._event = asyncio.Event()
+
+    @property
+    def age(self) -> float:
+        """
+        Seconds since the last update.
+        """
+        return time.monotonic() - self.updated_at
+
+    def _put(self, update: Any, conflation_key: Hashable) -> None:
+        self.received += 1
+        self.latest = update
+        self.updated_at = time.monotonic()
+
+        buffer = self._buffer
+        for i, (key, _) in enumerate(buffer):
+            if key == conflation_key:
+                del buffer[i]
+                self.conflated += 1
+                break
+        buffer.append((conflation_key, update))
+        if len(buffer) > self.maxsize:
+            buffer.popleft()
+            self.dropped += 1
+        self._event.set()
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    async def get(self) -> Any:
+        while not self._buffer:
+            if self.closed:
+                raise StreamClosed("Subscription to {} is closed".format(self.key))
+            self._event.clear()
+            await self._event.wait()
+        return self._buffer.popleft()[1]
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.get()
+        except StreamClosed:
+            raise StopAsyncIteration from None
+
+    def close(self) -> None:
+        if not self.closed:
+            self._hub.unsubscribe(self)
+
+    def _close(self) -> None:
+        self.closed = True
+        self._event.set()
+
+
+class _Channel:
+    __slots__ = ("task", "exchange", "subscribers", "updates", "errors")
+
+    def __init__(self, exchange):
+        self.task: Optional[asyncio.Task] = None
+        # Exchange the upstream goes through, one of a subscriber's
+        self.exchange = exchange
+        self.subscribers: List[Subscription] = []
+        self.updates = 0
+        self.errors = 0
+
+
+class MarketDataHub:
+    """
+    Multiplex one upstream per (market, pair, stream) to many consumers.
+
+    The upstream starts with the first subscriber, through its exchange, and
+    stops with the last one. When the subscriber whose exchange the upstream
+    goes through leaves (its exchange may be closed next), the upstream
+    restarts through another subscriber's exchange. Streams without a websocket are polled every ``poll_interval``
+    seconds. A failing upstream is logged and reconnected after ``retry_delay``
+    seconds; consumers only see a gap in updates. Values older than
+    ``max_age`` seconds should be considered stale by consumers.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100,
+        poll_interval: float = 1.0,
+        retry_delay: float = 1.0,
+        max_age: float = 5.0,
+        metrics: Optional[Metrics] = registry,
+    ):
+        self.maxsize = maxsize
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.max_age = max_age
+        self._channels: Dict[StreamKey, _Channel] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        if metrics is not None:
+            metrics.register(self.metrics)
+
+    def configure(self, options: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Apply the optional "marketData" section of config.json, for the
+        upstreams started afterwards:
+
+            {
+                "maxsize": 100,
+                "pollInterval": 1,    # seconds between REST polls of a stream
+                "retryDelay": 1,
+                "maxAge": 5
+            }
+        """
+        options = options or {}
+        self.maxsize = options.get("maxsize", self.maxsize)
+        self.poll_interval = options.get("pollInterval", self.poll_interval)
+        self.retry_delay = options.get("retryDelay", self.retry_delay)
+        self.max_age = options.get("maxAge", self.max_age)
+
+    def subscribe(
+        self, exchange, pair: str, stream: str, maxsize: Optional[int] = None
+    ) -> Subscription:
+        key = (exchange.market_key(), pair, stream)
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = _Channel(exchange)
+            self._start(key, channel)
+        subscription = Subscription(self, key, maxsize or self.maxsize, exchange)
+        channel.subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription._close()
+        channel = self._channels.get(subscription.key)
+        if channel is None or subscription not in channel.subscribers:
+            return
+        channel.subscribers.remove(subscription)
+        if not channel.subscribers:
+            del self._channels[subscription.key]
+            channel.task.cancel()
+            return
+        exchanges = [s._exchange for s in channel.subscribers]
+        if subscription._exchange is channel.exchange and not any(
+            e is channel.exchange for e in exchanges
+        ):
+            channel.task.cancel()
+            channel.exchange = exchanges[0]
+            self._start(subscription.key, channel)
+
+    def _start(self, key: StreamKey, channel: _Channel) -> None:
+        channel.task = asyncio.get_event_loop().create_task(
+            self._run(channel.exchange, key, channel)
+        )
+
+    @property
+    def keys(self) -> List[StreamKey]:
+        return list(self._channels)
+
+    async def close(self) -> None:
+        channels = list(self._channels.values())
+        self._channels.clear()
+        for channel in channels:
+            for subscription in channel.subscribers:
+                subscription._close()
+            channel.task.cancel()
+        await asyncio.gather(*(c.task for c in channels), return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def metrics(self) -> Dict[str, Any]:
+        subscriptions = [s for c in self._channels.values() for s in c.subscribers]
+        return {
+            "market_data_upstreams": len(self._channels),
+            "market_data_subscribers": len(subscriptions),
+            "market_data_conflated": sum(s.conflated for s in subscriptions),
+            "market_data_dropped": sum(s.dropped for s in subscriptions),
+            "market_data_errors": sum(c.errors for c in self._channels.values()),
+        }
+
+    async def _run(self, exchange, key: StreamKey, channel: _Channel) -> None:
+        _, pair, stream = key
+        while True:
+            try:
+                async for update in self._upstream(exchange, pair, stream):
+                    channel.updates += 1
+                    conflation_key = _conflation_key(stream, update)
+                    for subscription in channel.subscribers:
+                        subscription._put(update, conflation_key)
+            except asyncio.CancelledError:
+                raise
+            except CircuitOpen:
+                # Polling resumes once the exchange recovers
+                pass
+            except Exception as exc:
+                channel.errors += 1
+                logger.warning("Market data upstream %s failed: %r", key, exc)
+            await asyncio.sleep(self.retry_delay)
+
+    def _upstream(self, exchange, pair: str, stream: str) -> AsyncIterator[Any]:
+        url = exchange.stream_url(pair, stream)
+        if url is None:
+            return poll_stream(exchange, pair, stream, self.poll_interval)
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(trust_env=True)
+        return websocket_stream(
+            self._session,
+            url,
+            lambda message: exchange.parse_stream_message(stream, message),
+        )
+
+
+async def poll_stream(
+    exchange, pair: str, stream: str, interval: float
+) -> AsyncIterator[Any]:
+    """
+    Emulate a stream with the REST endpoints of ``exchange``.
+    """
+    while True:
+        if stream == "ticker":
+            yield await exchange.fetch_last_price(pair)
+        elif stream == "book_ticker":
+            yield await exchange.fetch_order_book_ticker(pair)
+        elif stream.startswith("kline_"):
+            candles = await exchange.fetch_candles(pair=pair, period=stream[6:])
+            # The previous candle may have been closed since the last poll
+            for i in range(max(0, len(candles) - 2), len(candles)):
+                yield candles[i]
+        else:
+            raise ValueError("Unsupported stream: {}".format(stream))
+        await asyncio.sleep(interval)
+
+
+async def websocket_stream(
+    session: aiohttp.ClientSession, url: str, parse
+) -> AsyncIterator[Any]:
+    """
+    Yield the parsed messages of a websocket until the server closes it.
+    """
+    async with session.ws_connect(url, heartbeat=30) as ws:
+        async for message in ws:
+            if message.type != aiohttp.WSMsgType.TEXT:
+                break
+            update = parse(message.json())
+            if update is not None:
+                yield update
+
+
+default_hub = MarketDataHub()
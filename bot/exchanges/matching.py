@@ -0,0 +1,178 @@
+"""
+Matching of simulated orders, shared by the simulated exchanges (paper
+trading, backtests).
+"""
+
+import heapq
+from collections import namedtuple
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bot.enums import OrderType
+from bot.records import Order
+
+__all__ = ["Fill", "OrderBook"]
+
+Fill = namedtuple("Fill", ["order", "price", "maker"])
+
+BUY_LIMIT = 0
+SELL_LIMIT = 1
+BUY_STOP = 2
+SELL_STOP = 3
+
+
+class _Side:
+    """
+    Price levels of one kind of order, the level crossed first on top.
+
+    Levels are kept in a heap of ticks (negated when the highest level is
+    crossed first), each level holding its orders in time priority. Empty
+    levels are dropped lazily when they reach the top.
+    """
+
+    __slots__ = ("sign", "heap", "levels")
+
+    def __init__(self, highest_first: bool):
+        self.sign = -1 if highest_first else 1
+        self.heap: List[int] = []
+        self.levels: Dict[int, Dict[str, Order]] = {}
+
+    def add(self, tick: int, order: Order) -> None:
+        level = self.levels.get(tick)
+        if level is None:
+            level = self.levels[tick] = {}
+            heapq.heappush(self.heap, self.sign * tick)
+        level[order.client_order_id] = order
+
+    def remove(self, tick: int, client_order_id: str) -> None:
+        level = self.levels[tick]
+        del level[client_order_id]
+        if not level:
+            # Its heap entry is skipped by top()
+            del self.levels[tick]
+
+    def top(self) -> Optional[int]:
+        heap = self.heap
+        while heap:
+            tick = self.sign * heap[0]
+            if tick in self.levels:
+                return tick
+            heapq.heappop(heap)
+        return None
+
+
+class OrderBook:
+    """
+    Resting simulated limit and stop orders of one pair, indexed by price
+    tick: adding and cancelling an order is O(log n), matching costs
+    O(log n) per filled order whatever the number of resting orders.
+
+    A buy limit fills once the price falls to its level, a sell limit once
+    it rises to it; a buy stop triggers once the price rises to its stop
+    price, a sell stop once it falls to it. Fills are generated one at a time
+    so the caller may cancel or amend other orders in between.
+    """
+
+    def __init__(self, tick_size: float):
+        self.tick_size = tick_size
+        self._sides = (
+            _Side(highest_first=True),  # buy limits
+            _Side(highest_first=False),  # sell limits
+            _Side(highest_first=False),  # buy stops
+            _Side(highest_first=True),  # sell stops
+        )
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._orders: Dict[str, Order] = {}
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, client_order_id: str) -> bool:
+        return client_order_id in self._orders
+
+    def orders(self) -> List[Order]:
+        return list(self._orders.values())
+
+    def get(self, client_order_id: str) -> Optional[Order]:
+        return self._orders.get(client_order_id)
+
+    def to_tick(self, price: float) -> int:
+        return int(round(price / self.tick_size))
+
+    def add(self, order: Order) -> None:
+        if order.client_order_id in self._orders:
+            raise ValueError("Order {} already in book".format(order.client_order_id))
+        if order.order_type == OrderType.limit:
+            kind = BUY_LIMIT if order.side == 1 else SELL_LIMIT
+        elif order.order_type == OrderType.trigger:
+            kind = BUY_STOP if order.side == 1 else SELL_STOP
+        else:
+            raise ValueError("Cannot rest a {} order".format(order.order_type))
+        tick = self.to_tick(order.price)
+        self._sides[kind].add(tick, order)
+        self._index[order.client_order_id] = (kind, tick)
+        self._orders[order.client_order_id] = order
+
+    def cancel(self, client_order_id: str) -> Optional[Order]:
+        """
+        Remove an order, returns it or None if it isn't in the book.
+        """
+        order = self._orders.pop(client_order_id, None)
+        if order is not None:
+            kind, tick = self._index.pop(client_order_id)
+            self._sides[kind].remove(tick, client_order_id)
+        return order
+
+    def amend(self, order: Order) -> None:
+        """
+        Move ``order`` (already updated in place) to its new price, at the
+        back of the queue like an exchange does.
+        """
+        self.cancel(order.client_order_id)
+        self.add(order)
+
+    def match(self, bid: float, ask: float) -> Iterator[Fill]:
+        """
+        Fills against a quote, or a trade with ``bid == ask``. Limit orders
+        fill at their price, stop orders at the quote.
+        """
+        return self._sweep(bid, ask, limit_at_touch=False, stop_at_touch=True)
+
+    def sweep_candle(
+        self, open_: float, high: float, low: float, close: float
+    ) -> Iterator[Fill]:
+        """
+        Fills along the path of a candle: the open, then the extreme closer
+        to the open, the other extreme and the close. Orders crossed by a gap
+        at the open fill at the open, others at their (stop) price.
+        """
+        yield from self._sweep(open_, open_, limit_at_touch=True, stop_at_touch=True)
+        if high - open_ < open_ - low:
+            path = (high, low, close)
+        else:
+            path = (low, high, close)
+        for price in path:
+            yield from self._sweep(
+                price, price, limit_at_touch=False, stop_at_touch=False
+            )
+
+    def _sweep(
+        self, bid: float, ask: float, limit_at_touch: bool, stop_at_touch: bool
+    ) -> Iterator[Fill]:
+        ask_tick = self.to_tick(ask)
+        bid_tick = self.to_tick(bid)
+        for kind, tick, touch, at_touch in (
+            (BUY_LIMIT, ask_tick, ask, limit_at_touch),
+            (SELL_LIMIT, bid_tick, bid, limit_at_touch),
+            (BUY_STOP, ask_tick, ask, stop_at_touch),
+            (SELL_STOP, bid_tick, bid, stop_at_touch),
+        ):
+            side = self._sides[kind]
+            # Heap keys are ticks times sign, a level is crossed when its key
+            # is at most the key of the touch
+            limit = side.sign * tick
+            while side.heap and side.heap[0] <= limit:
+                top = side.top()
+                if top is None or side.sign * top > limit:
+                    break
+                order = self.cancel(next(iter(side.levels[top])))
+                yield Fill(order, touch if at_touch else order.price, kind < BUY_STOP)
@@ -0,0 +1,804 @@
+"""
+A local stand-in for the Binance USDⓈ-M futures REST API.
+
+Only the endpoints used by the bot are implemented. Responses follow the shapes
+documented at https://binance-docs.github.io/apidocs/futures/en/ closely enough
+for ccxt to parse them, so an Exchange instance can be pointed at the server
+(see ``point_to``) to benchmark throughput and failure handling offline.
+
+Run standalone with::
+
+    python -m bot.exchanges.mock_binance --port 8765 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import logging
+import random
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+PERIOD_MILLISECONDS = {
+    "1m": 60 * 1000,
+    "3m": 3 * 60 * 1000,
+    "5m": 5 * 60 * 1000,
+    "15m": 15 * 60 * 1000,
+    "30m": 30 * 60 * 1000,
+    "1h": 60 * 60 * 1000,
+    "2h": 2 * 60 * 60 * 1000,
+    "4h": 4 * 60 * 60 * 1000,
+    "1d": 24 * 60 * 60 * 1000,
+}
+
+DEFAULT_SYMBOLS = {
+    # symbol: (base asset, quote asset, initial price, tick size, step size)
+    "ETHUSDT": ("ETH", "USDT", 350.0, "0.01", "0.001"),
+    "BTCUSDT": ("BTC", "USDT", 11000.0, "0.01", "0.001"),
+}
+
+
+def _precision(step: str) -> int:
+    return len(step.rstrip("0").partition(".")[2])
+
+
+class MockBinanceFutures:
+    """
+    In-memory futures venue served over aiohttp.
+
+    ``latency`` is the mean delay (seconds) added to every request, with
+    ``jitter`` as its uniform spread. ``error_rate`` is the probability that a
+    request fails; failures alternate between HTTP 503 and Binance style
+    ``{"code": -1001, ...}`` errors so both ccxt NetworkError and ExchangeError
+    paths are exercised. ``lost_rate`` is the probability that a request is
+    processed but answered with a -1007 timeout, as Binance does when the
+    execution status is unknown. ``endpoint_overrides`` maps a path to a dict
+    with any of these keys to tune a single endpoint.
+
+    Signed endpoints need the X-MBX-APIKEY header and, if ``secret`` is set,
+    a valid HMAC SHA256 ``signature`` of their parameters.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        lost_rate: float = 0.0,
+        endpoint_overrides: Optional[Dict[str, Dict[str, float]]] = None,
+        symbols: Optional[Dict[str, tuple]] = None,
+        balance: float = 10000.0,
+        secret: Optional[str] = None,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.lost_rate = lost_rate
+        self.endpoint_overrides = endpoint_overrides or {}
+        self.secret = secret
+        self._random = random.Random(seed)
+        self._symbols = symbols or DEFAULT_SYMBOLS
+        self._prices = {s: spec[2] for s, spec in self._symbols.items()}
+        self._balance = balance
+        self._orders: Dict[str, Dict[int, Dict[str, Any]]] = {
+            s: {} for s in self._symbols
+        }
+        self._positions: Dict[str, Dict[str, float]] = {
+            s: {"amount": 0.0, "entry_price": 0.0} for s in self._symbols
+        }
+        # Every order ever created, open or not, for order queries
+        self._history: Dict[str, Dict[int, Dict[str, Any]]] = {
+            s: {} for s in self._symbols
+        }
+        self._order_ids = itertools.count(1)
+        self.request_count: Dict[str, int] = {}
+        # Seconds between two websocket market stream events
+        self.stream_interval = 0.1
+        self._stream_candles: Dict[tuple, Dict[str, Any]] = {}
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._middleware])
+        app.add_routes(
+            [
+                web.get("/fapi/v1/ping", self.ping),
+                web.get("/fapi/v1/time", self.server_time),
+                web.get("/fapi/v1/exchangeInfo", self.exchange_info),
+                web.get("/fapi/v1/klines", self.klines),
+                web.get("/fapi/v1/ticker/24hr", self.ticker),
+                web.get("/fapi/v1/ticker/price", self.ticker_price),
+                web.get("/fapi/v1/ticker/bookTicker", self.book_ticker),
+                web.get("/fapi/v1/depth", self.depth),
+                web.get("/fapi/v1/positionRisk", self.position_risk),
+                web.get("/fapi/v2/positionRisk", self.position_risk),
+                web.get("/fapi/v3/positionRisk", self.position_risk),
+                web.get("/fapi/v1/openOrders", self.open_orders),
+                web.get("/fapi/v1/order", self.query_order),
+                web.post("/fapi/v1/order", self.create_order),
+                web.put("/fapi/v1/order", self.modify_order),
+                web.delete("/fapi/v1/order", self.cancel_order),
+                web.delete("/fapi/v1/allOpenOrders", self.cancel_all_orders),
+                web.get("/fapi/v2/balance", self.balance),
+                web.get("/fapi/v2/account", self.account),
+                web.get("/fapi/v3/account", self.account),
+                web.get("/ws/{stream}", self.market_stream),
+                web.post("/_mock/config", self.update_config),
+                web.get("/_mock/stats", self.stats),
+            ]
+        )
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        base_url = "http://{}:{}".format(host, port)
+        logger.info("Mock binance futures server listening on %s", base_url)
+        return base_url
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def set_price(self, symbol: str, price: float) -> None:
+        self._prices[symbol] = price
+        self._match(symbol)
+
+    # Middleware: latency, error injection and accounting
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler):
+        path = request.path
+        self.request_count[path] = self.request_count.get(path, 0) + 1
+        if path.startswith("/_mock/"):
+            return await handler(request)
+
+        override = self.endpoint_overrides.get(path, {})
+        latency = override.get("latency", self.latency)
+        jitter = override.get("jitter", self.jitter)
+        error_rate = override.get("error_rate", self.error_rate)
+        lost_rate = override.get("lost_rate", self.lost_rate)
+
+        delay = latency + self._random.uniform(-jitter, jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if error_rate and self._random.random() < error_rate:
+            if self._random.random() < 0.5:
+                return web.json_response(
+                    {"code": -1001, "msg": "Internal error; unable to process."},
+                    status=503,
+                )
+            raise web.HTTPServiceUnavailable(text="Service Unavailable")
+
+        if path.startswith(("/fapi/v1/order", "/fapi/v1/open", "/fapi/v1/all")) or (
+            "/positionRisk" in path or "/balance" in path or "/account" in path
+        ):
+            if not request.headers.get("X-MBX-APIKEY"):
+                return self._error(-2014, "API-key format invalid.", status=401)
+            if self.secret is not None and not await self._signed(request):
+                return self._error(
+                    -1022, "Signature for this request is not valid.", status=401
+                )
+
+        response = await handler(request)
+        if lost_rate and self._random.random() < lost_rate:
+            return self._error(
+                -1007,
+                "Timeout waiting for response from backend server. "
+                "Send status unknown; execution status unknown.",
+                status=503,
+            )
+        return response
+
+    async def _signed(self, request: web.Request) -> bool:
+        # The signature ends the query string, or the body of POST requests
+        payload = request.query_string
+        if "signature=" not in payload and request.can_read_body:
+            payload = await request.text()
+        payload, _, signature = payload.rpartition("&signature=")
+        expected = hmac.new(
+            self.secret.encode(), payload.encode(), hashlib.sha256
+        ).hexdigest()
+        return hmac.compare_digest(signature, expected)
+
+    @staticmethod
+    def _error(code: int, msg: str, status: int = 400) -> web.Response:
+        return web.json_response({"code": code, "msg": msg}, status=status)
+
+    async def _params(self, request: web.Request) -> Dict[str, str]:
+        params = dict(request.query)
+        if request.can_read_body:
+            params.update(await request.post())
+        return params
+
+    def _step(self, symbol: str) -> float:
+        # Random walk, so consecutive candles and tickers are not identical
+        price = self._prices[symbol]
+        price *= 1 + self._random.gauss(0, 0.0005)
+        tick = float(self._symbols[symbol][3])
+        self._prices[symbol] = round(round(price / tick) * tick, 8)
+        self._match(symbol)
+        return self._prices[symbol]
+
+    # Public endpoints
+
+    async def ping(self, request):
+        return web.json_response({})
+
+    async def server_time(self, request):
+        return web.json_response({"serverTime": int(time.time() * 1000)})
+
+    async def exchange_info(self, request):
+        symbols = []
+        for symbol, (base, quote, _, tick, step) in self._symbols.items():
+            symbols.append(
+                {
+                    "symbol": symbol,
+                    "pair": symbol,
+                    "contractType": "PERPETUAL",
+                    "deliveryDate": 4133404800000,
+                    "onboardDate": 1569398400000,
+                    "status": "TRADING",
+                    "baseAsset": base,
+                    "quoteAsset": quote,
+                    "marginAsset": quote,
+                    "pricePrecision": _precision(tick),
+                    "quantityPrecision": _precision(step),
+                    "baseAssetPrecision": 8,
+                    "quotePrecision": 8,
+                    "underlyingType": "COIN",
+                    "filters": [
+                        {
+                            "filterType": "PRICE_FILTER",
+                            "minPrice": tick,
+                            "maxPrice": "1000000",
+                            "tickSize": tick,
+                        },
+                        {
+                            "filterType": "LOT_SIZE",
+                            "minQty": step,
+                            "maxQty": "10000",
+                            "stepSize": step,
+                        },
+                        {
+                            "filterType": "MARKET_LOT_SIZE",
+                            "minQty": step,
+                            "maxQty": "10000",
+                            "stepSize": step,
+                        },
+                        {"filterType": "MIN_NOTIONAL", "notional": "5"},
+                    ],
+                    "orderTypes": ["LIMIT", "MARKET", "STOP_MARKET"],
+                    "timeInForce": ["GTC", "IOC", "FOK", "GTX"],
+                }
+            )
+        return web.json_response(
+            {
+                "timezone": "UTC",
+                "serverTime": int(time.time() * 1000),
+                "rateLimits": [],
+                "exchangeFilters": [],
+                "assets": [],
+                "symbols": symbols,
+            }
+        )
+
+    async def klines(self, request):
+        symbol = request.query["symbol"]
+        if symbol not in self._prices:
+            return self._error(-1121, "Invalid symbol.")
+        period = PERIOD_MILLISECONDS[request.query.get("interval", "1m")]
+        limit = min(int(request.query.get("limit", 500)), 1500)
+        now = int(time.time() * 1000)
+        open_time = now - now % period - (limit - 1) * period
+
+        # Deterministic per (symbol, candle open time) so repeated calls agree,
+        # across processes too: hash() of strings is randomized per process
+        key = "{}:{}:{}".format(symbol, open_time, period)
+        rng = random.Random(zlib.crc32(key.encode()))
+        price = self._prices[symbol]
+        candles = []
+        for i in range(limit):
+            o = price
+            c = o * (1 + rng.gauss(0, 0.001))
+            h = max(o, c) * (1 + abs(rng.gauss(0, 0.0005)))
+            lo = min(o, c) * (1 - abs(rng.gauss(0, 0.0005)))
+            t = open_time + i * period
+            candles.append(
+                [
+                    t,
+                    "%.2f" % o,
+                    "%.2f" % h,
+                    "%.2f" % lo,
+                    "%.2f" % c,
+                    "%.3f" % rng.uniform(10, 1000),
+                    t + period - 1,
+                    "0",
+                    100,
+                    "0",
+                    "0",
+                    "0",
+                ]
+            )
+            price = c
+        return web.json_response(candles)
+
+    async def ticker(self, request):
+        symbol = request.query["symbol"]
+        if symbol not in self._prices:
+            return self._error(-1121, "Invalid symbol.")
+        price = "%.2f" % self._step(symbol)
+        now = int(time.time() * 1000)
+        return web.json_response(
+            {
+                "symbol": symbol,
+                "priceChange": "0",
+                "priceChangePercent": "0",
+                "weightedAvgPrice": price,
+                "lastPrice": price,
+                "lastQty": "1",
+                "openPrice": price,
+                "highPrice": price,
+                "lowPrice": price,
+                "volume": "0",
+                "quoteVolume": "0",
+                "openTime": now - 24 * 60 * 60 * 1000,
+                "closeTime": now,
+                "firstId": 0,
+                "lastId": 0,
+                "count": 0,
+            }
+        )
+
+    async def ticker_price(self, request):
+        symbol = request.query["symbol"]
+        if symbol not in self._prices:
+            return self._error(-1121, "Invalid symbol.")
+        price = "%.2f" % self._step(symbol)
+        return web.json_response(
+            {"symbol": symbol, "price": price, "time": int(time.time() * 1000)}
+        )
+
+    async def book_ticker(self, request):
+        symbol = request.query["symbol"]
+        if symbol not in self._prices:
+            return self._error(-1121, "Invalid symbol.")
+        tick = float(self._symbols[symbol][3])
+        price = self._step(symbol)
+        return web.json_response(
+            {
+                "symbol": symbol,
+                "bidPrice": "%.2f" % price,
+                "bidQty": "10",
+                "askPrice": "%.2f" % (price + tick),
+                "askQty": "10",
+                "time": int(time.time() * 1000),
+            }
+        )
+
+    async def depth(self, request):
+        symbol = request.query["symbol"]
+        if symbol not in self._prices:
+            return self._error(-1121, "Invalid symbol.")
+        limit = int(request.query.get("limit", 20))
+        tick = float(self._symbols[symbol][3])
+        price = self._step(symbol)
+        now = int(time.time() * 1000)
+        return web.json_response(
+            {
+                "lastUpdateId": now,
+                "E": now,
+                "T": now,
+                "bids": [["%.2f" % (price - i * tick), "10.000"] for i in range(limit)],
+                "asks": [
+                    ["%.2f" % (price + (i + 1) * tick), "10.000"] for i in range(limit)
+                ],
+            }
+        )
+
+    # Private endpoints
+
+    async def position_risk(self, request):
+        symbol = request.query.get("symbol") or request.query.get("pair")
+        ret = []
+        for s, position in self._positions.items():
+            if symbol and s != symbol:
+                continue
+            amount = position["amount"]
+            entry = position["entry_price"]
+            mark = self._prices[s]
+            liq = 0.0
+            if amount > 0:
+                liq = entry * 0.5
+            elif amount < 0:
+                liq = entry * 1.5
+            ret.append(
+                {
+                    "symbol": s,
+                    "positionAmt": "%.3f" % amount,
+                    "entryPrice": "%.2f" % entry,
+                    "markPrice": "%.2f" % mark,
+                    "unRealizedProfit": "%.8f" % ((mark - entry) * amount),
+                    "liquidationPrice": "%.2f" % liq,
+                    "leverage": "10",
+                    "maxNotionalValue": "1000000",
+                    "marginType": "cross",
+                    "isolatedMargin": "0",
+                    "isAutoAddMargin": "false",
+                    "positionSide": "BOTH",
+                    "notional": "%.8f" % (mark * amount),
+                    "isolatedWallet": "0",
+                    "updateTime": int(time.time() * 1000),
+                }
+            )
+        return web.json_response(ret)
+
+    async def open_orders(self, request):
+        symbol = request.query.get("symbol")
+        orders: List[Dict[str, Any]] = []
+        for s, book in self._orders.items():
+            if symbol and s != symbol:
+                continue
+            orders.extend(book.values())
+        return web.json_response(orders)
+
+    def _find_order(self, params, history: bool = False) -> Optional[Dict[str, Any]]:
+        books = self._history if history else self._orders
+        book = books.get(params.get("symbol"), {})
+        if "orderId" in params:
+            return book.get(int(params["orderId"]))
+        client_order_id = params.get("origClientOrderId")
+        for order in book.values():
+            if order["clientOrderId"] == client_order_id:
+                return order
+        return None
+
+    async def query_order(self, request):
+        order = self._find_order(request.query, history=True)
+        if order is None:
+            return self._error(-2013, "Order does not exist.")
+        return web.json_response(order)
+
+    async def create_order(self, request):
+        params = await self._params(request)
+        symbol = params.get("symbol")
+        if symbol not in self._orders:
+            return self._error(-1121, "Invalid symbol.")
+
+        client_order_id = params.get("newClientOrderId") or "mock{}".format(
+            self._random.getrandbits(48)
+        )
+        for order in self._orders[symbol].values():
+            if order["clientOrderId"] == client_order_id:
+                return self._error(-4116, "ClientOrderId is duplicated.")
+
+        order_type = params.get("type", "LIMIT")
+        now = int(time.time() * 1000)
+        order = {
+            "orderId": next(self._order_ids),
+            "symbol": symbol,
+            "status": "NEW",
+            "clientOrderId": client_order_id,
+            "price": params.get("price", "0"),
+            "avgPrice": "0.00000",
+            "origQty": params.get("quantity", "0"),
+            "executedQty": "0",
+            "cumQuote": "0",
+            "timeInForce": params.get("timeInForce", "GTC"),
+            "type": order_type,
+            "origType": order_type,
+            "reduceOnly": params.get("reduceOnly", "false") == "true",
+            "closePosition": False,
+            "side": params.get("side"),
+            "positionSide": "BOTH",
+            "stopPrice": params.get("stopPrice", "0"),
+            "workingType": "CONTRACT_PRICE",
+            "priceProtect": False,
+            "time": now,
+            "updateTime": now,
+        }
+        self._history[symbol][order["orderId"]] = order
+        if order_type == "MARKET":
+            self._fill(order, self._prices[symbol])
+        else:
+            self._orders[symbol][order["orderId"]] = order
+            self._match(symbol)
+        return web.json_response(order)
+
+    async def modify_order(self, request):
+        params = await self._params(request)
+        order = self._find_order(params)
+        if order is None:
+            return self._error(-2013, "Order does not exist.")
+        if order["type"] != "LIMIT":
+            return self._error(-4028, "Only limit orders can be modified.")
+        order["price"] = params.get("price", order["price"])
+        order["origQty"] = params.get("quantity", order["origQty"])
+        order["updateTime"] = int(time.time() * 1000)
+        self._match(order["symbol"])
+        return web.json_response(order)
+
+    async def cancel_order(self, request):
+        params = await self._params(request)
+        order = self._find_order(params)
+        if order is None:
+            return self._error(-2011, "Unknown order sent.")
+        del self._orders[order["symbol"]][order["orderId"]]
+        order["status"] = "CANCELED"
+        return web.json_response(order)
+
+    async def cancel_all_orders(self, request):
+        params = await self._params(request)
+        symbol = params.get("symbol")
+        if symbol not in self._orders:
+            return self._error(-1121, "Invalid symbol.")
+        self._orders[symbol].clear()
+        return web.json_response(
+            {"code": 200, "msg": "The operation of cancel all open order is done."}
+        )
+
+    async def balance(self, request):
+        return web.json_response(
+            [
+                {
+                    "accountAlias": "mock",
+                    "asset": "USDT",
+                    "balance": "%.8f" % self._balance,
+                    "crossWalletBalance": "%.8f" % self._balance,
+                    "crossUnPnl": "0",
+                    "availableBalance": "%.8f" % self._balance,
+                    "maxWithdrawAmount": "%.8f" % self._balance,
+                    "marginAvailable": True,
+                    "updateTime": int(time.time() * 1000),
+                }
+            ]
+        )
+
+    async def account(self, request):
+        balance = "%.8f" % self._balance
+        now = int(time.time() * 1000)
+        return web.json_response(
+            {
+                "totalWalletBalance": balance,
+                "totalMarginBalance": balance,
+                "availableBalance": balance,
+                "canTrade": True,
+                "updateTime": now,
+                "assets": [
+                    {
+                        "asset": "USDT",
+                        "walletBalance": balance,
+                        "unrealizedProfit": "0",
+                        "marginBalance": balance,
+                        "availableBalance": balance,
+                        "crossWalletBalance": balance,
+                        "maxWithdrawAmount": balance,
+                        "initialMargin": "0",
+                        "updateTime": now,
+                    }
+                ],
+                "positions": [],
+            }
+        )
+
+    # Mock control endpoints
+
+    async def update_config(self, request):
+        data = await request.json()
+        for key in ("latency", "jitter", "error_rate", "lost_rate"):
+            if key in data:
+                setattr(self, key, float(data[key]))
+        if "endpoint_overrides" in data:
+            self.endpoint_overrides = data["endpoint_overrides"]
+        return web.json_response(
+            {
+                "latency": self.latency,
+                "jitter": self.jitter,
+                "error_rate": self.error_rate,
+                "lost_rate": self.lost_rate,
+                "endpoint_overrides": self.endpoint_overrides,
+            }
+        )
+
+    async def stats(self, request):
+        return web.json_response({"requests": self.request_count})
+
+    # Websocket market streams
+
+    async def market_stream(self, request):
+        symbol, _, name = request.match_info["stream"].partition("@")
+        symbol = symbol.upper()
+        if symbol not in self._prices:
+            return self._error(-1121, "Invalid symbol.")
+        if name not in ("aggTrade", "bookTicker") and not (
+            name.startswith("kline_") and name[6:] in PERIOD_MILLISECONDS
+        ):
+            return self._error(-1100, "Invalid stream.")
+
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        while not ws.closed:
+            await ws.send_json(self._stream_event(symbol, name))
+            await asyncio.sleep(self.stream_interval)
+        return ws
+
+    def _stream_event(self, symbol: str, name: str) -> Dict[str, Any]:
+        price = self._step(symbol)
+        now = int(time.time() * 1000)
+        if name == "aggTrade":
+            return {
+                "e": "aggTrade",
+                "E": now,
+                "s": symbol,
+                "p": "%.2f" % price,
+                "q": "1.000",
+                "T": now,
+                "m": False,
+            }
+        if name == "bookTicker":
+            tick = float(self._symbols[symbol][3])
+            return {
+                "e": "bookTicker",
+                "E": now,
+                "T": now,
+                "s": symbol,
+                "b": "%.2f" % price,
+                "B": "10",
+                "a": "%.2f" % (price + tick),
+                "A": "10",
+            }
+
+        interval = name[6:]
+        period = PERIOD_MILLISECONDS[interval]
+        start = now - now % period
+        candle = self._stream_candles.get((symbol, interval))
+        if candle is None or candle["t"] != start:
+            candle = self._stream_candles[(symbol, interval)] = {
+                "t": start,
+                "o": price,
+                "h": price,
+                "l": price,
+                "v": 0.0,
+            }
+        candle["h"] = max(candle["h"], price)
+        candle["l"] = min(candle["l"], price)
+        candle["v"] += 1.0
+        return {
+            "e": "kline",
+            "E": now,
+            "s": symbol,
+            "k": {
+                "t": start,
+                "T": start + period - 1,
+                "s": symbol,
+                "i": interval,
+                "o": "%.2f" % candle["o"],
+                "h": "%.2f" % candle["h"],
+                "l": "%.2f" % candle["l"],
+                "c": "%.2f" % price,
+                "v": "%.3f" % candle["v"],
+                "x": False,
+            },
+        }
+
+    # Matching
+
+    def _match(self, symbol: str) -> None:
+        price = self._prices[symbol]
+        book = self._orders[symbol]
+        for order_id, order in list(book.items()):
+            side = 1 if order["side"] == "BUY" else -1
+            if order["type"] == "LIMIT":
+                limit = float(order["price"])
+                if (side == 1 and price <= limit) or (side == -1 and price >= limit):
+                    del book[order_id]
+                    self._fill(order, limit)
+            else:
+                stop = float(order["stopPrice"])
+                if (side == 1 and price >= stop) or (side == -1 and price <= stop):
+                    del book[order_id]
+                    self._fill(order, price)
+
+    def _fill(self, order: Dict[str, Any], price: float) -> None:
+        side = 1 if order["side"] == "BUY" else -1
+        qty = float(order["origQty"])
+        position = self._positions[order["symbol"]]
+        amount = position["amount"]
+        if order["reduceOnly"]:
+            qty = min(qty, abs(amount)) if amount * side < 0 else 0.0
+
+        new_amount = amount + side * qty
+        if amount * side >= 0 and new_amount != 0:
+            # Opening or adding
+            position["entry_price"] = (
+                abs(amount) * position["entry_price"] + qty * price
+            ) / abs(new_amount)
+        else:
+            # Reducing, closing or flipping
+            closed = min(qty, abs(amount))
+            self._balance += closed * (price - position["entry_price"]) * -side
+            if abs(new_amount) > 0 and new_amount * amount < 0:
+                position["entry_price"] = price
+        if new_amount == 0:
+            position["entry_price"] = 0.0
+        position["amount"] = round(new_amount, 8)
+
+        order["status"] = "FILLED"
+        order["executedQty"] = "%.3f" % qty
+        order["avgPrice"] = "%.5f" % price
+        order["updateTime"] = int(time.time() * 1000)
+
+
+def point_to(exchange, base_url: str) -> None:
+    """
+    Redirect a Binance exchange instance (ccxt backed or native) to
+    ``base_url``.
+    """
+    exchange.ws_base_url = base_url.replace("http", "ws", 1) + "/ws/"
+    client = getattr(exchange, "_client", None)
+    if client is not None:
+        client.base_url = base_url
+        return
+
+    ccxt_exchange = exchange._ccxt_exchange
+    api = dict(ccxt_exchange.urls["api"])
+    for key, url in api.items():
+        if isinstance(url, str) and url.startswith("https://fapi.binance.com"):
+            api[key] = url.replace("https://fapi.binance.com", base_url)
+    ccxt_exchange.urls["api"] = api
+    ccxt_exchange.options["fetchMarkets"] = ["linear"]
+    ccxt_exchange.options["fetchCurrencies"] = False
+    ccxt_exchange.aiohttp_proxy = None
+    ccxt_exchange.aiohttp_trust_env = False
+
+
+async def _serve(args):
+    server = MockBinanceFutures(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        lost_rate=args.lost_rate,
+        seed=args.seed,
+    )
+    await server.start(host=args.host, port=args.port)
+    try:
+        while True:
+            await asyncio.sleep(3600)
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a mock binance futures server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--lost-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,557 @@
+"""
+Paper trading: live market data, simulated orders.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from bot.enums import OrderType
+from bot.exceptions import ExchangeException, OrderNotFound
+from bot.exchanges.base import Exchange
+from bot.exchanges.matching import OrderBook
+from bot.records import Candles, Order, OrderBookTicker, Position
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["PaperExchange", "PaperMarket", "shared_market"]
+
+
+class PaperMarket:
+    """
+    Public market data of a real exchange adapter, shared by paper robots.
+
+    Quotes and last prices are cached ``ttl`` seconds per pair, and
+    concurrent requests for a stale value wait for a single upstream call, so
+    dozens of paper robots on a pair cost one request per ``ttl``.
+    """
+
+    def __init__(self, exchange: Exchange, ttl: float = 1.0):
+        self.exchange = exchange
+        self.ttl = ttl
+        self._cache: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        self._pending: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._prepared: Optional[asyncio.Future] = None
+        self._users = 0
+
+    async def quote(self, pair: str) -> OrderBookTicker:
+        return await self._cached(
+            ("ticker", pair), lambda: self.exchange.fetch_order_book_ticker(pair)
+        )
+
+    async def last_price(self, pair: str) -> float:
+        return await self._cached(
+            ("price", pair), lambda: self.exchange.fetch_last_price(pair)
+        )
+
+    async def _cached(self, key: Tuple[str, str], fetch: Callable[[], Awaitable]):
+        cached = self._cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = self._pending[key] = asyncio.get_event_loop().create_future()
+        try:
+            value = await fetch()
+        except BaseException as exc:
+            pending.set_exception(exc)
+            pending.exception()
+            raise
+        else:
+            self._cache[key] = (time.monotonic(), value)
+            pending.set_result(value)
+            return value
+        finally:
+            del self._pending[key]
+
+    async def prepare(self) -> None:
+        self._users += 1
+        if self._prepared is None:
+            self._prepared = asyncio.ensure_future(self.exchange.prepare())
+        await asyncio.shield(self._prepared)
+
+    async def close(self) -> None:
+        self._users -= 1
+        if self._users <= 0:
+            self._prepared = None
+            await self.exchange.close()
+
+
+_markets: Dict[Tuple[type, str, bool], PaperMarket] = {}
+
+
+def shared_market(
+    exchange_cls, market_type: str, test_net: bool = False, ttl: float = 1.0
+) -> PaperMarket:
+    """
+    The PaperMarket of ``exchange_cls`` for ``market_type``, one per process.
+    """
+    key = (exchange_cls, market_type, test_net)
+    market = _markets.get(key)
+    if market is None:
+        exchange = exchange_cls()
+        exchange.set_market_type(market_type=market_type)
+        if test_net:
+            exchange.use_test_net()
+        market = _markets[key] = PaperMarket(exchange, ttl=ttl)
+    return market
+
+
+class PaperExchange(Exchange):
+    """
+    Exchange adapter trading on paper against live prices.
+
+    Market data comes from ``market``. Orders, fills, balance and the
+    position (one-way mode, cross margin, linear contracts) are simulated
+    locally: resting orders sit in an OrderBook per pair, matched against the
+    quote every time the robot calls the exchange. A buy limit fills at its price once the ask
+    reaches it, a buy stop triggers once the ask reaches its stop price and
+    fills at the ask, and symmetrically for sells. Price moves between two
+    quotes are not seen.
+    """
+
+    ccxt_exchange_id = None
+
+    def __init__(
+        self,
+        market: PaperMarket,
+        *,
+        balance: float = 10000.0,
+        leverage: float = 20.0,
+        maker_fee: float = 0.0002,
+        taker_fee: float = 0.0004,
+        maintenance_margin_rate: float = 0.004,
+    ):
+        self.market = market
+        self.code = market.exchange.code
+        self.name = "Paper {}".format(market.exchange.name)
+        self.leverage = leverage
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.maintenance_margin_rate = maintenance_margin_rate
+        self._balance = balance
+        self._positions: Dict[str, Position] = {}
+        self._books: Dict[str, OrderBook] = {}
+        self._history: Dict[str, Order] = {}
+        self._order_ids = itertools.count(1)
+        self.fill_count = 0
+        self.fees = 0.0
+        self.realized_pnl = 0.0
+        self.liquidation_count = 0
+
+    @classmethod
+    def from_config(
+        cls, market: PaperMarket, config: Optional[Dict[str, Any]] = None
+    ) -> "PaperExchange":
+        """
+        Build from the optional "paperTrading" section of config.json, e.g.
+        ``{"balance": 10000, "leverage": 20, "makerFee": 0.0002}``.
+        """
+        config = config or {}
+        return cls(
+            market,
+            balance=config.get("balance", 10000.0),
+            leverage=config.get("leverage", 20.0),
+            maker_fee=config.get("makerFee", 0.0002),
+            taker_fee=config.get("takerFee", 0.0004),
+            maintenance_margin_rate=config.get("maintenanceMarginRate", 0.004),
+        )
+
+    # Market data
+
+    async def fetch_last_price(self, pair: str) -> float:
+        return await self.market.last_price(pair)
+
+    async def fetch_order_book_ticker(self, pair: str) -> OrderBookTicker:
+        quote = await self.market.quote(pair)
+        self._match(pair, quote)
+        return quote
+
+    async def fetch_candles(self, pair: str, period: str) -> Candles:
+        return await self.market.exchange.fetch_candles(pair=pair, period=period)
+
+    def market_key(self) -> Tuple[Hashable, ...]:
+        return self.market.exchange.market_key()
+
+    def is_retryable(self, exc: BaseException) -> bool:
+        # Only market data comes from the exchange
+        return self.market.exchange.is_retryable(exc)
+
+    def stream_url(self, pair: str, stream: str) -> Optional[str]:
+        return self.market.exchange.stream_url(pair, stream)
+
+    def parse_stream_message(self, stream: str, message: Dict[str, Any]) -> Any:
+        return self.market.exchange.parse_stream_message(stream, message)
+
+    def price_precision(self, pair: str) -> int:
+        return self.market.exchange.price_precision(pair)
+
+    def price_ticker(self, pair: str):
+        return self.market.exchange.price_ticker(pair)
+
+    def qty_precision(self, pair: str) -> int:
+        return self.market.exchange.qty_precision(pair)
+
+    def get_trigger_order_extras(self, trigger_price: float):
+        return self.market.exchange.get_trigger_order_extras(trigger_price)
+
+    def get_tp_order_extras(self):
+        return self.market.exchange.get_tp_order_extras()
+
+    # Account
+
+    async def fetch_total_balance(self, currency: str) -> float:
+        return self._balance
+
+    async def fetch_position(self, pair: str) -> Position:
+        quote = await self._sync(pair)
+        return self.mark_position(pair, (quote.ask0 + quote.bid0) / 2)
+
+    async def fetch_current_orders(self, pair: str) -> List[Order]:
+        await self._sync(pair)
+        return self._book(pair).orders()
+
+    async def cancel_current_orders(self, pair: str):
+        for order in self._book(pair).orders():
+            self._close_order(order)
+
+    async def place_order(
+        self,
+        *,
+        pair: str,
+        order_type: OrderType,
+        side: int,
+        qty,
+        price=None,
+        extras=None,
+        client_order_id: Optional[str] = None,
+    ) -> Order:
+        quote = await self._sync(pair)
+        order = self._new_order(
+            pair, order_type, side, qty, price, extras, client_order_id
+        )
+        self._submit(order, quote)
+        return order
+
+    async def cancel_order(self, pair: str, client_order_id: str):
+        order = self._book(pair).get(client_order_id)
+        if order is None:
+            raise OrderNotFound("Unknown order {}".format(client_order_id))
+        self._close_order(order)
+
+    async def fetch_order(self, pair: str, client_order_id: str) -> Optional[Order]:
+        order = self._book(pair).get(client_order_id)
+        return order or self._history.get(client_order_id)
+
+    async def modify_order(self, order: Order, new: Order) -> Order:
+        book = self._book(order.pair)
+        current = book.get(order.client_order_id)
+        if current is None:
+            raise OrderNotFound("Unknown order {}".format(order.client_order_id))
+        if not self.amendable(current, new):
+            return await super().modify_order(current, new)
+        current.price = new.price
+        current.qty = new.qty
+        current.timestamp = int(time.time() * 1000)
+        book.amend(current)
+        self._match(current.pair, await self.market.quote(current.pair))
+        return current
+
+    def auth(self, credential_key: Dict[str, str]) -> None:
+        # Credentials are never needed, nor sent anywhere
+        pass
+
+    def use_test_net(self) -> None:
+        pass
+
+    def set_market_type(self, market_type: str):
+        pass
+
+    async def prepare(self):
+        await self.market.prepare()
+
+    async def close(self):
+        await self.market.close()
+
+    @property
+    def balance(self) -> float:
+        return self._balance
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "balance": round(self._balance, 8),
+            "fills": self.fill_count,
+            "fees": round(self.fees, 8),
+            "realized_pnl": round(self.realized_pnl, 8),
+            "liquidations": self.liquidation_count,
+        }
+
+    # Replay of historical candles (bot.backtest), without market data
+
+    def mark_position(self, pair: str, mark: float) -> Position:
+        """
+        A copy of the position with its unrealized P&L at ``mark``.
+        """
+        position = self._position(pair).copy()
+        if position.side:
+            position.unrealized_pnl = (
+                position.side * position.qty * (mark - position.avg_price)
+            )
+        return position
+
+    def replace_orders(
+        self, pair: str, orders: List[Order], quote: OrderBookTicker
+    ) -> int:
+        """
+        Cancel the resting orders of ``pair`` and place ``orders`` against
+        ``quote``. Returns the number of orders the exchange rejected.
+        """
+        for order in self._book(pair).orders():
+            self._close_order(order)
+        rejected = 0
+        for order in orders:
+            try:
+                self._submit(
+                    self._new_order(
+                        pair,
+                        order.order_type,
+                        order.side,
+                        order.qty,
+                        order.price,
+                        order.extras,
+                        order.client_order_id,
+                    ),
+                    quote,
+                )
+            except ExchangeException:
+                rejected += 1
+        return rejected
+
+    def sweep_candle(
+        self, pair: str, open_: float, high: float, low: float, close: float
+    ) -> None:
+        """
+        Fill resting orders along the path of a candle, see
+        OrderBook.sweep_candle. The position is liquidated after the fills if
+        the candle reached its liquidation price.
+        """
+        for fill in self._book(pair).sweep_candle(open_, high, low, close):
+            fee_rate = self.maker_fee if fill.maker else self.taker_fee
+            self._fill(fill.order, fill.price, fee_rate)
+        position = self._position(pair)
+        if position.side and position.liq_price > 0:
+            extreme = low if position.side == 1 else high
+            if (extreme - position.liq_price) * position.side <= 0:
+                self._liquidate(position, position.liq_price)
+
+    # Simulation
+
+    def _position(self, pair: str) -> Position:
+        position = self._positions.get(pair)
+        if position is None:
+            position = self._positions[pair] = Position(pair=pair)
+        return position
+
+    def _book(self, pair: str) -> OrderBook:
+        book = self._books.get(pair)
+        if book is None:
+            book = self._books[pair] = OrderBook(self.price_ticker(pair))
+        return book
+
+    async def _sync(self, pair: str) -> OrderBookTicker:
+        quote = await self.market.quote(pair)
+        self._match(pair, quote)
+        return quote
+
+    @staticmethod
+    def _crosses(order: Order, quote: OrderBookTicker) -> bool:
+        if order.side == 1:
+            return quote.ask0 <= order.price
+        return quote.bid0 >= order.price
+
+    @staticmethod
+    def _triggered(order: Order, quote: OrderBookTicker) -> bool:
+        if order.side == 1:
+            return quote.ask0 >= order.price
+        return quote.bid0 <= order.price
+
+    def _match(self, pair: str, quote: OrderBookTicker) -> None:
+        position = self._position(pair)
+        if position.side and position.liq_price > 0:
+            price = quote.bid0 if position.side == 1 else quote.ask0
+            if (price - position.liq_price) * position.side <= 0:
+                self._liquidate(position, position.liq_price)
+
+        for fill in self._book(pair).match(quote.bid0, quote.ask0):
+            fee_rate = self.maker_fee if fill.maker else self.taker_fee
+            self._fill(fill.order, fill.price, fee_rate)
+
+    def _new_order(
+        self,
+        pair: str,
+        order_type: OrderType,
+        side: int,
+        qty,
+        price,
+        extras,
+        client_order_id: Optional[str],
+    ) -> Order:
+        if client_order_id in self._book(pair) or client_order_id in self._history:
+            raise ExchangeException(
+                "Duplicate client order id {}".format(client_order_id)
+            )
+        if order_type == OrderType.trigger:
+            extras = dict(self.get_trigger_order_extras(price), **(extras or {}))
+        extras = dict(extras) if extras else {}
+        order_id = next(self._order_ids)
+        return Order(
+            pair=pair,
+            order_type=order_type,
+            side=side,
+            qty=float(qty),
+            price=None if price is None else float(price),
+            extras=extras,
+            order_id=str(order_id),
+            client_order_id=client_order_id or "paper{}".format(order_id),
+            timestamp=int(time.time() * 1000),
+        )
+
+    def _submit(self, order: Order, quote: OrderBookTicker) -> None:
+        if order.qty <= 0:
+            raise ExchangeException("Invalid quantity {}".format(order.qty))
+        if order.order_type == OrderType.trigger and self._triggered(order, quote):
+            raise ExchangeException("Order would immediately trigger")
+        if not order.extras.get("reduceOnly"):
+            self._check_margin(order, quote)
+
+        if order.order_type == OrderType.market or (
+            order.order_type == OrderType.limit and self._crosses(order, quote)
+        ):
+            # Takes liquidity at the best price
+            price = quote.ask0 if order.side == 1 else quote.bid0
+            self._fill(order, price, self.taker_fee)
+        else:
+            self._book(order.pair).add(order)
+
+    def _check_margin(self, order: Order, quote: OrderBookTicker) -> None:
+        mark = (quote.ask0 + quote.bid0) / 2
+        used = sum(
+            p.qty * p.avg_price / self.leverage for p in self._positions.values()
+        )
+        used += sum(
+            o.qty * (o.price or mark) / self.leverage
+            for book in self._books.values()
+            for o in book.orders()
+            if o.order_type == OrderType.limit and not o.extras.get("reduceOnly")
+        )
+        qty = order.qty
+        position = self._position(order.pair)
+        if position.side == -order.side:
+            # Only the part opening a position needs margin
+            qty = max(0.0, qty - position.qty)
+        required = qty * (order.price or mark) / self.leverage
+        if required > self._balance - used:
+            raise ExchangeException("Margin is insufficient")
+
+    def _fill(self, order: Order, price: float, fee_rate: float) -> None:
+        position = self._position(order.pair)
+        qty = order.qty
+        if order.extras.get("reduceOnly"):
+            if position.side != -order.side:
+                self._close_order(order)
+                return
+            qty = min(qty, position.qty)
+
+        fee = qty * price * fee_rate
+        self._balance -= fee
+        self.fees += fee
+        self.fill_count += 1
+
+        if position.side in (0, order.side):
+            total = position.qty + qty
+            position.avg_price = (
+                position.qty * position.avg_price + qty * price
+            ) / total
+            position.qty = total
+            position.side = order.side
+        else:
+            closed = min(qty, position.qty)
+            pnl = closed * (price - position.avg_price) * position.side
+            self._balance += pnl
+            self.realized_pnl += pnl
+            position.qty -= closed
+            if qty > closed:
+                # Flipped to the other side
+                position.qty = qty - closed
+                position.side = order.side
+                position.avg_price = price
+            elif position.qty <= 0:
+                position.qty = 0.0
+                position.side = 0
+                position.avg_price = 0.0
+        logger.info(
+            "Paper fill %s %s %s@%s, position %s@%s",
+            order.client_order_id,
+            order.side,
+            qty,
+            price,
+            position.side * position.qty,
+            position.avg_price,
+        )
+        self._close_order(order)
+        self._update_liq_price(position)
+        self._trim_reduce_only(position)
+
+    def _close_order(self, order: Order) -> None:
+        self._book(order.pair).cancel(order.client_order_id)
+        self._history[order.client_order_id] = order
+
+    def _update_liq_price(self, position: Position) -> None:
+        if not position.side:
+            position.liq_price = 0.0
+            return
+        # Margin balance equals maintenance margin:
+        # balance + side*qty*(p - avg) = rate*qty*p
+        side, qty = position.side, position.qty
+        liq_price = (self._balance - side * qty * position.avg_price) / (
+            qty * (self.maintenance_margin_rate - side)
+        )
+        position.liq_price = max(0.0, liq_price)
+
+    def _trim_reduce_only(self, position: Position) -> None:
+        """
+        Reduce-only orders never open a position: cancelled when flat, cut
+        down to the position otherwise.
+        """
+        for order in self._book(position.pair).orders():
+            if not order.extras.get("reduceOnly"):
+                continue
+            if position.side != -order.side:
+                self._close_order(order)
+            elif order.qty > position.qty:
+                order.qty = position.qty
+
+    def _liquidate(self, position: Position, price: float) -> None:
+        logger.warning(
+            "Paper position %s %s@%s liquidated at %s",
+            position.pair,
+            position.side * position.qty,
+            position.avg_price,
+            price,
+        )
+        pnl = position.qty * (price - position.avg_price) * position.side
+        # The maintenance margin left goes to the insurance fund
+        clearance = position.qty * price * self.maintenance_margin_rate
+        self._balance = max(0.0, self._balance + pnl - clearance)
+        self.realized_pnl += pnl
+        self.liquidation_count += 1
+        position.qty = 0.0
+        position.side = 0
+        position.avg_price = 0.0
+        position.liq_price = 0.0
+        for order in self._book(position.pair).orders():
+            self._close_order(order)
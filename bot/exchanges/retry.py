@@ -0,0 +1,272 @@
+"""
+Retries for exchange calls.
+
+Adapters turn every library error into an ExchangeException raised ``from``
+the original error, and tell from its cause chain whether the call is worth
+retrying (``Exchange.is_retryable``): network errors, timeouts, rate limits
+and 5xx answers are retried with exponential backoff, anything else (bad
+parameters, auth, insufficient margin...) is raised at once.
+
+Order creation is made idempotent by its client order id: before sending a
+create again, the order is looked up, since a create that timed out may
+well have reached the exchange.
+"""
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from bot.enums import OrderType
+from bot.exceptions import CircuitOpen, ExchangeException
+from bot.exchanges.breaker import CircuitBreaker
+from bot.metrics import Metrics, registry
+from bot.records import Order
+
+__all__ = ["RetryPolicy", "RetryingExchange"]
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff: the n-th retry waits ``base_delay * multiplier **
+    (n - 1)`` seconds, capped at ``max_delay`` and shortened by up to
+    ``jitter`` (a fraction) so robots hitting the same outage don't retry in
+    lockstep.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        multiplier: float = 2.0,
+        jitter: float = 0.5,
+        seed: Optional[int] = None,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> "RetryPolicy":
+        config = config or {}
+        policy = cls()
+        policy.max_attempts = config.get("maxAttempts", policy.max_attempts)
+        policy.base_delay = config.get("baseDelay", policy.base_delay)
+        policy.max_delay = config.get("maxDelay", policy.max_delay)
+        policy.multiplier = config.get("multiplier", policy.multiplier)
+        policy.jitter = config.get("jitter", policy.jitter)
+        return policy
+
+    def delay(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1))
+        return delay * (1 - self.jitter * self._random.random())
+
+
+class RetryingExchange:
+    """
+    Exchange wrapper retrying failed calls according to ``policy``.
+
+    Reads, cancels and order creation are retried; modify_order is not, as a
+    cancel + place fallback can't be replayed blindly, and the next trading
+    cycle amends the order again anyway. Every other attribute is the wrapped
+    exchange's.
+
+    With a ``breaker``, every attempt is accounted to it, and only the
+    ``essential_methods`` are sent while it is open.
+    """
+
+    retried_methods = frozenset(
+        {
+            "fetch_last_price",
+            "fetch_order_book_ticker",
+            "fetch_candles",
+            "fetch_total_balance",
+            "fetch_position",
+            "fetch_current_orders",
+            "fetch_order",
+            "cancel_current_orders",
+        }
+    )
+
+    # Calls keeping an open position protected
+    essential_methods = frozenset(
+        {
+            "fetch_position",
+            "fetch_current_orders",
+            "fetch_order",
+            "place_order",
+            "cancel_order",
+            "cancel_current_orders",
+            "modify_order",
+        }
+    )
+
+    def __init__(
+        self,
+        exchange,
+        policy: Optional[RetryPolicy] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        metrics: Metrics = registry,
+    ):
+        self._exchange = exchange
+        self.policy = policy or RetryPolicy()
+        self.breaker = breaker
+        self._metrics = metrics
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._exchange, name)
+        if name not in self.retried_methods:
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self._run(name, lambda n: attr(*args, **kwargs))
+
+        return method
+
+    async def place_orders_batch(self, orders: List[Order]) -> List[Order]:
+        return await asyncio.gather(
+            *(
+                self.place_order(
+                    pair=o.pair,
+                    order_type=o.order_type,
+                    side=o.side,
+                    qty=o.qty,
+                    price=o.price,
+                    extras=o.extras,
+                    client_order_id=o.client_order_id,
+                )
+                for o in orders
+            )
+        )
+
+    async def place_order(
+        self,
+        *,
+        pair: str,
+        order_type: OrderType,
+        side: int,
+        qty,
+        price=None,
+        extras=None,
+        client_order_id: Optional[str] = None,
+    ) -> Order:
+        if client_order_id is None:
+            client_order_id = "x-{}".format(uuid.uuid4().hex)
+
+        async def attempt(n: int) -> Order:
+            if n > 1:
+                placed = await self._recover(pair, client_order_id)
+                if placed is not None:
+                    return placed
+            try:
+                return await self._exchange.place_order(
+                    pair=pair,
+                    order_type=order_type,
+                    side=side,
+                    qty=qty,
+                    price=price,
+                    extras=extras,
+                    client_order_id=client_order_id,
+                )
+            except ExchangeException as exc:
+                if not self._exchange.is_duplicate_order(exc):
+                    raise
+                placed = await self._recover(pair, client_order_id)
+                if placed is None:
+                    raise
+                return placed
+
+        return await self._run("place_order", attempt)
+
+    async def cancel_order(self, pair: str, client_order_id: str):
+        async def attempt(n: int):
+            try:
+                return await self._exchange.cancel_order(pair, client_order_id)
+            except ExchangeException as exc:
+                # The previous attempt went through after all
+                if n > 1 and self._exchange.is_order_not_found(exc):
+                    return None
+                raise
+
+        return await self._run("cancel_order", attempt)
+
+    async def modify_order(self, order: Order, new: Order) -> Order:
+        return await self._run(
+            "modify_order",
+            lambda n: self._exchange.modify_order(order, new),
+            max_attempts=1,
+        )
+
+    async def _recover(self, pair: str, client_order_id: str) -> Optional[Order]:
+        placed = await self._exchange.fetch_order(pair, client_order_id)
+        if placed is not None:
+            logger.info("Order %s was placed by a failed request", client_order_id)
+            self._metrics.incr("exchange_orders_recovered")
+        return placed
+
+    async def _run(
+        self,
+        name: str,
+        attempt: Callable[[int], Awaitable],
+        max_attempts: Optional[int] = None,
+    ) -> Any:
+        max_attempts = max_attempts or self.policy.max_attempts
+        n = 1
+        while True:
+            try:
+                return await self._call(name, attempt(n))
+            except ExchangeException as exc:
+                if not self._exchange.is_retryable(exc):
+                    raise
+                if n >= max_attempts:
+                    if max_attempts > 1:
+                        self._metrics.incr("exchange_retries_exhausted")
+                    raise
+                delay = self.policy.delay(n)
+                logger.warning(
+                    "%s failed (attempt %d/%d), retrying in %.2fs: %s",
+                    name,
+                    n,
+                    max_attempts,
+                    delay,
+                    exc,
+                )
+                self._metrics.incr("exchange_retries")
+                await asyncio.sleep(delay)
+                n += 1
+
+    async def _call(self, name: str, call: Awaitable) -> Any:
+        breaker = self.breaker
+        if breaker is None:
+            return await call
+        try:
+            probe = breaker.before_call(essential=name in self.essential_methods)
+        except CircuitOpen:
+            call.close()
+            raise
+
+        started = time.monotonic()
+        try:
+            result = await call
+        except ExchangeException as exc:
+            if self._exchange.is_retryable(exc):
+                breaker.on_failure()
+            else:
+                # The exchange answered, it just didn't like the request
+                breaker.on_success(time.monotonic() - started)
+            raise
+        except BaseException:
+            # Cancelled, or failed with an unclassified error
+            if probe:
+                breaker.abort_probe()
+            raise
+        breaker.on_success(time.monotonic() - started)
+        return result
@@ -0,0 +1,309 @@
+import asyncio
+import concurrent.futures
+import logging
+import time
+from collections import namedtuple
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from bot.enums import Side
+from bot.records import Candles
+from bot.utils.math import cal_ewm
+
+logger = logging.getLogger(__name__)
+
+Indicator = namedtuple("Indicator", ["side", "rw"])
+IndicatorSpec = namedtuple("IndicatorSpec", ["name", "params"])
+
+INDICATOR_REGISTRY: Dict[str, Callable[..., Any]] = {}
+
+
+def register_indicator(name: str):
+    """
+    Register ``func(candles, **params)`` as an indicator computable by
+    IndicatorService under ``name``.
+    """
+
+    def decorator(func):
+        INDICATOR_REGISTRY[name] = func
+        return func
+
+    return decorator
+
+
+def indicator_spec(name: str, **params) -> IndicatorSpec:
+    if name not in INDICATOR_REGISTRY:
+        raise ValueError("Unknown indicator: {}".format(name))
+    return IndicatorSpec(name=name, params=tuple(sorted(params.items())))
+
+
+def compute_indicator(spec: IndicatorSpec, candles: Candles) -> Any:
+    """
+    Module level, so a process pool can run it.
+    """
+    return INDICATOR_REGISTRY[spec.name](candles, **dict(spec.params))
+
+
+def close_prices(candles: Candles) -> pd.Series:
+    return pd.Series(np.frombuffer(candles.close), copy=False)
+
+
+def _cal_indicator(prices: pd.Series) -> Indicator:
+    ema7 = cal_ewm(data=prices, span=7)
+    ema14 = cal_ewm(data=prices, span=14)
+    ema21 = cal_ewm(data=prices, span=21)
+    fu = 0
+    fd = 0
+    en1 = ema7.values[-1] * 3 - ema7.values[-2] * 2
+    en2 = ema14.values[-1] * 3 - ema14.values[-2] * 2
+    en3 = ema21.values[-1] * 3 - ema21.values[-2] * 2
+    if en1 > en2:
+        fu += 1
+    if en1 > en3:
+        fu += 1
+    if en2 > en3:
+        fu += 1
+    if en1 < en2:
+        fd += 1
+    if en1 < en3:
+        fd += 1
+    if en2 < en3:
+        fd += 1
+
+    last_price = prices.values[-1]
+    rw = (
+        max(
+            abs(ema14.values[-1] - ema7.values[-2]),
+            abs(ema21.values[-1] - ema14.values[-2]),
+            abs(ema21.values[-1] - ema7.values[-2]),
+        )
+        / last_price
+        * 100
+    )
+    side = Side.no
+    if fu == 3:
+        side = 1
+
+    if fd == 3:
+        side = -1
+
+    return Indicator(side=side, rw=rw)
+
+
+@register_indicator("trend")
+def trend_indicator(candles: Candles) -> Indicator:
+    return _cal_indicator(close_prices(candles))
+
+
+def trend_series(close: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    The trend indicator at every candle of ``close`` at once, as side and rw
+    arrays: element i is ``_cal_indicator(close[: i + 1])``. The first
+    element has no previous EMA and is side 0, rw nan.
+    """
+    prices = pd.Series(close, copy=False)
+    emas = [cal_ewm(data=prices, span=span).values for span in (7, 14, 21)]
+    previous = [np.concatenate(([np.nan], ema[:-1])) for ema in emas]
+    en1, en2, en3 = (ema * 3 - prev * 2 for ema, prev in zip(emas, previous))
+    ema7, ema14, ema21 = emas
+    prev7, prev14, _ = previous
+    rw = (
+        np.maximum.reduce(
+            [
+                np.abs(ema14 - prev7),
+                np.abs(ema21 - prev14),
+                np.abs(ema21 - prev7),
+            ]
+        )
+        / close
+        * 100
+    )
+    up = (en1 > en2) & (en1 > en3) & (en2 > en3)
+    down = (en1 < en2) & (en1 < en3) & (en2 < en3)
+    side = np.where(up, 1, np.where(down, -1, 0))
+    return side, rw
+
+
+@register_indicator("ema")
+def ema_indicator(candles: Candles, span: int) -> float:
+    return cal_ewm(data=close_prices(candles), span=span).values[-1]
+
+
+class _Entry:
+    __slots__ = ("refcount", "value", "computed_at", "pending")
+
+    def __init__(self):
+        self.refcount = 0
+        self.value = None
+        self.computed_at = float("-inf")
+        self.pending: Optional[asyncio.Future] = None
+
+
+IndicatorKey = Tuple[Hashable, str, str, IndicatorSpec]
+
+
+class IndicatorService:
+    """
+    Compute indicators once per (market, pair, period, spec) and share the
+    result between all robots of the process, the market being the exchange
+    and its endpoint (see ``Exchange.market_key``).
+
+    Robots ``subscribe`` to a key and then ``get`` it every cycle. A value
+    younger than ``ttl`` seconds is served from memory, concurrent requests
+    for a stale value wait for a single computation, and candles are fetched
+    once per (market, pair, period) whatever the number of specs. Entries
+    are evicted when their last subscriber unsubscribes.
+
+    With an ``executor``, specs whose last computation took more than
+    ``offload_threshold`` seconds are computed on it rather than on the event
+    loop. NumPy and pandas release the GIL in their kernels, so a thread pool
+    is usually enough; a process pool needs the indicators registered at
+    import time and pays for pickling the candles.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 5.0,
+        executor: Optional[concurrent.futures.Executor] = None,
+        offload_threshold: float = 0.005,
+    ):
+        self.ttl = ttl
+        self.executor = executor
+        self.offload_threshold = offload_threshold
+        self._entries: Dict[IndicatorKey, _Entry] = {}
+        self._candles: Dict[Tuple[Hashable, str, str], _Entry] = {}
+        self._costs: Dict[IndicatorSpec, float] = {}
+        self.compute_count = 0
+        self.fetch_count = 0
+        self.offload_count = 0
+
+    def configure(self, options: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Apply the optional "indicators" section of config.json:
+
+            {
+                "ttl": 5,
+                "executor": "thread",        # "none" (default), "thread" or "process"
+                "workers": 2,
+                "offloadThreshold": 0.005    # seconds
+            }
+        """
+        options = options or {}
+        self.ttl = options.get("ttl", self.ttl)
+        self.offload_threshold = options.get("offloadThreshold", self.offload_threshold)
+        kind = options.get("executor", "none")
+        workers = options.get("workers")
+        if kind == "thread":
+            executor = concurrent.futures.ThreadPoolExecutor(
+                workers, thread_name_prefix="indicators"
+            )
+        elif kind == "process":
+            executor = concurrent.futures.ProcessPoolExecutor(workers)
+        elif kind == "none":
+            executor = None
+        else:
+            raise ValueError("Unknown indicator executor: {}".format(kind))
+        self.shutdown()
+        self.executor = executor
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def close(self) -> None:
+        self.shutdown()
+
+    async def compute(self, spec: IndicatorSpec, candles: Candles) -> Any:
+        """
+        Compute ``spec`` on ``candles``, on the executor if it is costly.
+        """
+        self.compute_count += 1
+        started = time.perf_counter()
+        if self.executor is None or self._costs.get(spec, 0.0) < self.offload_threshold:
+            value = compute_indicator(spec, candles)
+        else:
+            self.offload_count += 1
+            value = await asyncio.get_event_loop().run_in_executor(
+                self.executor, compute_indicator, spec, candles
+            )
+        self._costs[spec] = time.perf_counter() - started
+        return value
+
+    def subscribe(
+        self, exchange, pair: str, period: str, spec: IndicatorSpec
+    ) -> IndicatorKey:
+        key = (exchange.market_key(), pair, period, spec)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = _Entry()
+            candles_key = key[:3]
+            if candles_key not in self._candles:
+                self._candles[candles_key] = _Entry()
+        entry.refcount += 1
+        return key
+
+    def unsubscribe(self, key: IndicatorKey) -> None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry.refcount -= 1
+        if entry.refcount > 0:
+            return
+
+        del self._entries[key]
+        candles_key = key[:3]
+        if not any(k[:3] == candles_key for k in self._entries):
+            self._candles.pop(candles_key, None)
+
+    @property
+    def keys(self):
+        return list(self._entries)
+
+    async def get(self, exchange, key: IndicatorKey) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            raise KeyError("Not subscribed: {}".format(key))
+
+        async def compute():
+            candles = await self._get_candles(exchange, key[:3])
+            return await self.compute(key[3], candles)
+
+        return await self._cached(entry, compute)
+
+    async def _get_candles(self, exchange, candles_key) -> Candles:
+        entry = self._candles[candles_key]
+
+        async def fetch():
+            self.fetch_count += 1
+            _, pair, period = candles_key
+            return await exchange.fetch_candles(pair=pair, period=period)
+
+        return await self._cached(entry, fetch)
+
+    async def _cached(self, entry: _Entry, compute: Callable) -> Any:
+        if time.monotonic() - entry.computed_at < self.ttl:
+            return entry.value
+        if entry.pending is not None:
+            return await asyncio.shield(entry.pending)
+
+        entry.pending = asyncio.get_event_loop().create_future()
+        try:
+            value = await compute()
+        except BaseException as exc:
+            entry.pending.set_exception(exc)
+            # Mark retrieved, waiters (if any) get it from shield
+            entry.pending.exception()
+            raise
+        else:
+            entry.value = value
+            entry.computed_at = time.monotonic()
+            entry.pending.set_result(value)
+            return value
+        finally:
+            entry.pending = None
+
+
+default_service = IndicatorService()
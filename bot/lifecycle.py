@@ -0,0 +1,118 @@
+"""
+Process lifecycle helpers: event loop selection, stop signals and
+bounded-time shutdown steps.
+"""
+
+import asyncio
+import importlib
+import logging
+import signal
+from typing import Any, Awaitable, Callable, Iterable, Sequence, Tuple
+
+from bot.exceptions import ImproperConfig
+
+logger = logging.getLogger(__name__)
+
+SHUTDOWN_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+EVENT_LOOPS = ("asyncio", "uvloop", "auto")
+
+
+def use_event_loop(name: str = "asyncio") -> str:
+    """
+    Install the event loop policy of ``name``: "asyncio", "uvloop" or "auto"
+    (uvloop when it is installed). Must be called before the loop is
+    created. Returns the name of the loop in use.
+
+    uvloop is optional: ``pip install uvloop``.
+    """
+    if name not in EVENT_LOOPS:
+        raise ImproperConfig(
+            "Unknown event loop {}, expected one of {}".format(name, EVENT_LOOPS)
+        )
+    if name == "asyncio":
+        asyncio.set_event_loop_policy(None)
+        return "asyncio"
+
+    try:
+        uvloop = importlib.import_module("uvloop")
+    except ImportError:
+        if name == "uvloop":
+            raise ImproperConfig("uvloop is not installed")
+        return use_event_loop("asyncio")
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return "uvloop"
+
+
+def install_signal_handlers(
+    loop: asyncio.AbstractEventLoop, callback: Callable[[int], Any]
+) -> None:
+    """
+    Call ``callback(signum)`` on the loop when the process is asked to stop,
+    instead of raising KeyboardInterrupt wherever the loop happens to be.
+    """
+    for signum in SHUTDOWN_SIGNALS:
+        try:
+            loop.add_signal_handler(signum, callback, signum)
+        except NotImplementedError:
+            # Windows event loops have no add_signal_handler
+            signal.signal(
+                signum,
+                lambda s, frame: loop.call_soon_threadsafe(callback, s),
+            )
+
+
+async def cancel_tasks(tasks: Iterable[asyncio.Task], timeout: float) -> None:
+    """
+    Cancel ``tasks`` and wait up to ``timeout`` seconds for them to finish.
+    """
+    tasks = [t for t in tasks if not t.done()]
+    for task in tasks:
+        task.cancel()
+    if not tasks:
+        return
+    _, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        logger.warning("Task %s did not stop within %ss", task.get_name(), timeout)
+
+
+async def drain_queue(
+    queue: asyncio.Queue, send: Callable[[Any], Awaitable], timeout: float
+) -> int:
+    """
+    Send the items left in ``queue`` until it is empty or ``timeout`` seconds
+    have passed. Returns the number of items dropped.
+    """
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while not queue.empty():
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        item = queue.get_nowait()
+        try:
+            await asyncio.wait_for(send(item), remaining)
+        except asyncio.TimeoutError:
+            break
+        except Exception as exc:
+            logger.warning("Failed to send %r while draining: %s", item, exc)
+
+    dropped = queue.qsize()
+    if dropped:
+        logger.warning("Dropped %d queued messages on shutdown", dropped)
+    return dropped
+
+
+async def run_bounded(
+    steps: Sequence[Tuple[str, Callable[[], Awaitable]]], timeout: float
+) -> None:
+    """
+    Run every ``(name, step)`` with ``timeout`` seconds each. A failing step
+    is logged and doesn't prevent the next ones.
+    """
+    for name, step in steps:
+        try:
+            await asyncio.wait_for(step(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%s timed out after %ss", name, timeout)
+        except Exception as exc:
+            logger.warning("%s failed: %r", name, exc)
@@ -1,7 +1,12 @@
+import copy
+import json
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
 from pathlib import Path
+from typing import Any, Dict, List, Optional
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -13,6 +18,9 @@ DEFAULT_LOGGING = {
             "format": "%(levelname)s %(asctime)s %(module)s - %(message)s",
             "datefmt": "%Y-%m-%d %H:%M:%S",
         },
+        "json": {
+            "()": "bot.log.JsonFormatter",
+        },
     },
     "handlers": {
         "console": {
@@ -42,7 +50,181 @@ DEFAULT_LOGGING = {
     },
 }
 
+# Attributes every LogRecord has, anything else was passed with `extra`
+_RECORD_ATTRS = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__.keys()) | {
+    "message",
+    "asctime",
+}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line, with `extra` fields kept as top level keys.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exc_info"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LogQueueHandler(logging.handlers.QueueHandler):
+    """
+    Enqueue records for the listener thread without formatting them.
+
+    The stock QueueHandler formats the whole record (including tracebacks) on
+    the calling thread so it can be pickled. Our queue never leaves the
+    process, so only the message arguments are merged here, freezing mutable
+    arguments, and the rest is left to the writer thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class RoutingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener dispatching each record to the handlers of its top level
+    logger, so one writer thread can serve loggers with different handlers.
+    """
+
+    def __init__(self, queue_, routes: Dict[str, List[logging.Handler]]):
+        super().__init__(queue_, respect_handler_level=True)
+        self.routes = routes
+        self.handlers = tuple({h for hs in routes.values() for h in hs})
+
+    def handle(self, record: logging.LogRecord) -> None:
+        record = self.prepare(record)
+        for handler in self.routes.get(record.name.partition(".")[0], ()):
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def stop(self) -> None:
+        super().stop()
+        for handler in self.handlers:
+            handler.flush()
+            handler.close()
+
+
+def build_logging_config(options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build a dictConfig dict from the optional "logging" section of config.json:
+
+        {
+            "json": false,               # structured output for console and file
+            "file": ".logs/bot.log",
+            "levels": {"bot": "INFO", "bot.exchanges": "DEBUG"}
+        }
+    """
+    options = options or {}
+    config = copy.deepcopy(DEFAULT_LOGGING)
+    if options.get("json"):
+        for handler in config["handlers"].values():
+            handler["formatter"] = "json"
+    if options.get("file"):
+        config["handlers"]["file"]["filename"] = options["file"]
+    for name, level in options.get("levels", {}).items():
+        logger_config = config["loggers"].setdefault(name, {})
+        logger_config["level"] = level
+    return config
+
+
+def config_logging(
+    options: Optional[Dict[str, Any]] = None,
+) -> logging.handlers.QueueListener:
+    """
+    Configure logging so that callers only pay for putting a record on a queue,
+    formatting and disk/console writes happen on a background thread.
+
+    Return the started listener, stop it on shutdown to flush pending records.
+    """
+    config = build_logging_config(options)
+    Path(config["handlers"]["file"]["filename"]).parent.mkdir(
+        parents=True, exist_ok=True
+    )
+    logging.config.dictConfig(config)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = LogQueueHandler(log_queue)
+    routes = {}
+    for name in config["loggers"]:
+        logger = logging.getLogger(name)
+        if not logger.handlers:
+            continue
+        routes[name] = logger.handlers[:]
+        for handler in routes[name]:
+            logger.removeHandler(handler)
+        logger.addHandler(queue_handler)
+
+    listener = RoutingQueueListener(log_queue, routes)
+    listener.start()
+    return listener
+
+
+class _WorkerFilter(logging.Filter):
+    def __init__(self, worker_id: int):
+        super().__init__()
+        self.worker_id = worker_id
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.worker = self.worker_id
+        return True
+
+
+class _LoggerDispatcher:
+    """
+    Handler-like object handing records over to the logger they were
+    emitted on, in this process.
+    """
+
+    level = logging.NOTSET
+
+    def handle(self, record: logging.LogRecord) -> None:
+        logging.getLogger(record.name).handle(record)
+
+
+def worker_logging(
+    log_queue, worker_id: int, options: Optional[Dict[str, Any]] = None
+) -> None:
+    """
+    Configure logging of a worker process: every record is tagged with
+    ``worker`` and put on ``log_queue``, a multiprocessing queue read by
+    ``forward_worker_logs`` in the supervisor process. Levels are those of
+    the "logging" section of config.json, handlers are the supervisor's.
+    """
+    # The stock QueueHandler formats the record so it can be pickled
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(_WorkerFilter(worker_id))
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(logging.WARNING)
+    for name, logger_config in build_logging_config(options)["loggers"].items():
+        logging.getLogger(name).setLevel(logger_config["level"])
+
+
+def forward_worker_logs(log_queue) -> logging.handlers.QueueListener:
+    """
+    Start a thread emitting the records of worker processes through the
+    loggers, and so the handlers, of this process.
 
-def config_logging():
-    Path(".logs/bot.log").parent.mkdir(parents=True, exist_ok=True)
-    logging.config.dictConfig(DEFAULT_LOGGING)
+    Return the started listener, stop it after the workers have exited.
+    """
+    listener = logging.handlers.QueueListener(log_queue, _LoggerDispatcher())
+    listener.start()
+    return listener
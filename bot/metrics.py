@@ -0,0 +1,42 @@
+from typing import Any, Callable, Dict, List
+
+__all__ = ["Metrics", "registry"]
+
+
+class Metrics:
+    """
+    Process wide metrics store.
+
+    Components either push values (``set``/``incr``) or register a provider
+    returning a dict of values, which is called on every ``snapshot``.
+    """
+
+    def __init__(self):
+        self._values: Dict[str, Any] = {}
+        self._providers: List[Callable[[], Dict[str, Any]]] = []
+
+    def set(self, name: str, value: Any) -> None:
+        self._values[name] = value
+
+    def incr(self, name: str, n: int = 1) -> None:
+        self._values[name] = self._values.get(name, 0) + n
+
+    def register(self, provider: Callable[[], Dict[str, Any]]) -> None:
+        self._providers.append(provider)
+
+    def unregister(self, provider: Callable[[], Dict[str, Any]]) -> None:
+        if provider in self._providers:
+            self._providers.remove(provider)
+
+    def snapshot(self) -> Dict[str, Any]:
+        result = dict(self._values)
+        for provider in self._providers:
+            result.update(provider())
+        return result
+
+    def clear(self) -> None:
+        self._values.clear()
+        self._providers.clear()
+
+
+registry = Metrics()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from bot.metrics import Metrics, registry
+from bot.utils.math import percentile
+
+logger = logging.getLogger(__name__)
+
+
+class LoopLagMonitor:
+    """
+    Measure event loop scheduling delay and catch callbacks blocking the loop.
+
+    A sampler task sleeps ``interval`` seconds and records how late it wakes
+    up. A watchdog thread checks the sampler's heartbeat; if the loop has not
+    come back for ``threshold`` seconds the stack of the loop thread is logged,
+    pointing at the synchronous code holding it.
+    """
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.1,
+        threshold: float = 0.25,
+        window: int = 1000,
+        metrics: Metrics = registry,
+        name: str = "loop_lag",
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self._lags: Deque[float] = deque(maxlen=window)
+        self._metrics = metrics
+        self._name = name
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self.blocked_count = 0
+
+    def start(self) -> None:
+        loop = asyncio.get_event_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = loop.create_task(self._sample())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-lag-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        self._metrics.register(self.metrics)
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        self._metrics.unregister(self.metrics)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.threshold)
+            self._watchdog = None
+
+    async def _sample(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self._lags.append(loop.time() - start - self.interval)
+            self._heartbeat = time.monotonic()
+
+    def _watch(self) -> None:
+        reported = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            stalled = time.monotonic() - heartbeat - self.interval
+            if stalled < self.threshold or heartbeat == reported:
+                continue
+
+            # Report every stall once
+            reported = heartbeat
+            self.blocked_count += 1
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame else "<unknown>"
+            logger.warning(
+                "Event loop blocked for more than %.3fs, current stack:\n%s",
+                stalled,
+                stack,
+            )
+
+    def percentiles(self) -> Dict[str, float]:
+        lags = list(self._lags)
+        return {
+            "p50": percentile(lags, 0.5),
+            "p90": percentile(lags, 0.9),
+            "p99": percentile(lags, 0.99),
+            "max": max(lags, default=0.0),
+        }
+
+    def metrics(self) -> Dict[str, float]:
+        result = {
+            "{}_{}_ms".format(self._name, k): round(v * 1000, 3)
+            for k, v in self.percentiles().items()
+        }
+        result["{}_blocked_count".format(self._name)] = self.blocked_count
+        return result
@@ -0,0 +1,100 @@
+"""
+Local book of the orders placed by a strategy.
+"""
+
+import itertools
+import time
+from typing import Dict, Iterable, List, Optional
+
+from bot.records import Order, OrderUpdate
+
+TAKE_PROFIT = "tp"
+STOP_LOSS = "sl"
+
+OPEN_STATUSES = {"NEW", "PARTIALLY_FILLED"}
+
+
+def entry_role(n: int) -> str:
+    return "entry{}".format(n)
+
+
+def fib_role(n: int) -> str:
+    return "fib{}".format(n)
+
+
+class OrderTracker:
+    """
+    Open orders of one strategy keyed by client order id.
+
+    Client order ids are ``<prefix>-<role>-<sequence>``, e.g. ``nb3-tp-17``,
+    so the role of an order (entry1, fib2, tp, sl...) is known from the
+    exchange's answer alone. The sequence starts from the current time in
+    milliseconds, which keeps ids unique across restarts.
+
+    The book is updated from placement and cancel responses and from order
+    update events. A REST snapshot (``apply_snapshot``) is only needed every
+    ``snapshot_interval`` seconds, or after ``invalidate`` when the book may
+    have drifted (a fill, a failed request).
+    """
+
+    def __init__(self, prefix: str = "nb", snapshot_interval: float = 60.0):
+        self.prefix = prefix
+        self.snapshot_interval = snapshot_interval
+        self._orders: Dict[str, Order] = {}
+        self._sequence = itertools.count(int(time.time() * 1000))
+        self._snapshot_at = float("-inf")
+        self.snapshot_count = 0
+
+    def client_order_id(self, role: str) -> str:
+        return "{}-{}-{}".format(self.prefix, role, next(self._sequence))
+
+    def role(self, order: Order) -> Optional[str]:
+        """
+        Role encoded in the client order id, None for orders not placed by
+        this tracker.
+        """
+        parts = (order.client_order_id or "").split("-")
+        if len(parts) != 3 or parts[0] != self.prefix:
+            return None
+        return parts[1]
+
+    @property
+    def open_orders(self) -> List[Order]:
+        return list(self._orders.values())
+
+    def by_role(self, role: str) -> Optional[Order]:
+        for order in self._orders.values():
+            if self.role(order) == role:
+                return order
+        return None
+
+    def needs_snapshot(self) -> bool:
+        return time.monotonic() - self._snapshot_at >= self.snapshot_interval
+
+    def invalidate(self) -> None:
+        self._snapshot_at = float("-inf")
+
+    def apply_snapshot(self, orders: Iterable[Order]) -> None:
+        self._orders = {self._key(o): o for o in orders}
+        self._snapshot_at = time.monotonic()
+        self.snapshot_count += 1
+
+    def on_placed(self, order: Order) -> None:
+        self._orders[self._key(order)] = order
+
+    def on_canceled(self, order: Order) -> None:
+        self._orders.pop(self._key(order), None)
+
+    def on_all_canceled(self) -> None:
+        self._orders.clear()
+
+    def on_update(self, update: OrderUpdate) -> None:
+        key = self._key(update.order)
+        if update.status in OPEN_STATUSES:
+            self._orders[key] = update.order
+        else:
+            self._orders.pop(key, None)
+
+    @staticmethod
+    def _key(order: Order) -> str:
+        return order.client_order_id or order.order_id
@@ -0,0 +1,178 @@
+"""
+Compact records passed between the strategy and the exchange adapters.
+"""
+
+from array import array
+from collections import namedtuple
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+from bot.enums import OrderType
+
+__all__ = ["Order", "OrderUpdate", "Position", "Candle", "Candles", "OrderBookTicker"]
+
+OrderBookTicker = namedtuple("OrderBookTicker", ["ask0", "bid0"])
+Candle = namedtuple("Candle", ["timestamp", "open", "high", "low", "close", "volume"])
+
+
+class Order:
+    __slots__ = (
+        "pair",
+        "order_type",
+        "side",
+        "qty",
+        "price",
+        "extras",
+        "order_id",
+        "client_order_id",
+        "timestamp",
+    )
+
+    def __init__(
+        self,
+        pair: str,
+        order_type: OrderType,
+        side: int,
+        qty: float,
+        price: Optional[float] = None,
+        extras: Optional[Dict[str, Any]] = None,
+        order_id: Optional[str] = None,
+        client_order_id: Optional[str] = None,
+        timestamp: Optional[int] = None,
+    ):
+        self.pair = pair
+        self.order_type = order_type
+        self.side = side
+        self.qty = qty
+        self.price = price
+        self.extras = extras
+        self.order_id = order_id
+        self.client_order_id = client_order_id
+        self.timestamp = timestamp  # in milliseconds
+
+    def __eq__(self, other):
+        # Identity fields (ids, timestamp) and request extras are not compared
+        if not isinstance(other, Order):
+            return NotImplemented
+        return (
+            self.price == other.price
+            and self.qty == other.qty
+            and self.side == other.side
+            and self.order_type == other.order_type
+            and self.pair == other.pair
+        )
+
+    __hash__ = None
+
+    def __repr__(self):
+        return "Order(pair={!r}, order_type={}, side={}, qty={}, price={}, order_id={!r})".format(
+            self.pair,
+            self.order_type.value,
+            int(self.side),
+            self.qty,
+            self.price,
+            self.order_id,
+        )
+
+
+# Order status change pushed by the exchange, ``status`` is the exchange's
+# (NEW, PARTIALLY_FILLED, FILLED, CANCELED, EXPIRED...)
+OrderUpdate = namedtuple("OrderUpdate", ["status", "order"])
+
+
+class Position:
+    __slots__ = ("pair", "qty", "side", "liq_price", "avg_price", "unrealized_pnl")
+
+    def __init__(
+        self,
+        pair: str = "",
+        qty: float = 0.0,
+        side: int = 0,
+        liq_price: float = 0.0,
+        avg_price: float = 0.0,
+        unrealized_pnl: float = 0.0,
+    ):
+        self.pair = pair
+        self.qty = qty  # always >= 0
+        self.side = side
+        self.liq_price = liq_price
+        self.avg_price = avg_price
+        self.unrealized_pnl = unrealized_pnl
+
+    def __eq__(self, other):
+        if not isinstance(other, Position):
+            return NotImplemented
+        return all(getattr(self, k) == getattr(other, k) for k in self.__slots__)
+
+    __hash__ = None
+
+    def copy(self) -> "Position":
+        return Position(
+            self.pair,
+            self.qty,
+            self.side,
+            self.liq_price,
+            self.avg_price,
+            self.unrealized_pnl,
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __repr__(self):
+        return "Position({})".format(
+            ", ".join("{}={!r}".format(k, getattr(self, k)) for k in self.__slots__)
+        )
+
+
+class Candles:
+    """
+    Column oriented OHLCV series backed by arrays of C doubles.
+
+    A column is usable as a buffer, e.g. ``numpy.frombuffer(candles.close)``
+    gives a zero copy view for indicator computation.
+    """
+
+    __slots__ = ("timestamp", "open", "high", "low", "close", "volume")
+
+    def __init__(self):
+        self.timestamp = array("q")  # open time in milliseconds
+        self.open = array("d")
+        self.high = array("d")
+        self.low = array("d")
+        self.close = array("d")
+        self.volume = array("d")
+
+    @classmethod
+    def from_ohlcv(cls, rows: Iterable[Sequence[float]]) -> "Candles":
+        """
+        Build from ccxt style ``[timestamp, open, high, low, close, volume]`` rows.
+        """
+        candles = cls()
+        for row in rows:
+            candles.append(*row[:6])
+        return candles
+
+    def append(self, timestamp, open_, high, low, close, volume=0.0) -> None:
+        self.timestamp.append(int(timestamp))
+        self.open.append(open_)
+        self.high.append(high)
+        self.low.append(low)
+        self.close.append(close)
+        self.volume.append(volume)
+
+    def __len__(self):
+        return len(self.timestamp)
+
+    def __getitem__(self, i: int) -> Candle:
+        return Candle(
+            self.timestamp[i],
+            self.open[i],
+            self.high[i],
+            self.low[i],
+            self.close[i],
+            self.volume[i],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
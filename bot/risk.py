@@ -0,0 +1,328 @@
+"""
+Risk metrics of live positions, per robot and per account, and the limits
+vetoing new orders.
+"""
+
+import hashlib
+import math
+from collections import namedtuple
+from typing import Any, Dict, Iterable, Optional
+
+from bot.enums import OrderType
+from bot.exceptions import RiskControlException
+from bot.metrics import Metrics, registry
+from bot.records import Order, Position
+
+__all__ = [
+    "AccountRisk",
+    "RiskEngine",
+    "RiskLimits",
+    "RobotRisk",
+    "account_key",
+    "default_engine",
+]
+
+# None for no limit. Exposures are notionals in the quote currency, the
+# liquidation distance and drawdown fractions of the price and peak equity
+RiskLimits = namedtuple(
+    "RiskLimits",
+    [
+        "max_exposure",
+        "max_robot_exposure",
+        "min_liq_distance",
+        "max_drawdown",
+        "max_loss",
+    ],
+    defaults=(None, None, None, None, None),
+)
+
+
+def account_key(exchange_code: str, credential_key: Dict[str, str]) -> str:
+    """
+    Same key for the robots trading with the same API key, which isn't kept.
+    """
+    api_key = credential_key.get("api_key", "")
+    return "{}:{}".format(
+        exchange_code, hashlib.sha1(api_key.encode()).hexdigest()[:12]
+    )
+
+
+class AccountRisk:
+    """
+    Totals of the robots trading on one exchange account.
+    """
+
+    __slots__ = (
+        "account",
+        "robots",
+        "balance",
+        "exposure",
+        "unrealized_pnl",
+        "realized_pnl",
+        "peak_equity",
+        "drawdown",
+    )
+
+    def __init__(self, account: str):
+        self.account = account
+        self.robots = 0
+        self.balance = 0.0
+        self.exposure = 0.0
+        self.unrealized_pnl = 0.0
+        self.realized_pnl = 0.0
+        self.peak_equity = 0.0
+        self.drawdown = 0.0
+
+    @property
+    def equity(self) -> float:
+        return self.balance + self.unrealized_pnl
+
+    def _update_drawdown(self) -> None:
+        equity = self.equity
+        if equity > self.peak_equity:
+            self.peak_equity = equity
+        if self.peak_equity > 0:
+            self.drawdown = (self.peak_equity - equity) / self.peak_equity
+
+
+class RobotRisk:
+    """
+    Risk of one robot's position, folded into its AccountRisk.
+
+    Every update is O(1): the robot's previous contributions to the account
+    totals are replaced by the new ones. Realized P&L is estimated from the
+    position changes, at the mark price of the update that saw the position
+    shrink.
+    """
+
+    __slots__ = (
+        "engine",
+        "robot_id",
+        "account",
+        "side",
+        "qty",
+        "avg_price",
+        "liq_price",
+        "mark",
+        "exposure",
+        "unrealized_pnl",
+        "realized_pnl",
+        "peak_pnl",
+        "drawdown",
+    )
+
+    def __init__(self, engine: "RiskEngine", robot_id: Any, account: AccountRisk):
+        self.engine = engine
+        self.robot_id = robot_id
+        self.account = account
+        self.side = 0
+        self.qty = 0.0
+        self.avg_price = 0.0
+        self.liq_price = 0.0
+        self.mark = 0.0
+        self.exposure = 0.0
+        self.unrealized_pnl = 0.0
+        self.realized_pnl = 0.0
+        self.peak_pnl = 0.0
+        self.drawdown = 0.0
+
+    @property
+    def pnl(self) -> float:
+        return self.realized_pnl + self.unrealized_pnl
+
+    @property
+    def liq_distance(self) -> float:
+        """
+        Distance from the mark price to the liquidation price, as a fraction
+        of the mark price; infinite without a liquidation price.
+        """
+        if not self.side or self.liq_price <= 0 or self.mark <= 0:
+            return math.inf
+        return (self.mark - self.liq_price) * self.side / self.mark
+
+    def update(
+        self,
+        balance: Optional[float] = None,
+        position: Optional[Position] = None,
+        mark: Optional[float] = None,
+    ) -> None:
+        """
+        Apply the latest account balance, position and/or mark price.
+        """
+        account = self.account
+        if balance is not None:
+            account.balance = balance
+        if mark is not None:
+            self.mark = mark
+        if position is not None:
+            self._apply_position(position)
+
+        exposure = self.qty * self.mark
+        unrealized_pnl = self.side * self.qty * (self.mark - self.avg_price)
+        account.exposure += exposure - self.exposure
+        account.unrealized_pnl += unrealized_pnl - self.unrealized_pnl
+        self.exposure = exposure
+        self.unrealized_pnl = unrealized_pnl
+
+        pnl = self.pnl
+        if pnl > self.peak_pnl:
+            self.peak_pnl = pnl
+        self.drawdown = self.peak_pnl - pnl
+        account._update_drawdown()
+
+    def _apply_position(self, position: Position) -> None:
+        if self.side and self.mark > 0:
+            if position.side == self.side:
+                closed = max(0.0, self.qty - position.qty)
+            else:
+                closed = self.qty
+            if closed:
+                realized = closed * self.side * (self.mark - self.avg_price)
+                self.realized_pnl += realized
+                self.account.realized_pnl += realized
+        self.side = position.side
+        self.qty = position.qty
+        self.avg_price = position.avg_price
+        self.liq_price = position.liq_price
+
+    def check(self, orders: Iterable[Order]) -> None:
+        """
+        Raise RiskControlException if ``orders`` would break a limit once all
+        filled. Orders reducing the position (take profit, stop loss) are
+        never vetoed.
+        """
+        limits = self.engine.limits
+        added = 0.0
+        for order in orders:
+            if order.order_type == OrderType.trigger or order.side == -self.side:
+                continue
+            if order.extras and order.extras.get("reduceOnly"):
+                continue
+            added += order.qty * (order.price or self.mark)
+        if not added:
+            return
+
+        account = self.account
+        if limits.max_loss is not None and self.pnl < -limits.max_loss:
+            raise RiskControlException(
+                "P&L ({:.2f}) is below -maxLoss (-{})".format(self.pnl, limits.max_loss)
+            )
+        if limits.max_drawdown is not None and account.drawdown > limits.max_drawdown:
+            raise RiskControlException(
+                "Account drawdown ({:.2%}) exceeds maxDrawdown ({:.2%})".format(
+                    account.drawdown, limits.max_drawdown
+                )
+            )
+        if (
+            limits.min_liq_distance is not None
+            and self.liq_distance < limits.min_liq_distance
+        ):
+            raise RiskControlException(
+                "Liquidation distance ({:.2%}) is below minLiqDistance "
+                "({:.2%})".format(self.liq_distance, limits.min_liq_distance)
+            )
+        if (
+            limits.max_robot_exposure is not None
+            and self.exposure + added > limits.max_robot_exposure
+        ):
+            raise RiskControlException(
+                "Exposure ({:.2f}) would exceed maxRobotExposure ({})".format(
+                    self.exposure + added, limits.max_robot_exposure
+                )
+            )
+        if (
+            limits.max_exposure is not None
+            and account.exposure + added > limits.max_exposure
+        ):
+            raise RiskControlException(
+                "Account exposure ({:.2f}) would exceed maxExposure ({})".format(
+                    account.exposure + added, limits.max_exposure
+                )
+            )
+
+    def close(self) -> None:
+        self.engine.detach(self)
+
+
+class RiskEngine:
+    """
+    Risk of the robots of the process, grouped by exchange account so that
+    robots sharing an account share its exposure and drawdown limits. With
+    workers, bot.sharding runs all the robots of an account in one process.
+    """
+
+    def __init__(
+        self, limits: Optional[RiskLimits] = None, metrics: Metrics = registry
+    ):
+        self.limits = limits or RiskLimits()
+        self._accounts: Dict[str, AccountRisk] = {}
+        self._robots: Dict[Any, RobotRisk] = {}
+        self._metrics = metrics
+        self._registered = False
+
+    def configure(self, options: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Apply the optional "risk" section of config.json, every limit is
+        optional:
+
+            {
+                "maxExposure": 50000,        # notional of all robots of an account
+                "maxRobotExposure": 10000,   # notional of a robot's position
+                "minLiqDistance": 0.05,      # 5% between the price and liq price
+                "maxDrawdown": 0.2,          # 20% below the account equity peak
+                "maxLoss": 500               # realized + unrealized P&L of a robot
+            }
+        """
+        options = options or {}
+        self.limits = RiskLimits(
+            max_exposure=options.get("maxExposure"),
+            max_robot_exposure=options.get("maxRobotExposure"),
+            min_liq_distance=options.get("minLiqDistance"),
+            max_drawdown=options.get("maxDrawdown"),
+            max_loss=options.get("maxLoss"),
+        )
+
+    def attach(self, robot_id: Any, account: str) -> RobotRisk:
+        if robot_id in self._robots:
+            raise ValueError("Robot {} already attached".format(robot_id))
+        account_risk = self._accounts.get(account)
+        if account_risk is None:
+            account_risk = self._accounts[account] = AccountRisk(account)
+        account_risk.robots += 1
+        robot = self._robots[robot_id] = RobotRisk(self, robot_id, account_risk)
+        if not self._registered:
+            self._metrics.register(self.snapshot)
+            self._registered = True
+        return robot
+
+    def detach(self, robot: RobotRisk) -> None:
+        if self._robots.get(robot.robot_id) is not robot:
+            return
+        del self._robots[robot.robot_id]
+        account = robot.account
+        account.exposure -= robot.exposure
+        account.unrealized_pnl -= robot.unrealized_pnl
+        account.robots -= 1
+        if account.robots == 0:
+            del self._accounts[account.account]
+        if not self._robots and self._registered:
+            self._metrics.unregister(self.snapshot)
+            self._registered = False
+
+    def robot(self, robot_id: Any) -> Optional[RobotRisk]:
+        return self._robots.get(robot_id)
+
+    def account(self, account: str) -> Optional[AccountRisk]:
+        return self._accounts.get(account)
+
+    def snapshot(self) -> Dict[str, Any]:
+        accounts = self._accounts.values()
+        return {
+            "risk_robots": len(self._robots),
+            "risk_exposure": sum(a.exposure for a in accounts),
+            "risk_unrealized_pnl": sum(a.unrealized_pnl for a in accounts),
+            "risk_realized_pnl": sum(a.realized_pnl for a in accounts),
+        }
+
+
+default_engine = RiskEngine()
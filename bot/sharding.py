@@ -0,0 +1,527 @@
+"""
+Sharding of robots across worker processes.
+
+A Python process only uses one core. ``ShardSupervisor`` starts worker
+processes, each running its robots on its own event loop, and assigns robots
+to workers by consistent hashing of their shard key (the robot id by
+default): adding or removing a robot, or a worker, only moves the robots that
+have to move. Workers send
+their logs and metrics back to the supervisor process.
+"""
+
+import asyncio
+import bisect
+import hashlib
+import importlib
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import signal
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from bot.lifecycle import install_signal_handlers, run_bounded, use_event_loop
+from bot.log import forward_worker_logs, worker_logging
+from bot.metrics import Metrics, registry
+from bot.monitor import LoopLagMonitor
+
+__all__ = ["HashRing", "RobotWorker", "ShardSupervisor"]
+
+logger = logging.getLogger(__name__)
+
+START = "start"
+STOP = "stop"
+SHUTDOWN = "shutdown"
+STOPPED = "stopped"
+METRICS = "metrics"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def _resolve(path: str) -> Callable:
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)
+
+
+class HashRing:
+    """
+    Consistent hash ring, each node is placed ``replicas`` times on the ring
+    so keys spread evenly.
+    """
+
+    def __init__(self, nodes: Iterable[Hashable] = (), replicas: int = 100):
+        self.replicas = replicas
+        self._points: List[int] = []
+        self._owners: Dict[int, Hashable] = {}
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> Set[Hashable]:
+        return set(self._owners.values())
+
+    def add(self, node: Hashable) -> None:
+        for i in range(self.replicas):
+            point = _hash("{}#{}".format(node, i))
+            if point not in self._owners:
+                self._owners[point] = node
+                bisect.insort(self._points, point)
+
+    def remove(self, node: Hashable) -> None:
+        self._points = [p for p in self._points if self._owners[p] != node]
+        self._owners = {p: self._owners[p] for p in self._points}
+
+    def node_for(self, key: Hashable) -> Hashable:
+        if not self._points:
+            raise LookupError("Hash ring is empty")
+        i = bisect.bisect(self._points, _hash(str(key))) % len(self._points)
+        return self._owners[self._points[i]]
+
+    def assign(self, keys: Iterable[Hashable]) -> Dict[Hashable, Hashable]:
+        return {key: self.node_for(key) for key in keys}
+
+
+class RobotWorker:
+    """
+    Runs the robots a worker process is told to start, on one event loop.
+
+    ``bot_factory(config, standalone=False)`` builds a robot with ``start()``
+    and ``request_stop()``, like main.Bot. Every ``report_interval`` seconds
+    the process metrics are sent to the supervisor.
+    """
+
+    def __init__(
+        self,
+        worker_id: int,
+        config: Dict[str, Any],
+        bot_factory: Callable,
+        commands,
+        status,
+        report_interval: float = 5.0,
+        metrics: Metrics = registry,
+    ):
+        self.worker_id = worker_id
+        self._config = config
+        self._bot_factory = bot_factory
+        self._commands = commands
+        self._status = status
+        self._report_interval = report_interval
+        self._metrics = metrics
+        self._bots: Dict[Hashable, Any] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._stopping: Optional[asyncio.Event] = None
+
+    def request_stop(self, signum: Optional[int] = None) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        loop = asyncio.get_event_loop()
+        self._stopping = asyncio.Event()
+        install_signal_handlers(loop, self.request_stop)
+        monitor = LoopLagMonitor(
+            threshold=self._config.get("loopLagThreshold", 0.25),
+            metrics=self._metrics,
+        )
+        monitor.start()
+        # Imported here so that the hash ring doesn't pull in pandas
+        from bot.exchanges.hub import default_hub
+        from bot.indicators import default_service
+        from bot.risk import default_engine
+
+        default_hub.configure(self._config.get("marketData"))
+        default_service.configure(self._config.get("indicators"))
+        default_engine.configure(self._config.get("risk"))
+        reader = loop.create_task(self._read_commands())
+        try:
+            while not self._stopping.is_set():
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self._report_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._report()
+        finally:
+            reader.cancel()
+            for robot_id in list(self._bots):
+                self._stop(robot_id)
+            tasks = list(self._tasks.values())
+            if tasks:
+                await asyncio.wait(tasks)
+            self._report()
+            await run_bounded(
+                [
+                    ("market data", default_hub.close),
+                    ("indicators", default_service.close),
+                    ("loop monitor", monitor.stop),
+                ],
+                self._config.get("shutdownTimeout", 5.0),
+            )
+            logger.info("Worker %s stopped", self.worker_id)
+
+    async def _read_commands(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                # Bounded, so that the executor thread exits with the loop
+                command, robot_id = await loop.run_in_executor(
+                    None, self._commands.get, True, 0.5
+                )
+            except queue.Empty:
+                continue
+            if command == START:
+                self._start(robot_id)
+            elif command == STOP:
+                self._stop(robot_id)
+            elif command == SHUTDOWN:
+                self.request_stop()
+
+    def _start(self, robot_id: Hashable) -> None:
+        if robot_id in self._bots:
+            return
+        if robot_id in self._tasks:
+            # Still stopping, the supervisor resends the start once it's done
+            logger.warning("Robot %s is still stopping, not started", robot_id)
+            return
+        logger.info("Starting robot %s on worker %s", robot_id, self.worker_id)
+        bot = self._bot_factory(dict(self._config, robotId=robot_id), standalone=False)
+        task = asyncio.get_event_loop().create_task(
+            bot.start(), name="robot{}".format(robot_id)
+        )
+        task.add_done_callback(lambda t: self._on_exit(robot_id, t))
+        self._bots[robot_id] = bot
+        self._tasks[robot_id] = task
+
+    def _stop(self, robot_id: Hashable) -> None:
+        bot = self._bots.pop(robot_id, None)
+        if bot is not None:
+            logger.info("Stopping robot %s on worker %s", robot_id, self.worker_id)
+            bot.request_stop()
+
+    def _on_exit(self, robot_id: Hashable, task: asyncio.Task) -> None:
+        self._tasks.pop(robot_id, None)
+        if self._bots.pop(robot_id, None) is not None and not task.cancelled():
+            # Not asked to stop
+            exc = task.exception()
+            logger.error("Robot %s exited on its own: %r", robot_id, exc, exc_info=exc)
+        self._status.put((STOPPED, self.worker_id, robot_id))
+
+    def _report(self) -> None:
+        snapshot = {
+            key: value
+            for key, value in self._metrics.snapshot().items()
+            if isinstance(value, (int, float, str))
+        }
+        snapshot["robots"] = len(self._bots)
+        self._status.put((METRICS, self.worker_id, snapshot))
+
+
+def _worker_main(
+    worker_id: int, config: Dict[str, Any], bot_factory: str, commands, status, logs
+) -> None:
+    worker_logging(logs, worker_id, config.get("logging"))
+    use_event_loop(config.get("eventLoop", "asyncio"))
+    worker = RobotWorker(
+        worker_id,
+        config,
+        _resolve(bot_factory),
+        commands,
+        status,
+        report_interval=config.get("reportInterval", 5.0),
+    )
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_until_complete(worker.run())
+        loop.run_until_complete(loop.shutdown_asyncgens())
+    finally:
+        loop.close()
+
+
+class _Worker:
+    def __init__(self, process, commands):
+        self.process = process
+        self.commands = commands
+        self.retiring = False
+        self.shutdown_sent = False
+        self.restarts = 0
+        self.metrics: Dict[str, Any] = {}
+
+
+class ShardSupervisor:
+    """
+    Starts ``workers`` processes (one per core by default) and keeps each
+    robot of ``set_robots`` running on the worker the hash ring assigns it.
+
+    A robot moving to another worker is started there only once its old
+    worker reports it stopped, so it never trades twice. A worker that dies
+    is restarted with its robots. A robot exiting on its own is left stopped
+    until it is removed from and added back to the robot set.
+
+    ``bot_factory`` is a "module:attr" path, workers are spawned and import
+    it themselves.
+
+    Robots with the same ``shard_key(robot_id)`` run on the same worker, e.g.
+    the robots of an exchange account, so that the account wide risk limits
+    of the worker see all of them. A robot whose key can't be had is not
+    started until the next ``set_robots``.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        bot_factory: str,
+        workers: Optional[int] = None,
+        replicas: int = 100,
+        metrics: Metrics = registry,
+        shard_key: Optional[Callable[[Hashable], Hashable]] = None,
+    ):
+        self._config = config
+        self._bot_factory = bot_factory
+        self._shard_key = shard_key
+        self._keys: Dict[Hashable, Hashable] = {}
+        self._context = multiprocessing.get_context("spawn")
+        self._status = self._context.Queue()
+        self._logs = self._context.Queue()
+        self._log_listener: Optional[logging.handlers.QueueListener] = None
+        self._workers: Dict[int, _Worker] = {}
+        self._ring = HashRing(replicas=replicas)
+        self._size = workers or os.cpu_count() or 1
+        self._robots: Set[Hashable] = set()
+        # Robot -> worker, for robots started and not reported stopped
+        self._running: Dict[Hashable, int] = {}
+        self._stopping: Dict[Hashable, int] = {}
+        self._exited: Set[Hashable] = set()
+        self._closing = False
+        self._metrics = metrics
+
+    @property
+    def assignment(self) -> Dict[Hashable, int]:
+        return dict(self._running)
+
+    def start(self) -> None:
+        self._log_listener = forward_worker_logs(self._logs)
+        self.resize(self._size)
+        self._metrics.register(self.metrics)
+
+    def set_robots(self, robot_ids: Iterable[Hashable]) -> None:
+        self._robots = set(robot_ids)
+        self._exited &= self._robots
+        self._keys = {r: k for r, k in self._keys.items() if r in self._robots}
+        self._reconcile()
+
+    def resize(self, workers: int) -> None:
+        """
+        Run on ``workers`` processes, moving only the robots of the workers
+        added or removed.
+        """
+        active = sorted(w for w, worker in self._workers.items() if not worker.retiring)
+        for worker_id in active[workers:]:
+            self._workers[worker_id].retiring = True
+            self._ring.remove(worker_id)
+        next_id = max(self._workers, default=-1) + 1
+        for worker_id in range(next_id, next_id + workers - len(active)):
+            self._spawn(worker_id)
+            self._ring.add(worker_id)
+        self._size = workers
+        self._reconcile()
+
+    def poll(self, timeout: float = 0.0) -> None:
+        """
+        Handle the messages of the workers, waiting up to ``timeout`` seconds
+        for the first one, and restart the workers that died.
+        """
+        block = timeout > 0
+        while True:
+            try:
+                message = self._status.get(block, timeout)
+            except queue.Empty:
+                break
+            block = False
+            self._handle(*message)
+        self._check_workers()
+
+    def run(self, config_loader: Optional[Callable[[], Dict[str, Any]]] = None):
+        """
+        Run until SIGINT/SIGTERM. The robot set is the "robotIds" of the
+        config, reloaded with ``config_loader`` every "reloadInterval" seconds.
+        """
+        stop = []
+
+        def request_stop(signum, frame):
+            logger.info("Received signal %s, stopping workers...", signum)
+            self._closing = True
+            stop.append(signum)
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, request_stop)
+
+        reload_interval = self._config.get("reloadInterval", 30.0)
+        report_interval = self._config.get("reportInterval", 30.0)
+        self.start()
+        try:
+            self.set_robots(self._config.get("robotIds", []))
+            next_reload = time.monotonic() + reload_interval
+            next_report = time.monotonic() + report_interval
+            while not stop:
+                self.poll(timeout=1.0)
+                now = time.monotonic()
+                if config_loader is not None and now >= next_reload:
+                    next_reload = now + reload_interval
+                    try:
+                        self.set_robots(config_loader().get("robotIds", []))
+                    except Exception as exc:
+                        logger.error("Failed to reload robots: %r", exc)
+                if now >= next_report:
+                    next_report = now + report_interval
+                    logger.info("Metrics: %s", self.metrics())
+        finally:
+            self.stop()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Ask every worker to stop its robots and exit, terminating the ones
+        still alive after ``timeout`` seconds.
+        """
+        self._closing = True
+        if timeout is None:
+            timeout = self._config.get("shutdownTimeout", 5.0) * 6
+        for worker in self._workers.values():
+            if worker.process.is_alive():
+                worker.commands.put((SHUTDOWN, None))
+        deadline = time.monotonic() + timeout
+        for worker_id, worker in self._workers.items():
+            worker.process.join(max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.warning("Worker %s did not stop, terminating", worker_id)
+                worker.process.terminate()
+                worker.process.join(1)
+        self.poll()
+        self._metrics.unregister(self.metrics)
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
+
+    def worker_metrics(self) -> Dict[int, Dict[str, Any]]:
+        """
+        Last metrics snapshot reported by each worker.
+        """
+        return {w: dict(worker.metrics) for w, worker in self._workers.items()}
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Metrics of all the workers: counters are summed, latencies (``_ms``)
+        are the worst of the workers.
+        """
+        result: Dict[str, Any] = {}
+        for worker in self._workers.values():
+            for key, value in worker.metrics.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if key.endswith("_ms"):
+                    result[key] = max(result.get(key, value), value)
+                else:
+                    result[key] = result.get(key, 0) + value
+        result["shard_workers"] = sum(
+            w.process.is_alive() for w in self._workers.values()
+        )
+        result["shard_robots"] = len(self._running)
+        result["shard_worker_restarts"] = sum(
+            w.restarts for w in self._workers.values()
+        )
+        return result
+
+    def _spawn(self, worker_id: int) -> None:
+        commands = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                worker_id,
+                self._config,
+                self._bot_factory,
+                commands,
+                self._status,
+                self._logs,
+            ),
+            name="robot-worker-{}".format(worker_id),
+        )
+        process.start()
+        previous = self._workers.get(worker_id)
+        self._workers[worker_id] = _Worker(process, commands)
+        if previous is not None:
+            self._workers[worker_id].restarts = previous.restarts + 1
+        logger.info("Started worker %s (pid %s)", worker_id, process.pid)
+
+    def _key(self, robot_id: Hashable) -> Optional[Hashable]:
+        if self._shard_key is None:
+            return robot_id
+        key = self._keys.get(robot_id)
+        if key is None:
+            try:
+                key = self._keys[robot_id] = self._shard_key(robot_id)
+            except Exception as exc:
+                logger.error(
+                    "No shard key for robot %s, not started: %r", robot_id, exc
+                )
+        return key
+
+    def _reconcile(self) -> None:
+        if self._closing or not self._ring.nodes:
+            return
+        target = {}
+        for robot_id in self._robots - self._exited:
+            key = self._key(robot_id)
+            if key is not None:
+                target[robot_id] = self._ring.node_for(key)
+        for robot_id, worker_id in list(self._running.items()):
+            if target.get(robot_id) != worker_id:
+                del self._running[robot_id]
+                self._stopping[robot_id] = worker_id
+                self._workers[worker_id].commands.put((STOP, robot_id))
+        for robot_id, worker_id in target.items():
+            if robot_id not in self._running and robot_id not in self._stopping:
+                self._running[robot_id] = worker_id
+                self._workers[worker_id].commands.put((START, robot_id))
+
+    def _handle(self, kind: str, worker_id: int, payload: Any) -> None:
+        if kind == METRICS:
+            if worker_id in self._workers:
+                self._workers[worker_id].metrics = payload
+        elif kind == STOPPED:
+            if self._stopping.get(payload) == worker_id:
+                del self._stopping[payload]
+            elif self._running.get(payload) == worker_id:
+                del self._running[payload]
+                self._exited.add(payload)
+            self._reconcile()
+
+    def _check_workers(self) -> None:
+        for worker_id, worker in list(self._workers.items()):
+            if worker.retiring:
+                busy = worker_id in self._running.values()
+                busy = busy or worker_id in self._stopping.values()
+                if not busy and not worker.shutdown_sent:
+                    worker.commands.put((SHUTDOWN, None))
+                    worker.shutdown_sent = True
+                if not worker.process.is_alive():
+                    worker.process.join()
+                    del self._workers[worker_id]
+                    self._forget(worker_id)
+                continue
+            if worker.process.is_alive() or self._closing:
+                continue
+            logger.error(
+                "Worker %s exited with code %s, restarting",
+                worker_id,
+                worker.process.exitcode,
+            )
+            self._spawn(worker_id)
+            self._forget(worker_id)
+
+    def _forget(self, worker_id: int) -> None:
+        for robots in (self._running, self._stopping):
+            for robot_id in [r for r, w in robots.items() if w == worker_id]:
+                del robots[robot_id]
+        self._reconcile()
@@ -1,77 +1,79 @@
 import asyncio
 import logging
+import time
 from collections import namedtuple
-from typing import Any, Dict, Union
-
-import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence
 
+from bot.candles import CandleAggregator
 from bot.enums import OrderType, Side
+from bot.exceptions import ExchangeException, OrderNotFound, RiskControlException
 from bot.exchanges.base import Exchange
-from bot.utils.math import cal_ewm, fib
+from bot.exchanges.breaker import CircuitBreaker
+from bot.exchanges.hub import MarketDataHub, Subscription
+from bot.indicators import (
+    Indicator,
+    IndicatorService,
+    indicator_spec,
+    trend_indicator,
+)
+from bot.metrics import Metrics, registry
+from bot.orders import (
+    STOP_LOSS,
+    TAKE_PROFIT,
+    OrderTracker,
+    entry_role,
+    fib_role,
+)
+from bot.records import Candles, Order, OrderUpdate, Position
+from bot.risk import RobotRisk
+from bot.utils.math import fib
+from bot.utils.ticks import MarketSpec
 
 logger: logging.Logger = logging.getLogger(__name__)
 
 
-Indicator = namedtuple("Indicator", ["side", "rw"])
 ShouldTradeResult = namedtuple("ShouldTradeResult", ["code", "reason"])
 
+TREND = indicator_spec("trend")
+
 # todo: cleanup when robot stop
 # todo: feedback balance
 
 
-def _cal_indicator(prices: pd.Series) -> Indicator:
-    ema7 = cal_ewm(data=prices, span=7)
-    ema14 = cal_ewm(data=prices, span=14)
-    ema21 = cal_ewm(data=prices, span=21)
-    fu = 0
-    fd = 0
-    en1 = ema7.values[-1] * 3 - ema7.values[-2] * 2
-    en2 = ema14.values[-1] * 3 - ema14.values[-2] * 2
-    en3 = ema21.values[-1] * 3 - ema21.values[-2] * 2
-    if en1 > en2:
-        fu += 1
-    if en1 > en3:
-        fu += 1
-    if en2 > en3:
-        fu += 1
-    if en1 < en2:
-        fd += 1
-    if en1 < en3:
-        fd += 1
-    if en2 < en3:
-        fd += 1
-
-    last_price = prices.values[-1]
-    rw = (
-        max(
-            abs(ema14.values[-1] - ema7.values[-2]),
-            abs(ema21.values[-1] - ema14.values[-2]),
-            abs(ema21.values[-1] - ema7.values[-2]),
-        )
-        / last_price
-        * 100
-    )
-    side = Side.no
-    if fu == 3:
-        side = 1
-
-    if fd == 3:
-        side = -1
-
-    return Indicator(side=side, rw=rw)
-
-
 class Strategy:
-    def __init__(self, exchange: Exchange):
+    def __init__(
+        self,
+        exchange: Exchange,
+        indicator_service: Optional[IndicatorService] = None,
+        market_data: Optional[MarketDataHub] = None,
+        metrics: Metrics = registry,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        risk: Optional[RobotRisk] = None,
+    ):
         self._exchange = exchange
+        self._circuit_breaker = circuit_breaker
+        self._risk = risk
+        self._indicator_service = indicator_service
+        self._indicator_key = None
+        self._market_data = market_data
+        self._subscriptions: Dict[str, Subscription] = {}
 
         self._trading_context: Dict[str, Any] = {}
+        self._market: Optional[MarketSpec] = None
         self._parameters: Dict[str, Any] = {}
         self._store: Dict[str, Any] = {}
-        self._position: Dict[str, Union[float, int, Side]] = {}
+        self._position = Position()
+        self._orders = OrderTracker()
+        # Whether order updates are pushed to on_order_update
+        self._order_stream = False
+        self._metrics = metrics
+        self._unprotected_since: Optional[float] = None
+        self._unprotected_max_ms = 0.0
         self._balance: float = 0.0
         self._log_queue = asyncio.Queue()
         self._event_queue = asyncio.Queue()
+        self._candles = CandleAggregator(base_period="1m")
+        self._seeded_periods = set()
 
     @property
     def pair(self):
@@ -105,10 +107,31 @@ class Strategy:
     def position(self):
         return self._position
 
+    @property
+    def orders(self) -> OrderTracker:
+        return self._orders
+
     @property
     def trading_context(self):
         return self._trading_context
 
+    @property
+    def degraded(self) -> bool:
+        """
+        True while the exchange circuit breaker is not closed: only the
+        position's TP/SL orders are maintained.
+        """
+        breaker = self._circuit_breaker
+        return breaker is not None and breaker.degraded
+
+    @property
+    def market(self) -> Optional[MarketSpec]:
+        return self._market
+
+    @property
+    def risk(self) -> Optional[RobotRisk]:
+        return self._risk
+
     def sync_store(self, last_price: float) -> None:
         market_type = self._trading_context["market_type"]
         assert market_type != "spots", "Doesn't support spots currently"
@@ -153,73 +176,77 @@ class Strategy:
             # print('last_price', last_price)
 
     async def ensure_order(self):
-        orders = await self._exchange.fetch_current_orders(self.pair)
-        if self._position["qty"] == 0:  # No holding position
+        """
+        Keep the TP/SL orders of the position in line with it. Without a
+        position every order is cancelled. With one, only orders that aren't
+        ours, duplicated or misplaced TP/SL, and fib/entry orders against the
+        position are cancelled; the other fib/entry orders are left to
+        _replace_orders.
+        """
+        orders = await self._current_orders()
+        if self._position.qty == 0:  # No holding position
             # No current orders
             if len(orders) == 0:
                 return
 
-            await self._exchange.cancel_current_orders(self.pair)
+            await self._cancel_all_orders()
             return
-        else:  # Has holding position
-            if len(orders) == 0:
-                tp_order = self.get_take_profit_order()
-                sl_order = self.get_stop_loss_order()
-                await self._exchange.place_orders_batch([tp_order, sl_order])
-                return
-            elif len(orders) != 2:
-                await self._exchange.cancel_current_orders(self.pair)
-                tp_order = self.get_take_profit_order()
-                sl_order = self.get_stop_loss_order()
-                await self._exchange.place_orders_batch([tp_order, sl_order])
-                return
+
+        tracker = self._orders
+        market = self._market
+        stale = []
+        current = {}
+        for order in orders:
+            role = tracker.role(order)
+            if role is None:
+                stale.append(order)
+            elif role in (TAKE_PROFIT, STOP_LOSS):
+                if role in current:
+                    stale.append(order)
+                else:
+                    current[role] = order
+            elif order.side != self._position.side:
+                stale.append(order)
+
+        targets = {
+            TAKE_PROFIT: self.get_take_profit_order(),
+            STOP_LOSS: self.get_stop_loss_order(),
+        }
+        missing = []
+        amends = []
+        for role, target in targets.items():
+            order = current.get(role)
+            if order is None:
+                missing.append(target)
+            elif order.side != target.side or order.order_type != target.order_type:
+                stale.append(order)
+                missing.append(target)
+            elif not market.order_matches(order, target):
+                amends.append((order, target))
+
+        if missing:
+            logger.info("Place missing take profit/stop loss orders")
+            await self._log_queue.put("正在补挂止盈止损单...")
+            await self._place_orders(missing)
+        for order, target in amends:
+            if tracker.role(order) == TAKE_PROFIT:
+                logger.warning("Unmatched take profit order")
+                await self._log_queue.put("止盈单不匹配")
+                logger.info("Amend take profit order")
+                await self._log_queue.put("正在修改止盈单...")
             else:
-                # Number of orders == 2, check orders
-                tp_order_match = False
-                sl_order_match = False
-
-                tp_order = self.get_take_profit_order()
-                sl_order = self.get_stop_loss_order()
-                for order in orders:
-                    real_order = dict(
-                        side=order["side"],
-                        qty=order["qty"],
-                        price=order["price"],
-                    )
-                    # todo: precision
-                    if order["order_type"] == OrderType.limit:
-                        expected_order = dict(
-                            side=tp_order["side"],
-                            qty=tp_order["qty"],
-                            price=tp_order["price"],
-                        )
-                        tp_order_match = real_order == expected_order
-                        if not tp_order_match:
-                            logger.warning("Unmatched take profit order")
-                            await self._log_queue.put("止盈单不匹配")
-
-                    if order["order_type"] == OrderType.trigger:
-                        expected_order = dict(
-                            side=sl_order["side"],
-                            qty=sl_order["qty"],
-                            price=sl_order["price"],
-                        )
-                        sl_order_match = real_order == expected_order
-                        if not sl_order_match:
-                            logger.warning("Unmatched stop loss order")
-                            await self._log_queue.put("止损单不匹配")
-
-                if not tp_order_match or not sl_order_match:
-                    logger.info("Cancel all current orders...")
-                    await self._log_queue.put("正在取消全部挂单...")
-                    await self._exchange.cancel_current_orders(self.pair)
-
-                    logger.info("Replace take profit order and stop loss order")
-                    await self._log_queue.put("正在重挂止盈止损单...")
-                    await self._exchange.place_orders_batch([tp_order, sl_order])
-                    return
-
-    def prepare_open_pos_orders(self, side: Side, base_price: float):
+                logger.warning("Unmatched stop loss order")
+                await self._log_queue.put("止损单不匹配")
+                logger.info("Replace stop loss order")
+                await self._log_queue.put("正在替换止损单...")
+            await self._amend_order(order, target)
+        if stale:
+            # Once the new TP/SL are in place
+            logger.info("Cancel %d stale orders", len(stale))
+            await self._log_queue.put("正在取消{}个失效挂单...".format(len(stale)))
+            await self._cancel_orders(stale)
+
+    def prepare_open_pos_orders(self, side: Side, base_price: float) -> List[Order]:
         orders = []
         offset_factor = self.get_offset_factor(side)
         for i in range(1, 3):
@@ -234,25 +261,28 @@ class Strategy:
 
         qty = self._store["open_pos_qty"]
         pair = self._trading_context["pair"]
-        tick = self._trading_context["price_tick"]
-        entry_order1 = {
-            "pair": pair,
-            "order_type": OrderType.limit,
-            "price": base_price - int(side) * tick,
-            "side": side,
-            "qty": qty,
-        }
-        entry_order2 = {
-            "pair": pair,
-            "order_type": OrderType.limit,
-            "price": base_price - int(side) * 2 * tick,
-            "side": side,
-            "qty": qty,
-        }
+        market = self._market
+        base_ticks = market.price_to_ticks(base_price)
+        entry_order1 = Order(
+            pair=pair,
+            order_type=OrderType.limit,
+            price=market.ticks_to_price(base_ticks - int(side)),
+            side=side,
+            qty=qty,
+            client_order_id=self._orders.client_order_id(entry_role(1)),
+        )
+        entry_order2 = Order(
+            pair=pair,
+            order_type=OrderType.limit,
+            price=market.ticks_to_price(base_ticks - int(side) * 2),
+            side=side,
+            qty=qty,
+            client_order_id=self._orders.client_order_id(entry_role(2)),
+        )
         orders.extend([entry_order1, entry_order2])
         return orders
 
-    def prepare_add_pos_orders(self, side: Side, base_price: float):
+    def prepare_add_pos_orders(self, side: Side, base_price: float) -> List[Order]:
         orders = []
         offset_factor = self.get_offset_factor(side)
         for i in range(1, 4):
@@ -264,11 +294,11 @@ class Strategy:
             )
 
             if side == 1:
-                if order["price"] < self._position["liq_price"]:
+                if order.price < self._position.liq_price:
                     break
 
             if side == -1:
-                if order["price"] > self._position["liq_price"]:
+                if order.price > self._position.liq_price:
                     break
 
             orders.append(order)
@@ -278,51 +308,48 @@ class Strategy:
         orders.extend([tp_order, sl_order])
         return orders
 
-    def get_take_profit_order(self):
-        side = self._position["side"]
+    def get_take_profit_order(self) -> Optional[Order]:
+        side = self._position.side
         if side == 1:
             price = (
-                self._position["avg_price"] + self._parameters["longTakeProfitDistance"]
+                self._position.avg_price + self._parameters["longTakeProfitDistance"]
             )
         elif side == -1:
             price = (
-                self._position["avg_price"]
-                - self._parameters["shortTakeProfitDistance"]
+                self._position.avg_price - self._parameters["shortTakeProfitDistance"]
             )
         else:
             logger.warning("Cannot take profit if no position.")
             return
 
-        return {
-            "pair": self.pair,
-            "order_type": OrderType.limit,
-            "price": round(price, self._trading_context["price_precision"]),
-            "side": -side,
-            "qty": self._position["qty"],
-            "extras": self._exchange.get_tp_order_extras(),
-        }
+        return Order(
+            pair=self.pair,
+            order_type=OrderType.limit,
+            price=self._market.round_price(price),
+            side=-side,
+            qty=self._position.qty,
+            extras=self._exchange.get_tp_order_extras(),
+            client_order_id=self._orders.client_order_id(TAKE_PROFIT),
+        )
 
-    def get_stop_loss_order(self):
-        side = self._position["side"]
+    def get_stop_loss_order(self) -> Optional[Order]:
+        side = self._position.side
         if side == 1:
-            price = (
-                self._position["avg_price"] - self._parameters["longStopLossDistance"]
-            )
+            price = self._position.avg_price - self._parameters["longStopLossDistance"]
         elif side == -1:
-            price = (
-                self._position["avg_price"] + self._parameters["shortStopLossDistance"]
-            )
+            price = self._position.avg_price + self._parameters["shortStopLossDistance"]
         else:
             logger.warning("Cannot stop loss if no position.")
             return
 
-        return {
-            "pair": self.pair,
-            "order_type": OrderType.trigger,
-            "price": round(price, self._trading_context["price_precision"]),
-            "side": -side,
-            "qty": self._position["qty"],
-        }
+        return Order(
+            pair=self.pair,
+            order_type=OrderType.trigger,
+            price=self._market.round_price(price),
+            side=-side,
+            qty=self._position.qty,
+            client_order_id=self._orders.client_order_id(STOP_LOSS),
+        )
 
     def get_fib_order(
         self,
@@ -331,16 +358,18 @@ class Strategy:
         base_price: float,
         offset_factor: float,
         side: Side,
-    ) -> Dict[str, Any]:
-        offset = offset_factor * fib(n)
-        price = base_price - int(side) * offset
-        return {
-            "pair": self.pair,
-            "order_type": OrderType.limit,
-            "side": side,
-            "qty": self._store["open_pos_qty"],
-            "price": price,
-        }
+    ) -> Order:
+        market = self._market
+        offset_ticks = market.price_to_ticks(offset_factor * fib(n))
+        price_ticks = market.price_to_ticks(base_price) - int(side) * offset_ticks
+        return Order(
+            pair=self.pair,
+            order_type=OrderType.limit,
+            side=side,
+            qty=self._store["open_pos_qty"],
+            price=market.ticks_to_price(price_ticks),
+            client_order_id=self._orders.client_order_id(fib_role(n)),
+        )
 
     def get_offset_factor(self, side: Side):
         if side == Side.long:
@@ -350,11 +379,20 @@ class Strategy:
         return offset_factor
 
     async def trade_once(self):
+        if self.degraded:
+            await self.protect_once()
+            return
+
+        self._refresh_orders()
         await asyncio.gather(self._sync_balance(), self._sync_position())
 
         # sync store, note parameters was updated by robot
-        last_price = await self._exchange.fetch_last_price(pair=self.pair)
+        last_price = await self._latest(
+            "ticker", lambda: self._exchange.fetch_last_price(pair=self.pair)
+        )
         self.sync_store(last_price=last_price)
+        if self._risk is not None:
+            self._risk.update(self._balance, self._position, last_price)
 
         await self.ensure_order()
 
@@ -376,9 +414,11 @@ class Strategy:
             await self._log_queue.put("不满足交易条件：{}".format(result.reason))
             return
 
-        order_book_ticker = await self._exchange.fetch_order_book_ticker(self.pair)
+        order_book_ticker = await self._latest(
+            "book_ticker", lambda: self._exchange.fetch_order_book_ticker(self.pair)
+        )
         base_price = order_book_ticker[(1 - indicator.side) // 2]
-        if self._position["side"] == 0:
+        if self._position.side == 0:
             logger.info("Preparing open position orders...")
             await self._log_queue.put("正在准备开仓订单...")
             orders = self.prepare_open_pos_orders(
@@ -391,17 +431,65 @@ class Strategy:
                 side=indicator.side, base_price=base_price
             )
 
-        await self._exchange.cancel_current_orders(pair=self._trading_context["pair"])
-        await self._exchange.place_orders_batch(orders)
+        try:
+            self.risk_control(orders)
+        except RiskControlException as exc:
+            self._metrics.incr("risk_vetoes")
+            logger.warning("Orders vetoed by risk control: %s", exc)
+            await self._log_queue.put("风控拒绝下单：{}".format(exc))
+            # The entry orders of the previous cycles would still fill
+            await self._cancel_orders(
+                [
+                    o
+                    for o in await self._current_orders()
+                    if self._orders.role(o) not in (TAKE_PROFIT, STOP_LOSS)
+                ]
+            )
+            return
+
+        await self._replace_orders(orders)
         logger.info("Orders was placed, waiting for filling...")
         await self._log_queue.put("已挂单，等待成交...")
         await asyncio.sleep(self._parameters["restInterval"])
 
+    async def protect_once(self):
+        """
+        Degraded trading cycle: keep the TP/SL orders of the position in
+        place, open nothing new.
+        """
+        logger.warning("Exchange degraded, only maintaining TP/SL orders")
+        await self._log_queue.put("交易所异常，仅维护止盈止损单...")
+        self._refresh_orders()
+        await self._sync_position()
+        await self.ensure_order()
+
+    def close(self):
+        if self._indicator_key is not None:
+            self._indicator_service.unsubscribe(self._indicator_key)
+            self._indicator_key = None
+        for subscription in self._subscriptions.values():
+            subscription.close()
+        self._subscriptions.clear()
+        if self._risk is not None:
+            self._risk.close()
+            self._risk = None
+
     def set_trading_context(self, context):
         self._trading_context.update(context)
+        if "client_order_prefix" in context:
+            self._orders.prefix = context["client_order_prefix"]
+        if "price_tick" in context or "qty_precision" in context:
+            self._market = MarketSpec(
+                price_tick=self._trading_context["price_tick"],
+                qty_step=10 ** -self._trading_context["qty_precision"],
+            )
 
-    def risk_control(self):
-        pass
+    def risk_control(self, orders: List[Order]) -> None:
+        """
+        Raise RiskControlException if the risk engine vetoes ``orders``.
+        """
+        if self._risk is not None:
+            self._risk.check(orders)
 
     def should_trade(self, indicator: Indicator) -> ShouldTradeResult:
         side = indicator.side
@@ -421,14 +509,14 @@ class Strategy:
             return ShouldTradeResult(code=0, reason="No indicator side")
 
         # 指标方向与持仓方向相反，不交易
-        if self._position["side"] != 0 and self._position["side"] != side:
+        if self._position.side != 0 and self._position.side != side:
             return ShouldTradeResult(
                 code=0,
                 reason="Current holding position side is opposite to indicator side",
             )
 
         # 浮盈状态等待止盈，不交易
-        unrealized_pnl = self._position["unrealized_pnl"]
+        unrealized_pnl = self._position.unrealized_pnl
         if unrealized_pnl > 0:
             return ShouldTradeResult(
                 code=0,
@@ -452,7 +540,7 @@ class Strategy:
             )
 
         # 满仓
-        if self._position["qty"] >= self._store["max_pos_qty"]:
+        if self._position.qty >= self._store["max_pos_qty"]:
             return ShouldTradeResult(
                 code=0,
                 reason="Current holding position qty exceeds allowed max value",
@@ -463,21 +551,240 @@ class Strategy:
             reason="Pass all checks",
         )
 
+    async def _latest(self, stream: str, fetch):
+        """
+        Last value of a market data stream, from the hub if it is fresh enough
+        or through ``fetch`` (REST) otherwise.
+        """
+        hub = self._market_data
+        if hub is None:
+            return await fetch()
+
+        subscription = self._subscriptions.get(stream)
+        if subscription is None or subscription.key[1] != self.pair:
+            if subscription is not None:
+                subscription.close()
+            # Only the last value is used, keep no backlog
+            subscription = self._subscriptions[stream] = hub.subscribe(
+                self._exchange, self.pair, stream, maxsize=1
+            )
+        if subscription.age <= hub.max_age:
+            return subscription.latest
+        return await fetch()
+
     async def _indicator(self, period: str) -> Indicator:
         pair = self._trading_context["pair"]
-        candles = await self._exchange.fetch_candles(pair=pair, period=period)
-        close_prices = pd.Series(c[3] for c in candles)
-        return _cal_indicator(prices=close_prices)
+        service = self._indicator_service
+        if service is None:
+            candles = await self._exchange.fetch_candles(pair=pair, period=period)
+            return trend_indicator(candles)
+
+        key = self._indicator_key
+        if key is None or key[1:3] != (pair, period):
+            if key is not None:
+                service.unsubscribe(key)
+            key = self._indicator_key = service.subscribe(
+                self._exchange, pair, period, TREND
+            )
+        return await service.get(self._exchange, key)
+
+    async def multi_timeframe_indicators(
+        self, periods: Sequence[str]
+    ) -> Dict[str, Indicator]:
+        """
+        Indicators of several timeframes, all built from one 1m candle fetch.
+
+        Higher timeframes are aggregated in memory; each of them is fetched from
+        the exchange only once, the first time it is requested, to seed history.
+        """
+        pair = self._trading_context["pair"]
+        seeding = [
+            p
+            for p in periods
+            if p != self._candles.base_period and p not in self._seeded_periods
+        ]
+        results = await asyncio.gather(
+            self._exchange.fetch_candles(pair=pair, period=self._candles.base_period),
+            *(self._exchange.fetch_candles(pair=pair, period=p) for p in seeding),
+        )
+        for period, candles in zip(seeding, results[1:]):
+            self._candles.seed(period, candles)
+            self._seeded_periods.add(period)
+        self._candles.update(results[0])
+
+        service = self._indicator_service
+        if service is None:
+            return {p: trend_indicator(self.candles(p)) for p in periods}
+        indicators = await asyncio.gather(
+            *(service.compute(TREND, self.candles(p)) for p in periods)
+        )
+        return dict(zip(periods, indicators))
+
+    def candles(self, period: str) -> Candles:
+        return self._candles.candles(period)
 
     async def _sync_balance(self):
         currency = self._trading_context["target_currency"]
-        print('currency', currency)
         self._balance = await self._exchange.fetch_total_balance(currency)
 
     async def _sync_position(self):
         pair = self._trading_context["pair"]
-        result = await self._exchange.fetch_position(pair)
-        self._position.update(result)
+        position = await self._exchange.fetch_position(pair)
+        previous = self._position
+        if (position.qty, position.side, position.avg_price) != (
+            previous.qty,
+            previous.side,
+            previous.avg_price,
+        ):
+            # Some of our orders were (partially) filled
+            self._orders.invalidate()
+        self._position = position
+        self._check_protection()
+
+    def _refresh_orders(self) -> None:
+        # Without order updates, orders cancelled, expired or rejected by the
+        # exchange are only seen in a snapshot: take one every cycle
+        if not self._order_stream:
+            self._orders.invalidate()
+
+    def on_order_update(self, update: OrderUpdate) -> None:
+        """
+        Apply an order update pushed by the exchange (user data stream).
+        """
+        self._order_stream = True
+        self._orders.on_update(update)
+        if update.status not in ("NEW", "CANCELED"):
+            # Filled, the position changed
+            self._orders.invalidate()
+
+    async def _current_orders(self) -> List[Order]:
+        """
+        Our open orders from the local book, refreshed from the exchange only
+        when a snapshot is due.
+        """
+        if self._orders.needs_snapshot():
+            orders = await self._exchange.fetch_current_orders(self.pair)
+            self._orders.apply_snapshot(orders)
+        return self._orders.open_orders
+
+    async def _place_orders(self, orders: List[Order]) -> None:
+        if not orders:
+            return
+        self._metrics.incr("order_requests", len(orders))
+        try:
+            placed = await self._exchange.place_orders_batch(orders)
+        except Exception:
+            # Some orders of the batch may have been placed
+            self._orders.invalidate()
+            raise
+        for order in placed:
+            self._orders.on_placed(order)
+        self._check_protection()
+
+    async def _cancel_all_orders(self) -> None:
+        self._metrics.incr("order_requests")
+        try:
+            await self._exchange.cancel_current_orders(self.pair)
+        except Exception:
+            self._orders.invalidate()
+            raise
+        self._orders.on_all_canceled()
+        self._check_protection()
+
+    async def _cancel_orders(self, orders: List[Order]) -> None:
+        async def cancel(order):
+            try:
+                await self._exchange.cancel_order(self.pair, order.client_order_id)
+            except ExchangeException as exc:
+                # Most likely filled or already cancelled
+                logger.warning("Failed to cancel %s: %s", order, exc)
+                self._orders.invalidate()
+            else:
+                self._orders.on_canceled(order)
+
+        self._metrics.incr("order_requests", len(orders))
+        await asyncio.gather(*(cancel(o) for o in orders))
+        self._check_protection()
+
+    async def _amend_order(self, current: Order, target: Order) -> None:
+        """
+        Bring ``current`` to the price/qty of ``target`` without touching the
+        other orders.
+        """
+        if current.order_type == OrderType.trigger:
+            # Stop orders can't be modified: place the new one before
+            # cancelling the old one so the position always has a stop loss
+            await self._place_orders([target])
+            await self._cancel_orders([current])
+            return
+
+        self._metrics.incr("order_requests")
+        try:
+            amended = await self._exchange.modify_order(current, target)
+        except OrderNotFound as exc:
+            # Filled or cancelled meanwhile, the next cycle works from a
+            # fresh snapshot and position
+            logger.warning("Failed to amend %s: %s", current, exc)
+            self._orders.on_canceled(current)
+            self._orders.invalidate()
+            return
+        except Exception:
+            self._orders.invalidate()
+            raise
+        self._orders.on_canceled(current)
+        self._orders.on_placed(amended)
+
+    def _check_protection(self) -> None:
+        """
+        Measure how long a position stays without a stop loss order.
+        """
+        protected = (
+            self._position.qty == 0 or self._orders.by_role(STOP_LOSS) is not None
+        )
+        now = time.monotonic()
+        if not protected:
+            if self._unprotected_since is None:
+                self._unprotected_since = now
+            return
+        if self._unprotected_since is None:
+            return
+
+        window_ms = round((now - self._unprotected_since) * 1000, 3)
+        self._unprotected_since = None
+        self._unprotected_max_ms = max(self._unprotected_max_ms, window_ms)
+        self._metrics.incr("sl_unprotected_count")
+        self._metrics.set("sl_unprotected_last_ms", window_ms)
+        self._metrics.set("sl_unprotected_max_ms", self._unprotected_max_ms)
+
+    async def _replace_orders(self, orders: List[Order]) -> None:
+        """
+        Make our open orders match ``orders``. Open orders with the role of a
+        wanted order are kept, or amended when price/qty differ; others are
+        cancelled and the missing ones are placed.
+        """
+        tracker = self._orders
+        current = await self._current_orders()
+        wanted = {tracker.role(o): o for o in orders}
+        stale = []
+        amends = []
+        for order in current:
+            role = tracker.role(order)
+            target = wanted.pop(role, None) if role is not None else None
+            if target is None:
+                stale.append(order)
+            elif target.order_type != order.order_type:
+                stale.append(order)
+                wanted[role] = target
+            elif not self._market.order_matches(order, target):
+                amends.append((order, target))
+
+        if stale and len(stale) == len(current):
+            await self._cancel_all_orders()
+        elif stale:
+            await self._cancel_orders(stale)
+        for order, target in amends:
+            await self._amend_order(order, target)
+        await self._place_orders(list(wanted.values()))
 
     @classmethod
     def new(cls, position=None):
@@ -491,6 +798,9 @@ class Strategy:
             "pair": "ETHUSDT",
             "target_currency": "USDT",
             "market_type": "linear_perpetual",
+            "price_precision": 2,
+            "price_tick": 0.01,
+            "qty_precision": 3,
         }
         strategy = cls(exchange=exchange)
         strategy.set_trading_context(context)
@@ -512,15 +822,7 @@ class Strategy:
         }
 
         # set position
-        strategy._position = {
-            "qty": 0.0,
-            "side": Side.no,
-            "liq_price": 0.0,
-            "avg_price": 0.0,
-            "unrealized_pnl": 0.0,
-        }
-        if position is not None:
-            strategy._position.update(position)
+        strategy._position = Position(pair=context["pair"], **(position or {}))
 
         strategy._balance = 1000
         strategy._store = {
@@ -0,0 +1,159 @@
+"""
+Supervision of the robot's background loops (ping, feedback, logs, report).
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from bot.lifecycle import cancel_tasks
+from bot.metrics import Metrics, registry
+
+__all__ = ["TaskSupervisor"]
+
+logger = logging.getLogger(__name__)
+
+RUNNING = "running"
+BACKOFF = "backoff"
+STOPPED = "stopped"
+
+
+class _Loop:
+    def __init__(
+        self,
+        name: str,
+        iteration: Callable[[], Awaitable],
+        interval: float,
+        timeout: Optional[float],
+    ):
+        self.name = name
+        self.iteration = iteration
+        self.interval = interval
+        self.timeout = timeout
+        self.task: Optional[asyncio.Task] = None
+        self.state = STOPPED
+        self.iterations = 0
+        self.failures = 0  # consecutive
+        self.restarts = 0
+        self.timeouts = 0
+        self.last_ms = 0.0
+        self.max_ms = 0.0
+        self.last_success = time.monotonic()
+
+
+class TaskSupervisor:
+    """
+    Runs each loop as ``sleep(interval)`` then ``iteration()``, forever.
+
+    An iteration taking more than its ``timeout`` is cancelled. An iteration
+    that fails, whatever it raised short of KeyboardInterrupt/SystemExit, is
+    logged and the loop restarts after an exponential backoff (``base_delay``
+    doubling up to ``max_delay``), reset by the next successful iteration.
+
+    Metrics are reported as ``<prefix><loop>_<field>``.
+    """
+
+    def __init__(
+        self,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        metrics: Metrics = registry,
+        prefix: str = "task_",
+    ):
+        self.base_delay = base_delay
+        self.prefix = prefix
+        self.max_delay = max_delay
+        self._loops: Dict[str, _Loop] = {}
+        self._metrics = metrics
+        metrics.register(self.metrics)
+
+    def add(
+        self,
+        name: str,
+        iteration: Callable[[], Awaitable],
+        interval: float = 0.0,
+        timeout: Optional[float] = None,
+    ) -> None:
+        if name in self._loops:
+            raise ValueError("Loop {} already supervised".format(name))
+        loop = self._loops[name] = _Loop(name, iteration, interval, timeout)
+        loop.task = asyncio.get_event_loop().create_task(self._run(loop), name=name)
+
+    async def stop(self, timeout: float, names: Optional[Iterable[str]] = None):
+        """
+        Cancel the given loops (all of them by default) and wait up to
+        ``timeout`` seconds for them to finish.
+        """
+        names = list(self._loops) if names is None else list(names)
+        loops = [self._loops[n] for n in names if n in self._loops]
+        await cancel_tasks([lo.task for lo in loops], timeout)
+        for loop in loops:
+            loop.state = STOPPED
+            del self._loops[loop.name]
+        if not self._loops:
+            self._metrics.unregister(self.metrics)
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        now = time.monotonic()
+        return {
+            name: {
+                "state": loop.state,
+                "iterations": loop.iterations,
+                "restarts": loop.restarts,
+                "timeouts": loop.timeouts,
+                "last_ms": round(loop.last_ms, 3),
+                "max_ms": round(loop.max_ms, 3),
+                "since_success": round(now - loop.last_success, 3),
+            }
+            for name, loop in self._loops.items()
+        }
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "{}{}_{}".format(self.prefix, name, key): value
+            for name, health in self.health().items()
+            for key, value in health.items()
+        }
+
+    async def _run(self, loop: _Loop) -> None:
+        while True:
+            loop.state = RUNNING
+            if loop.interval:
+                await asyncio.sleep(loop.interval)
+            started = time.perf_counter()
+            try:
+                if loop.timeout is None:
+                    await loop.iteration()
+                else:
+                    await asyncio.wait_for(loop.iteration(), loop.timeout)
+            except (asyncio.CancelledError, KeyboardInterrupt, SystemExit):
+                raise
+            except BaseException as exc:
+                failure: Optional[BaseException] = exc
+            else:
+                failure = None
+            loop.last_ms = (time.perf_counter() - started) * 1000
+            loop.max_ms = max(loop.max_ms, loop.last_ms)
+
+            if failure is None:
+                loop.iterations += 1
+                loop.failures = 0
+                loop.last_success = time.monotonic()
+                continue
+            if isinstance(failure, asyncio.TimeoutError):
+                loop.timeouts += 1
+                logger.warning(
+                    "Task %s iteration timed out after %ss", loop.name, loop.timeout
+                )
+            else:
+                logger.error("Task %s failed: %r", loop.name, failure, exc_info=failure)
+            await self._backoff(loop)
+
+    async def _backoff(self, loop: _Loop) -> None:
+        loop.failures += 1
+        loop.restarts += 1
+        loop.state = BACKOFF
+        delay = min(self.max_delay, self.base_delay * 2 ** (loop.failures - 1))
+        logger.info("Restarting task %s in %.1fs", loop.name, delay)
+        await asyncio.sleep(delay)
@@ -0,0 +1,164 @@
+import numpy as np
+import pytest
+
+from bot.backtest import (
+    ReplayStrategy,
+    load_candles,
+    monte_carlo,
+    resample,
+    run_backtest,
+    walk_forward,
+)
+from bot.enums import OrderType
+from bot.exchanges.fake import FakeExchange
+from bot.indicators import Indicator
+from bot.records import Position
+from bot.tests.test_paper import PARAMETERS
+
+NO_FEES = {"makerFee": 0, "takerFee": 0}
+
+
+def candles(close):
+    close = np.round(close, 2)
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) + 0.3
+    low = np.minimum(open_, close) - 0.3
+    return np.stack([open_, high, low, close], axis=1)
+
+
+def rising(n=1000):
+    t = np.arange(n)
+    return candles(350 + 0.1 * t)
+
+
+def choppy(n=3000):
+    t = np.arange(n)
+    return candles(350 + 0.02 * t + np.sin(t / 4) * 1.5)
+
+
+def test_replay_strategy_orders():
+    strategy = ReplayStrategy(FakeExchange())
+    strategy.set_trading_context(
+        {
+            "pair": "ETHUSDT",
+            "market_type": "linear_perpetual",
+            "price_tick": 0.01,
+            "qty_precision": 3,
+            "client_order_prefix": "bt",
+        }
+    )
+    strategy.parameters = PARAMETERS
+
+    orders = strategy.orders_for(10000, Position(), 350.0, Indicator(1, 0.01))
+    assert [(o.side, o.price) for o in orders] == [
+        (1, 349.95),
+        (1, 349.95),
+        (1, 349.99),
+        (1, 349.98),
+    ]
+    assert orders[0].qty == pytest.approx(0.857)
+    # Too volatile: nothing new
+    assert strategy.orders_for(10000, Position(), 350.0, Indicator(1, 1000)) == []
+
+    long = Position(qty=1, side=1, avg_price=350.0, unrealized_pnl=1.0)
+    # In profit: only the TP/SL
+    orders = strategy.orders_for(10000, long, 351.0, Indicator(1, 0.01))
+    assert [(o.order_type, o.side, o.price) for o in orders] == [
+        (OrderType.limit, -1, 350.5),
+        (OrderType.trigger, -1, 349.0),
+    ]
+    strategy.parameters = {"trendFollowing": False}
+    long.unrealized_pnl = -1.0
+    orders = strategy.orders_for(10000, long, 349.0, Indicator(-1, 0.01))
+    assert len(orders) == 5 and orders[0].side == 1
+
+
+def test_run_backtest():
+    result = run_backtest(rising(), PARAMETERS, NO_FEES)
+    assert result["candles"] == 979
+    assert result["fills"] > 0 and result["pnl"] > 0
+    assert result["max_drawdown"] == 0
+    assert result["return"] == pytest.approx(result["pnl"] / 10000)
+
+    result = run_backtest(choppy(), PARAMETERS)
+    assert result["pnl"] < 0 and result["fees"] > 0
+    assert 0 < result["max_drawdown"] < 1
+    assert result == run_backtest(choppy(), PARAMETERS)
+
+    assert run_backtest(rising(), dict(PARAMETERS, maxRw=0))["fills"] == 0
+    assert run_backtest(rising(), dict(PARAMETERS, allowLong=False))["fills"] == 0
+
+
+def test_resample():
+    ohlc = choppy(500)
+    rng = np.random.default_rng(1)
+    path = resample(ohlc, rng, block=20)
+    assert path.shape == ohlc.shape
+    assert (path[0] == ohlc[0]).all()
+    assert (path[:, 1] >= path[:, [0, 3]].max(axis=1)).all()
+    assert (path[:, 2] <= path[:, [0, 3]].min(axis=1)).all()
+    assert not np.allclose(path, ohlc)
+    # One block spanning the whole series gives it back
+    assert np.allclose(resample(ohlc, rng, block=len(ohlc)), ohlc)
+
+
+def test_walk_forward_picks_the_best_train_parameters():
+    chop = choppy(1200)
+    ohlc = np.concatenate((chop, rising(1800) + (chop[-1, 3] - 350)))
+    grid = {"allowLong": [True, False], "maxRw": [0, 100]}
+    report = walk_forward(
+        ohlc, PARAMETERS, grid, train=600, test=300, step=600, workers=1
+    )
+    windows = report["windows"]
+    assert [w["test"] for w in windows] == [
+        [621, 921],
+        [1221, 1521],
+        [1821, 2121],
+        [2421, 2721],
+    ]
+    assert report["candidates"] == 4
+    for window in windows:
+        begin, end = window["train"]
+        history = max(0, begin - 200)
+        best = max(
+            run_backtest(
+                ohlc[history:end],
+                dict(PARAMETERS, allowLong=allow_long, maxRw=max_rw),
+                start=begin - history,
+            )["pnl"]
+            for allow_long in (True, False)
+            for max_rw in (0, 100)
+        )
+        assert window["train_result"]["pnl"] == best
+    # Staying out of the choppy market, going long once it trends up
+    assert windows[0]["parameters"]["maxRw"] == 0
+    assert windows[0]["test_result"]["pnl"] == 0
+    assert windows[-1]["parameters"] == {"allowLong": True, "maxRw": 100}
+    assert windows[-1]["test_result"]["pnl"] > 0
+    assert report["total_pnl"] == pytest.approx(
+        sum(w["test_result"]["pnl"] for w in windows)
+    )
+    with pytest.raises(ValueError):
+        walk_forward(ohlc, PARAMETERS, grid, train=3000, test=500)
+
+
+def test_monte_carlo_in_worker_processes():
+    ohlc = choppy(600)
+    report = monte_carlo(ohlc, PARAMETERS, paths=4, block=10, seed=3, workers=2)
+    assert report == monte_carlo(ohlc, PARAMETERS, paths=4, block=10, seed=3, workers=1)
+    assert report["original"] == run_backtest(ohlc, PARAMETERS)
+    assert report["pnl"]["min"] <= report["pnl"]["p50"] <= report["pnl"]["max"]
+    assert 0 <= report["loss_probability"] <= 1
+
+
+def test_load_candles(tmp_path):
+    path = tmp_path / "candles.csv"
+    path.write_text(
+        "timestamp,open,high,low,close,volume\n"
+        "0,350.0,351.0,349.5,350.5,10\n"
+        "60000,350.5,352.0,350.0,351.5,12\n"
+    )
+    assert load_candles(str(path)).tolist() == [
+        [350.0, 351.0, 349.5, 350.5],
+        [350.5, 352.0, 350.0, 351.5],
+    ]
@@ -0,0 +1,236 @@
+import asyncio
+
+import pytest
+
+from bot.enums import OrderType
+from bot.exceptions import ExchangeException, UnsupportedMarketType
+from bot.exchanges import exchange_factory
+from bot.exchanges.binance import Binance
+from bot.exchanges.binance_native import BinanceFuturesClient, BinanceNative
+from bot.exchanges.mock_binance import MockBinanceFutures, point_to
+from bot.records import Order
+
+
+def test_sign_matches_binance_docs_example(monkeypatch):
+    # https://binance-docs.github.io/apidocs/futures/en/#signed-trade-and-user_data-endpoint-security
+    monkeypatch.setattr("bot.exchanges.binance_native.time.time", lambda: 0)
+    client = BinanceFuturesClient(
+        secret="2b5eb11e18796d12d88f13dc27dbbd02c2cc51ff7059765ed9821957d82bb4d9"
+    )
+    client.time_offset = 1591702613943
+    query = client.sign(
+        {
+            "symbol": "BTCUSDT",
+            "side": "BUY",
+            "type": "LIMIT",
+            "quantity": 1,
+            "price": 9000,
+            "timeInForce": "GTC",
+        }
+    )
+    assert query.endswith(
+        "&recvWindow=5000&timestamp=1591702613943"
+        "&signature=3c661234138461fcc7a7d8746c6558c9842d4e10870d2ecbedf7777cad694af9"
+    )
+
+
+def test_exchange_factory_native():
+    assert exchange_factory("Binance") is Binance
+    assert exchange_factory("binance", native=True) is BinanceNative
+    assert exchange_factory("unknown", native=True) is None
+
+
+def test_native_adapter_against_mock_server():
+    server = MockBinanceFutures(seed=1)
+    exchange = BinanceNative()
+    exchange.set_market_type("linear_perpetual")
+    exchange.auth({"api_key": "key", "secret": "secret"})
+
+    async def run():
+        point_to(exchange, await server.start())
+        try:
+            await exchange.prepare()
+            assert exchange.price_precision("ETHUSDT") == 2
+            assert exchange.price_ticker("ETHUSDT") == 0.01
+            assert exchange.qty_precision("ETHUSDT") == 3
+
+            last_price = await exchange.fetch_last_price("ETHUSDT")
+            ticker = await exchange.fetch_order_book_ticker("ETHUSDT")
+            candles = await exchange.fetch_candles("ETHUSDT", "5m")
+            balance = await exchange.fetch_total_balance("USDT")
+            flat = await exchange.fetch_position("ETHUSDT")
+
+            await exchange.place_order(
+                pair="ETHUSDT", order_type=OrderType.market, side=1, qty=0.5
+            )
+            position = await exchange.fetch_position("ETHUSDT")
+            await exchange.place_orders_batch(
+                [
+                    Order(
+                        "ETHUSDT",
+                        OrderType.limit,
+                        -1,
+                        0.5,
+                        round(position.avg_price + 50, 2),
+                        extras=exchange.get_tp_order_extras(),
+                    ),
+                    Order("ETHUSDT", OrderType.trigger, -1, 0.5, 200.0),
+                ]
+            )
+            orders = await exchange.fetch_current_orders("ETHUSDT")
+            orders.sort(key=lambda o: o.order_type.value)
+            tp, sl = orders
+            new_tp = Order("ETHUSDT", OrderType.limit, -1, 0.5, tp.price + 1)
+            new_sl = Order("ETHUSDT", OrderType.trigger, -1, 0.5, 210.0)
+            amended = [
+                await exchange.modify_order(tp, new_tp),
+                await exchange.modify_order(sl, new_sl),
+            ]
+            assert await exchange.fetch_current_orders("ETHUSDT") != orders
+            await exchange.cancel_current_orders("ETHUSDT")
+            remaining = await exchange.fetch_current_orders("ETHUSDT")
+        finally:
+            await exchange.close()
+            await server.stop()
+        return (
+            last_price,
+            ticker,
+            candles,
+            balance,
+            flat,
+            position,
+            orders,
+            amended,
+            remaining,
+        )
+
+    (
+        last_price,
+        ticker,
+        candles,
+        balance,
+        flat,
+        position,
+        orders,
+        amended,
+        remaining,
+    ) = asyncio.run(run())
+    assert last_price > 0
+    assert ticker.ask0 > ticker.bid0
+    assert len(candles) == 201
+    assert balance == 10000
+    assert flat.qty == 0 and flat.pair == "ETHUSDT"
+    assert (position.side, position.qty) == (1, 0.5)
+    assert [o.order_type for o in orders] == [OrderType.limit, OrderType.trigger]
+    assert orders[1] == Order("ETHUSDT", OrderType.trigger, -1, 0.5, 200.0)
+    assert all(o.order_id and o.client_order_id for o in orders)
+    # Limit orders are modified in place, stop orders placed again
+    assert amended[0].client_order_id == orders[0].client_order_id
+    assert amended[0].order_id == orders[0].order_id
+    assert amended[0].price == orders[0].price + 1
+    assert amended[1].client_order_id == orders[1].client_order_id
+    assert amended[1].order_id != orders[1].order_id
+    assert amended[1].price == 210.0
+    assert server.request_count["/fapi/v1/order"] == 6
+    assert remaining == []
+    assert server._orders["ETHUSDT"] == {}
+
+
+def test_native_adapter_errors():
+    server = MockBinanceFutures(seed=1)
+    exchange = BinanceNative()
+
+    async def run():
+        point_to(exchange, await server.start())
+        try:
+            with pytest.raises(ExchangeException) as exc_info:
+                await exchange.fetch_last_price("UNKNOWN")
+            # Signed endpoints require an API key
+            with pytest.raises(ExchangeException):
+                await exchange.fetch_position("ETHUSDT")
+        finally:
+            await exchange.close()
+            await server.stop()
+        return exc_info.value
+
+    exc = asyncio.run(run())
+    assert exc.__cause__.code == -1121
+
+    with pytest.raises(UnsupportedMarketType):
+        exchange.set_market_type("inverse_perpetual")
+
+
+def test_native_modify_order_to_another_side():
+    server = MockBinanceFutures(seed=1)
+    exchange = BinanceNative()
+    exchange.set_market_type("linear_perpetual")
+    exchange.auth({"api_key": "key", "secret": "secret"})
+
+    async def run():
+        point_to(exchange, await server.start())
+        try:
+            await exchange.prepare()
+            price = await exchange.fetch_last_price("ETHUSDT")
+            entry = await exchange.place_order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                side=1,
+                qty=0.5,
+                price=round(price - 20, 2),
+                client_order_id="nb-entry1-1",
+            )
+            target = Order(
+                "ETHUSDT",
+                OrderType.limit,
+                -1,
+                0.5,
+                round(price + 20, 2),
+                client_order_id="nb-tp-2",
+            )
+            amended = await exchange.modify_order(entry, target)
+            return amended, await exchange.fetch_current_orders("ETHUSDT")
+        finally:
+            await exchange.close()
+            await server.stop()
+
+    amended, orders = asyncio.run(run())
+    assert (amended.side, amended.client_order_id) == (-1, "nb-tp-2")
+    assert [(o.side, o.client_order_id) for o in orders] == [(-1, "nb-tp-2")]
+
+
+def test_native_open_orders_of_other_types():
+    server = MockBinanceFutures(seed=1)
+    exchange = BinanceNative()
+    exchange.set_market_type("linear_perpetual")
+    exchange.auth({"api_key": "key", "secret": "secret"})
+
+    async def run():
+        point_to(exchange, await server.start())
+        try:
+            # e.g. placed by hand in the UI
+            for order_type, params in (
+                ("STOP", {"stopPrice": "300.00", "price": "299.00"}),
+                ("TRAILING_STOP_MARKET", {"callbackRate": "1"}),
+            ):
+                await exchange._client.request(
+                    "POST",
+                    "/fapi/v1/order",
+                    dict(
+                        symbol="ETHUSDT",
+                        side="SELL",
+                        type=order_type,
+                        quantity="0.5",
+                        **params
+                    ),
+                    signed=True,
+                )
+            return await exchange.fetch_current_orders("ETHUSDT")
+        finally:
+            await exchange.close()
+            await server.stop()
+
+    orders = asyncio.run(run())
+    assert [(o.order_type, o.price) for o in orders] == [
+        (OrderType.trigger, 300.0),
+        (OrderType.trigger, None),
+    ]
@@ -0,0 +1,174 @@
+import asyncio
+
+import pytest
+
+from bot.exceptions import CircuitOpen, ExchangeException
+from bot.exchanges.binance_native import BinanceNative
+from bot.exchanges.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from bot.exchanges.fake import FakeExchange
+from bot.exchanges.mock_binance import MockBinanceFutures, point_to
+from bot.exchanges.retry import RetryingExchange, RetryPolicy
+from bot.metrics import Metrics
+from bot.strategy import Strategy
+
+POSITION = {"qty": 1.5, "side": 1, "liq_price": 300.0, "avg_price": 359.1}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_breaker(**kwargs):
+    clock = Clock()
+    breaker = CircuitBreaker(
+        "test", reset_timeout=30, metrics=Metrics(), clock=clock, **kwargs
+    )
+    return breaker, clock
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker, clock = make_breaker(failure_threshold=3)
+    breaker.on_failure()
+    breaker.on_failure()
+    breaker.on_success(0.1)
+    breaker.on_failure()
+    breaker.on_failure()
+    assert breaker.state == CLOSED
+    breaker.on_failure()
+    assert breaker.state == OPEN and breaker.degraded
+
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    # Protective calls still go through, their success doesn't close it
+    breaker.before_call(essential=True)
+    breaker.on_success(0.1)
+    assert breaker.state == OPEN
+    assert breaker.rejected == 1
+
+
+def test_breaker_half_open_probe():
+    breaker, clock = make_breaker(failure_threshold=1)
+    breaker.on_failure()
+    clock.now = 30
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()  # the probe
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.on_failure()
+    assert breaker.state == OPEN
+    assert breaker.open_count == 2
+
+    clock.now = 60
+    breaker.before_call()
+    breaker.on_success(0.1)
+    assert breaker.state == CLOSED
+    breaker.before_call()
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker, clock = make_breaker(slow_call_threshold=1.0, slow_call_limit=2)
+    breaker.on_success(1.5)
+    breaker.on_success(0.2)
+    breaker.on_success(1.5)
+    assert breaker.state == CLOSED
+    breaker.on_success(1.5)
+    assert breaker.state == OPEN
+
+
+def test_retrying_exchange_suspends_non_essential_calls():
+    server = MockBinanceFutures(
+        seed=1, endpoint_overrides={"/fapi/v1/ticker/price": {"error_rate": 1.0}}
+    )
+    native = BinanceNative()
+    native.set_market_type("linear_perpetual")
+    native.auth({"api_key": "key", "secret": "secret"})
+    breaker, clock = make_breaker(failure_threshold=2)
+    exchange = RetryingExchange(
+        native, RetryPolicy(max_attempts=1), breaker=breaker, metrics=Metrics()
+    )
+
+    async def run():
+        point_to(native, await server.start())
+        try:
+            await exchange.prepare()
+            for _ in range(2):
+                with pytest.raises(ExchangeException):
+                    await exchange.fetch_last_price("ETHUSDT")
+            with pytest.raises(CircuitOpen):
+                await exchange.fetch_last_price("ETHUSDT")
+            await exchange.fetch_position("ETHUSDT")
+        finally:
+            await exchange.close()
+            await server.stop()
+
+    asyncio.run(run())
+    assert breaker.state == OPEN
+    assert server.request_count["/fapi/v1/ticker/price"] == 2
+    assert server.request_count["/fapi/v2/positionRisk"] == 1
+
+
+def test_degraded_strategy_only_maintains_tp_sl():
+    fake = FakeExchange(seed=1)
+    fake.set_position(POSITION)
+    breaker, clock = make_breaker(failure_threshold=1)
+    breaker.on_failure()
+    strategy = Strategy.new(position=POSITION)
+    strategy._exchange = RetryingExchange(fake, breaker=breaker, metrics=Metrics())
+    strategy._circuit_breaker = breaker
+    assert strategy.degraded
+
+    asyncio.run(strategy.trade_once())
+    # Position, order snapshot, then TP and SL: no balance, ticker or candles
+    assert fake.request_count == 4
+    assert sorted(o.order_type.value for o in fake._orders) == sorted(
+        o.order_type.value
+        for o in (strategy.get_take_profit_order(), strategy.get_stop_loss_order())
+    )
+
+
+def test_cancelled_probe_is_released():
+    fake = FakeExchange(latency=10, seed=1)
+    breaker, clock = make_breaker(failure_threshold=1)
+    exchange = RetryingExchange(fake, breaker=breaker, metrics=Metrics())
+    breaker.on_failure()
+    clock.now = 30
+
+    async def run():
+        probe = asyncio.ensure_future(exchange.fetch_last_price("ETHUSDT"))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpen):
+            await exchange.fetch_candles(pair="ETHUSDT", period="1m")
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert breaker.state == HALF_OPEN
+        fake.latency = 0
+        await exchange.fetch_last_price("ETHUSDT")
+
+    asyncio.run(run())
+    assert breaker.state == CLOSED
+
+
+def test_breaker_metrics_per_robot():
+    metrics = Metrics()
+    breakers = [
+        CircuitBreaker("binance", metrics=metrics, prefix="robot{}_".format(i))
+        for i in (1, 2)
+    ]
+    breakers[0].rejected = 3
+    snapshot = metrics.snapshot()
+    assert snapshot["robot1_circuit_rejected"] == 3
+    assert snapshot["robot2_circuit_rejected"] == 0
+    assert snapshot["robot2_circuit_state"] == CLOSED
+
+    breakers[0].close()
+    assert set(metrics.snapshot()) == {
+        "robot2_circuit_state",
+        "robot2_circuit_open_count",
+        "robot2_circuit_rejected",
+    }
@@ -0,0 +1,127 @@
+import asyncio
+import random
+
+import pytest
+
+from bot.candles import CandleAggregator, period_milliseconds
+from bot.exchanges.fake import FakeExchange
+from bot.records import Candles
+from bot.strategy import Strategy
+
+MINUTE = 60 * 1000
+
+
+def make_minutes(start, n, seed=1):
+    rng = random.Random(seed)
+    rows = []
+    close = 100.0
+    for i in range(n):
+        open_ = close
+        close = open_ + rng.uniform(-1, 1)
+        high = max(open_, close) + rng.random()
+        low = min(open_, close) - rng.random()
+        rows.append([start + i * MINUTE, open_, high, low, close, rng.random()])
+    return rows
+
+
+def resample(rows, period):
+    period_ms = period_milliseconds(period)
+    buckets = {}
+    for ts, o, h, lo, c, v in rows:
+        bucket = ts - ts % period_ms
+        if bucket not in buckets:
+            buckets[bucket] = [bucket, o, h, lo, c, v]
+        else:
+            b = buckets[bucket]
+            b[2] = max(b[2], h)
+            b[3] = min(b[3], lo)
+            b[4] = c
+            b[5] += v
+    return [buckets[k] for k in sorted(buckets)]
+
+
+def as_rows(candles):
+    return [list(c) for c in candles]
+
+
+def flat(rows):
+    return [value for row in rows for value in row]
+
+
+@pytest.mark.parametrize("period", ["1m", "5m", "15m", "1h", "4h"])
+def test_incremental_matches_resample(period):
+    # Start in the middle of a 4h bucket
+    start = 1600000000000 - 1600000000000 % MINUTE + 7 * MINUTE
+    rows = make_minutes(start, 600)
+    aggregator = CandleAggregator(maxlen=1000)
+
+    # Feed overlapping windows as fetched every cycle, the last candle of every
+    # window being in progress with a provisional close
+    for end in range(50, 601, 7):
+        window = [list(r) for r in rows[max(0, end - 201) : end]]
+        window[-1][4] = 0.0
+        aggregator.update(Candles.from_ohlcv(window))
+    aggregator.update(Candles.from_ohlcv(rows[-201:]))
+
+    expected = resample(rows, period)
+    assert flat(as_rows(aggregator.candles(period))) == pytest.approx(flat(expected))
+
+
+def test_seed_history():
+    start = 1600000000000 - 1600000000000 % period_milliseconds("1h")
+    history = make_minutes(start - 10 * 60 * MINUTE, 10 * 60)
+    rows = make_minutes(start, 90, seed=2)
+
+    aggregator = CandleAggregator(periods=["1h"])
+    # Fetched with the 1m candles: the in-progress candle is the 2nd one
+    seed = Candles.from_ohlcv(resample(history, "1h") + resample(rows, "1h")[-1:])
+    aggregator.seed("1h", seed)
+    aggregator.update(Candles.from_ohlcv(rows))
+
+    candles = aggregator.candles("1h")
+    assert len(candles) == 12
+    assert flat(as_rows(candles)[:10]) == pytest.approx(flat(resample(history, "1h")))
+    assert flat(as_rows(candles)[10:]) == pytest.approx(flat(resample(rows, "1h")))
+
+
+def test_seed_in_progress_bucket_before_base_history():
+    start = 1600000000000 - 1600000000000 % period_milliseconds("4h")
+    # 4h bucket started 29 minutes before the 201 fetched 1m candles
+    rows = make_minutes(start - 8 * 60 * MINUTE, 8 * 60 + 270)
+    now = 8 * 60 + 230
+    fetched = rows[now - 201 : now]
+    assert fetched[0][0] == start + 29 * MINUTE
+
+    aggregator = CandleAggregator(periods=["4h"])
+    aggregator.seed("4h", Candles.from_ohlcv(resample(rows[:now], "4h")))
+    aggregator.update(Candles.from_ohlcv(fetched))
+    expected = resample(rows[:now], "4h")
+    assert flat(as_rows(aggregator.candles("4h"))) == pytest.approx(flat(expected))
+
+    # Until the bucket is closed
+    for end in range(now + 1, len(rows) + 1):
+        aggregator.update(Candles.from_ohlcv(rows[end - 201 : end]))
+    expected = resample(rows, "4h")
+    assert flat(as_rows(aggregator.candles("4h"))) == pytest.approx(flat(expected))
+    assert aggregator.candles("4h").timestamp[-2] == start
+
+
+def test_unsupported_period():
+    with pytest.raises(ValueError):
+        CandleAggregator(base_period="5m", periods=["3m"])
+    with pytest.raises(ValueError):
+        CandleAggregator().candles("1d")
+
+
+def test_strategy_multi_timeframe_indicators():
+    exchange = FakeExchange(seed=1)
+    strategy = Strategy.new()
+    strategy._exchange = exchange
+
+    indicators = asyncio.run(strategy.multi_timeframe_indicators(["1m", "5m", "1h"]))
+    assert set(indicators) == {"1m", "5m", "1h"}
+    assert exchange.request_count == 3  # 1m, plus seeding 5m and 1h
+
+    asyncio.run(strategy.multi_timeframe_indicators(["1m", "5m", "1h"]))
+    assert exchange.request_count == 4
+    assert len(strategy.candles("5m")) >= 200
@@ -0,0 +1,207 @@
+import asyncio
+
+from bot.exchanges.binance import Binance
+from bot.exchanges.binance_native import BinanceNative
+from bot.exchanges.fake import FakeExchange
+from bot.exchanges.hub import MarketDataHub, Subscription
+from bot.exchanges.mock_binance import MockBinanceFutures, point_to
+from bot.metrics import Metrics
+from bot.records import Candle, OrderBookTicker
+from bot.strategy import Strategy
+
+
+def candle(timestamp, close):
+    return Candle(timestamp, close, close, close, close, 1.0)
+
+
+def test_subscription_conflates_and_drops():
+    hub = MarketDataHub(metrics=None)
+
+    async def run():
+        tickers = Subscription(hub, ("fake", "ETHUSDT", "ticker"), maxsize=3)
+        for price in (1.0, 2.0, 3.0):
+            tickers._put(price, None)
+        assert tickers.pending() == 1
+        assert tickers.conflated == 2
+        assert await tickers.get() == 3.0
+
+        klines = Subscription(hub, ("fake", "ETHUSDT", "kline_1m"), maxsize=3)
+        for timestamp, close in [(1, 1.0), (1, 1.5), (2, 2.0), (3, 3.0), (4, 4.0)]:
+            klines._put(candle(timestamp, close), timestamp)
+        assert klines.conflated == 1
+        assert klines.dropped == 1
+        assert [(await klines.get()).timestamp for _ in range(3)] == [2, 3, 4]
+        assert klines.latest.close == 4.0
+
+    asyncio.run(run())
+
+
+def test_single_upstream_per_stream():
+    metrics = Metrics()
+    hub = MarketDataHub(poll_interval=0.01, metrics=metrics)
+    exchange = FakeExchange(seed=1)
+
+    async def run():
+        fast = [hub.subscribe(exchange, "ETHUSDT", "ticker") for _ in range(3)]
+        slow = hub.subscribe(exchange, "ETHUSDT", "ticker")
+        for _ in range(5):
+            await asyncio.gather(*(s.get() for s in fast))
+        snapshot = metrics.snapshot()
+
+        subscriptions = fast + [slow]
+        for subscription in subscriptions:
+            subscription.close()
+        assert hub.keys == []
+        await hub.close()
+        return subscriptions, snapshot
+
+    subscriptions, snapshot = asyncio.run(run())
+    slow = subscriptions[-1]
+    assert len({s.latest for s in subscriptions}) == 1
+    # One poll per update whatever the number of subscribers
+    assert exchange.request_count == slow.received >= 5
+    assert slow.pending() == 1
+    assert slow.conflated == slow.received - 1
+    assert snapshot["market_data_upstreams"] == 1
+    assert snapshot["market_data_subscribers"] == 4
+    assert "market_data_upstreams" in metrics.snapshot()
+
+
+def test_upstream_failure_is_retried(caplog):
+    hub = MarketDataHub(poll_interval=0.01, retry_delay=0.01, metrics=None)
+    exchange = FakeExchange(seed=1)
+    fetch_last_price = exchange.fetch_last_price
+    calls = []
+
+    async def flaky(pair):
+        calls.append(pair)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+        return await fetch_last_price(pair)
+
+    exchange.fetch_last_price = flaky
+
+    async def run():
+        subscription = hub.subscribe(exchange, "ETHUSDT", "ticker")
+        price = await asyncio.wait_for(subscription.get(), 1)
+        await hub.close()
+        return price
+
+    assert asyncio.run(run()) > 0
+    assert "boom" in caplog.text
+
+
+def test_binance_websocket_upstream():
+    server = MockBinanceFutures(seed=1)
+    server.stream_interval = 0.01
+    hub = MarketDataHub(metrics=None)
+    exchange = Binance()
+    exchange.set_market_type("linear_perpetual")
+
+    async def run():
+        base_url = await server.start()
+        point_to(exchange, base_url)
+        books = [hub.subscribe(exchange, "ETHUSDT", "book_ticker") for _ in range(3)]
+        klines = hub.subscribe(exchange, "ETHUSDT", "kline_1m")
+        try:
+            book = await asyncio.wait_for(books[0].get(), 2)
+            kline = await asyncio.wait_for(klines.get(), 2)
+        finally:
+            await hub.close()
+            await exchange.close()
+            await server.stop()
+        return book, kline
+
+    book, kline = asyncio.run(run())
+    assert isinstance(book, OrderBookTicker)
+    assert round(book.ask0 - book.bid0, 2) == 0.01
+    assert isinstance(kline, Candle)
+    assert kline.timestamp % 60000 == 0
+    assert server.request_count["/ws/ethusdt@bookTicker"] == 1
+    assert server.request_count["/ws/ethusdt@kline_1m"] == 1
+
+
+def test_strategy_reads_market_data_from_hub():
+    hub = MarketDataHub(poll_interval=0.01, metrics=None)
+    exchange = FakeExchange(seed=1)
+    strategy = Strategy(exchange, market_data=hub)
+    strategy.set_trading_context({"pair": "ETHUSDT"})
+
+    async def run():
+        fetch = exchange.fetch_last_price
+        # Nothing received yet, falls back to REST
+        first = await strategy._latest("ticker", lambda: fetch("ETHUSDT"))
+        await asyncio.sleep(0.05)
+        count = exchange.request_count
+        second = await strategy._latest("ticker", lambda: fetch("ETHUSDT"))
+        hub_count = exchange.request_count - count
+        strategy.close()
+        await hub.close()
+        return first, second, hub_count
+
+    first, second, hub_count = asyncio.run(run())
+    assert first > 0 and second > 0
+    assert hub_count == 0
+    assert hub.keys == []
+
+
+def test_upstream_per_market():
+    hub = MarketDataHub(metrics=None)
+    hub.configure({"pollInterval": 0.01})
+    live = FakeExchange(seed=1)
+    test_net = FakeExchange(seed=2)
+    test_net.use_test_net()
+
+    async def run():
+        subscriptions = [
+            hub.subscribe(exchange, "ETHUSDT", "ticker")
+            for exchange in (live, test_net, FakeExchange(seed=3))
+        ]
+        await asyncio.gather(*(s.get() for s in subscriptions))
+        keys = hub.keys
+        await hub.close()
+        return keys
+
+    assert sorted(asyncio.run(run())) == [
+        (("fake", False), "ETHUSDT", "ticker"),
+        (("fake", True), "ETHUSDT", "ticker"),
+    ]
+    assert hub.poll_interval == 0.01 and hub.max_age == 5.0
+
+    futures = Binance()
+    futures.set_market_type("linear_perpetual")
+    spot = Binance()
+    spot.set_market_type("spots")
+    assert futures.market_key() == ("binance", False, "future")
+    assert spot.market_key() == ("binance", False, "spot")
+    native = BinanceNative()
+    assert native.market_key() == ("binance", "https://fapi.binance.com")
+    native.use_test_net()
+    assert native.market_key() == ("binance", "https://testnet.binancefuture.com")
+
+
+def test_upstream_moves_to_a_remaining_subscriber():
+    hub = MarketDataHub(poll_interval=0.01, metrics=None)
+    first = FakeExchange(seed=1)
+    second = FakeExchange(seed=2)
+
+    async def run():
+        leaving = hub.subscribe(first, "ETHUSDT", "ticker")
+        staying = hub.subscribe(second, "ETHUSDT", "ticker")
+        await staying.get()
+        assert second.request_count == 0
+        leaving.close()
+
+        async def closed(pair):
+            raise RuntimeError("Session is closed")
+
+        # The robot leaving closes its exchange
+        first.fetch_last_price = closed
+        received = staying.received
+        for _ in range(3):
+            await asyncio.wait_for(staying.get(), 1)
+        await hub.close()
+        return staying.received - received
+
+    assert asyncio.run(run()) >= 3
+    assert second.request_count >= 3
@@ -0,0 +1,180 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bot.exchanges.fake import FakeExchange
+from bot.indicators import (
+    Indicator,
+    IndicatorService,
+    _cal_indicator,
+    indicator_spec,
+    register_indicator,
+    trend_indicator,
+    trend_series,
+)
+from bot.strategy import Strategy
+
+
+def make_strategy(service, exchange):
+    strategy = Strategy.new()
+    strategy._exchange = exchange
+    strategy._indicator_service = service
+    return strategy
+
+
+def test_indicator_spec():
+    assert indicator_spec("ema", span=7) == indicator_spec("ema", span=7)
+    assert indicator_spec("ema", span=7) != indicator_spec("ema", span=14)
+    with pytest.raises(ValueError):
+        indicator_spec("unknown")
+
+
+def test_shared_computation():
+    service = IndicatorService(ttl=60)
+    strategies = [
+        make_strategy(service, FakeExchange(latency=0.01, seed=i)) for i in range(5)
+    ]
+
+    async def run():
+        return await asyncio.gather(*(s._indicator(period="5m") for s in strategies))
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, Indicator) for r in results)
+    assert len(set(results)) == 1
+    assert service.fetch_count == 1
+    assert service.compute_count == 1
+    assert sum(s._exchange.request_count for s in strategies) == 1
+
+    # Another spec on the same candles reuses the fetch
+    ema_key = service.subscribe(
+        strategies[0]._exchange, "ETHUSDT", "5m", indicator_spec("ema", span=7)
+    )
+    asyncio.run(service.get(strategies[0]._exchange, ema_key))
+    assert service.fetch_count == 1
+    assert service.compute_count == 2
+
+
+def test_computation_per_market():
+    service = IndicatorService(ttl=60)
+    test_net = FakeExchange(seed=2)
+    test_net.use_test_net()
+    strategies = [
+        make_strategy(service, exchange) for exchange in (FakeExchange(), test_net)
+    ]
+
+    async def run():
+        return await asyncio.gather(*(s._indicator(period="5m") for s in strategies))
+
+    asyncio.run(run())
+    assert service.fetch_count == 2
+    assert sorted(k[0] for k in service.keys) == [("fake", False), ("fake", True)]
+
+
+def test_reference_counting_and_eviction():
+    service = IndicatorService(ttl=60)
+    a = make_strategy(service, FakeExchange())
+    b = make_strategy(service, FakeExchange())
+    asyncio.run(a._indicator(period="5m"))
+    asyncio.run(b._indicator(period="5m"))
+    assert len(service.keys) == 1
+
+    # Switching period moves the subscription
+    asyncio.run(b._indicator(period="15m"))
+    assert len(service.keys) == 2
+
+    a.close()
+    assert [k[2] for k in service.keys] == ["15m"]
+    b.close()
+    assert service.keys == []
+    assert service._candles == {}
+
+
+def test_failed_computation_is_not_cached():
+    service = IndicatorService(ttl=60)
+    exchange = FakeExchange()
+    key = service.subscribe(exchange, "ETHUSDT", "5m", indicator_spec("trend"))
+
+    async def fail(pair, period):
+        raise RuntimeError("boom")
+
+    fetch_candles = exchange.fetch_candles
+    exchange.fetch_candles = fail
+    with pytest.raises(RuntimeError):
+        asyncio.run(service.get(exchange, key))
+
+    exchange.fetch_candles = fetch_candles
+    assert isinstance(asyncio.run(service.get(exchange, key)), Indicator)
+
+
+@register_indicator("slow")
+def slow_indicator(candles, cost):
+    time.sleep(cost)
+    return threading.current_thread().name
+
+
+def test_costly_indicators_are_offloaded():
+    service = IndicatorService(ttl=0, offload_threshold=0.01)
+    service.configure({"executor": "thread", "workers": 1})
+    exchange = FakeExchange()
+    cheap = service.subscribe(exchange, "ETHUSDT", "5m", indicator_spec("trend"))
+    slow = service.subscribe(
+        exchange, "ETHUSDT", "5m", indicator_spec("slow", cost=0.05)
+    )
+
+    async def run():
+        # Cost unknown on the first computation, which runs on the loop
+        first = await service.get(exchange, slow)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        second = await service.get(exchange, slow)
+        ticker.cancel()
+        indicator = await service.get(exchange, cheap)
+        return first, second, ticks, indicator
+
+    try:
+        first, second, ticks, indicator = asyncio.run(run())
+    finally:
+        service.shutdown()
+    assert first == "MainThread"
+    assert second.startswith("indicators")
+    # The loop kept running during the offloaded computation
+    assert ticks >= 3
+    assert isinstance(indicator, Indicator)
+    assert service.offload_count == 1
+    assert service.compute_count == 3
+
+
+def test_process_pool_executor():
+    service = IndicatorService(offload_threshold=0)
+    service.configure({"executor": "process", "workers": 1})
+    candles = asyncio.run(FakeExchange().fetch_candles("ETHUSDT", "5m"))
+    try:
+        result = asyncio.run(service.compute(indicator_spec("trend"), candles))
+    finally:
+        service.shutdown()
+    assert result == trend_indicator(candles)
+    assert service.offload_count == 1
+
+    with pytest.raises(ValueError):
+        service.configure({"executor": "gpu"})
+
+
+def test_trend_series_matches_the_indicator():
+    rng = np.random.default_rng(1)
+    close = 350 * np.exp(np.cumsum(rng.normal(0, 0.002, 300)))
+    sides, rws = trend_series(close)
+    assert set(sides[1:]) == {-1, 0, 1}
+    for i in range(1, len(close)):
+        indicator = _cal_indicator(pd.Series(close[: i + 1]))
+        assert (sides[i], rws[i]) == (indicator.side, pytest.approx(indicator.rw))
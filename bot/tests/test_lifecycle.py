@@ -0,0 +1,126 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+from bot.exceptions import ImproperConfig
+from bot.lifecycle import (
+    cancel_tasks,
+    drain_queue,
+    install_signal_handlers,
+    run_bounded,
+    use_event_loop,
+)
+
+
+def test_drain_queue_sends_pending_items():
+    sent = []
+
+    async def send(item):
+        sent.append(item)
+
+    async def run():
+        queue = asyncio.Queue()
+        for i in range(5):
+            queue.put_nowait(i)
+        return await drain_queue(queue, send, timeout=1)
+
+    assert asyncio.run(run()) == 0
+    assert sent == [0, 1, 2, 3, 4]
+
+
+def test_drain_queue_is_bounded_in_time():
+    async def send(item):
+        if item == 2:
+            raise ConnectionError()
+        await asyncio.sleep(0.04)
+
+    async def run():
+        queue = asyncio.Queue()
+        for i in range(100):
+            queue.put_nowait(i)
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        dropped = await drain_queue(queue, send, timeout=0.2)
+        return dropped, loop.time() - started
+
+    dropped, elapsed = asyncio.run(run())
+    assert 90 <= dropped < 100
+    assert elapsed < 0.5
+
+
+def test_cancel_tasks_and_run_bounded():
+    steps = []
+
+    async def forever():
+        await asyncio.sleep(3600)
+
+    async def stuck():
+        steps.append("stuck")
+        await asyncio.sleep(3600)
+
+    async def failing():
+        steps.append("failing")
+        raise RuntimeError()
+
+    async def closing():
+        steps.append("closing")
+
+    async def run():
+        tasks = [asyncio.ensure_future(forever()) for _ in range(3)]
+        await cancel_tasks(tasks, timeout=1)
+        assert all(t.cancelled() for t in tasks)
+        await run_bounded(
+            [("stuck", stuck), ("failing", failing), ("closing", closing)], 0.05
+        )
+
+    asyncio.run(run())
+    assert steps == ["stuck", "failing", "closing"]
+
+
+def test_signal_handler_requests_stop():
+    received = []
+
+    async def run():
+        stopping = asyncio.Event()
+
+        def request_stop(signum):
+            received.append(signum)
+            stopping.set()
+
+        loop = asyncio.get_event_loop()
+        install_signal_handlers(loop, request_stop)
+        try:
+            os.kill(os.getpid(), signal.SIGTERM)
+            await asyncio.wait_for(stopping.wait(), 1)
+        finally:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(signum)
+
+    asyncio.run(run())
+    assert received == [signal.SIGTERM]
+
+
+def test_use_event_loop():
+    try:
+        assert use_event_loop("asyncio") == "asyncio"
+        loop = asyncio.new_event_loop()
+        assert type(loop).__module__.startswith("asyncio")
+        loop.close()
+        with pytest.raises(ImproperConfig):
+            use_event_loop("trio")
+
+        try:
+            import uvloop
+        except ImportError:
+            assert use_event_loop("auto") == "asyncio"
+            with pytest.raises(ImproperConfig):
+                use_event_loop("uvloop")
+        else:
+            assert use_event_loop("auto") == "uvloop"
+            loop = asyncio.new_event_loop()
+            assert isinstance(loop, uvloop.Loop)
+            loop.close()
+    finally:
+        use_event_loop("asyncio")
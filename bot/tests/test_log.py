@@ -0,0 +1,69 @@
+import json
+import logging
+import queue
+
+from bot.log import (
+    JsonFormatter,
+    LogQueueHandler,
+    RoutingQueueListener,
+    build_logging_config,
+)
+
+
+class ListHandler(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_build_logging_config():
+    config = build_logging_config(
+        {"json": True, "levels": {"bot": "INFO", "bot.exchanges": "WARNING"}}
+    )
+    assert config["handlers"]["console"]["formatter"] == "json"
+    assert config["handlers"]["file"]["formatter"] == "json"
+    assert config["loggers"]["bot"]["level"] == "INFO"
+    assert config["loggers"]["bot"]["handlers"] == ["console", "file"]
+    assert config["loggers"]["bot.exchanges"] == {"level": "WARNING"}
+
+
+def test_routing_queue_listener():
+    bot_handler = ListHandler()
+    sdk_handler = ListHandler(level=logging.WARNING)
+    log_queue = queue.SimpleQueue()
+    listener = RoutingQueueListener(
+        log_queue, {"bench": [bot_handler], "benchsdk": [sdk_handler]}
+    )
+    listener.start()
+
+    handler = LogQueueHandler(log_queue)
+    for name in ("bench.strategy", "benchsdk.clients"):
+        logger = logging.getLogger(name)
+        logger.propagate = False
+        logger.setLevel(logging.DEBUG)
+        logger.addHandler(handler)
+
+    args = {"side": 1}
+    logging.getLogger("bench.strategy").info("Indicator %s", args)
+    args["side"] = -1
+    logging.getLogger("benchsdk.clients").info("dropped by handler level")
+    logging.getLogger("benchsdk.clients").warning("kept")
+    listener.stop()
+
+    assert [r.getMessage() for r in bot_handler.records] == ["Indicator {'side': 1}"]
+    assert [r.getMessage() for r in sdk_handler.records] == ["kept"]
+
+
+def test_json_formatter():
+    record = logging.LogRecord(
+        "bot.strategy", logging.INFO, __file__, 1, "rw: %.2f", (0.123,), None
+    )
+    record.robot = 3
+    data = json.loads(JsonFormatter().format(record))
+    assert data["level"] == "INFO"
+    assert data["logger"] == "bot.strategy"
+    assert data["message"] == "rw: 0.12"
+    assert data["robot"] == 3
@@ -0,0 +1,113 @@
+import random
+
+import pytest
+
+from bot.enums import OrderType
+from bot.exchanges.matching import OrderBook
+from bot.records import Order
+
+
+def order(client_order_id, side, price, order_type=OrderType.limit):
+    return Order(
+        "ETHUSDT", order_type, side, 1.0, price, client_order_id=client_order_id
+    )
+
+
+def test_match_priority_and_prices():
+    book = OrderBook(0.01)
+    book.add(order("b1", 1, 349.0))
+    book.add(order("b2", 1, 349.5))
+    book.add(order("b3", 1, 349.5))
+    book.add(order("s1", -1, 351.0))
+    book.add(order("sl", -1, 348.0, OrderType.trigger))
+    book.add(order("bs", 1, 352.0, OrderType.trigger))
+    assert len(book) == 6
+    with pytest.raises(ValueError):
+        book.add(order("b1", 1, 300.0))
+
+    assert list(book.match(350.0, 350.01)) == []
+    fills = list(book.match(349.2, 349.21))
+    # Best level first, time priority within a level, at the limit price
+    assert [(f.order.client_order_id, f.price, f.maker) for f in fills] == [
+        ("b2", 349.5, True),
+        ("b3", 349.5, True),
+    ]
+    # Stops fill at the quote
+    fills = list(book.match(347.5, 347.51))
+    assert [(f.order.client_order_id, f.price) for f in fills] == [
+        ("b1", 349.0),
+        ("sl", 347.5),
+    ]
+    assert [f.maker for f in fills] == [True, False]
+
+    assert book.cancel("s1").client_order_id == "s1"
+    assert book.cancel("s1") is None
+    assert [f.order.client_order_id for f in book.match(360.0, 360.01)] == ["bs"]
+    assert len(book) == 0
+
+
+def test_sweep_candle_gaps_and_path():
+    book = OrderBook(0.01)
+    book.add(order("buy", 1, 349.0))
+    book.add(order("stop", -1, 345.0, OrderType.trigger))
+    book.add(order("tp", -1, 352.0))
+    # Gaps down through the buy at the open, fills at the open
+    fills = list(book.sweep_candle(348.0, 353.0, 347.0, 352.5))
+    assert [(f.order.client_order_id, f.price) for f in fills] == [
+        ("buy", 348.0),
+        ("tp", 352.0),
+    ]
+    # The stop fills at its price inside the candle
+    fills = list(book.sweep_candle(346.0, 346.5, 340.0, 341.0))
+    assert [(f.order.client_order_id, f.price) for f in fills] == [("stop", 345.0)]
+
+
+def test_amend_and_cancel_while_matching():
+    book = OrderBook(0.01)
+    tp = order("tp", -1, 352.0)
+    book.add(tp)
+    book.add(order("sl", -1, 345.0, OrderType.trigger))
+    tp.price = 351.0
+    book.amend(tp)
+    assert list(book.match(351.5, 351.6))[0].price == 351.0
+
+    book.add(order("a", 1, 349.0))
+    book.add(order("b", 1, 348.0))
+    for fill in book.sweep_candle(350.0, 350.0, 340.0, 340.0):
+        # A fill cancelling the other orders, as a flat position would
+        assert fill.order.client_order_id == "a"
+        book.cancel("b")
+        book.cancel("sl")
+    assert len(book) == 0
+
+
+def test_matches_brute_force():
+    rng = random.Random(7)
+    book = OrderBook(0.01)
+    resting = {}
+    for i in range(2000):
+        side = rng.choice((1, -1))
+        order_type = rng.choice((OrderType.limit, OrderType.trigger))
+        o = order(str(i), side, round(rng.uniform(340, 360), 2), order_type)
+        book.add(o)
+        resting[o.client_order_id] = o
+        if rng.random() < 0.3:
+            cancelled = rng.choice(list(resting))
+            book.cancel(cancelled)
+            del resting[cancelled]
+        if i % 50 == 0:
+            price = round(rng.uniform(340, 360), 2)
+            expected = {
+                k
+                for k, o in resting.items()
+                if (o.order_type == OrderType.limit and (o.price - price) * o.side >= 0)
+                or (
+                    o.order_type == OrderType.trigger
+                    and (price - o.price) * o.side >= 0
+                )
+            }
+            filled = {f.order.client_order_id for f in book.match(price, price)}
+            assert filled == expected
+            for k in filled:
+                del resting[k]
+    assert {o.client_order_id for o in book.orders()} == set(resting)
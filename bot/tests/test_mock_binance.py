@@ -0,0 +1,198 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import pytest
+
+from bot.exchanges.binance_native import BinanceAPIError, BinanceFuturesClient
+from bot.exchanges.mock_binance import MockBinanceFutures
+
+
+def run_against(server, test, api_key="key", secret="secret"):
+    client = BinanceFuturesClient(api_key=api_key, secret=secret)
+
+    async def run():
+        client.base_url = await server.start()
+        try:
+            return await test(client)
+        finally:
+            await client.close()
+            await server.stop()
+
+    return asyncio.run(run())
+
+
+def order_params(side, order_type="LIMIT", qty="0.1", **params):
+    return dict(symbol="ETHUSDT", side=side, type=order_type, quantity=qty, **params)
+
+
+def test_order_placement_and_cancellation():
+    server = MockBinanceFutures(seed=1)
+
+    async def test(client):
+        order = await client.request(
+            "POST",
+            "/fapi/v1/order",
+            order_params("BUY", price="340.00", newClientOrderId="nb-fib1-1"),
+            signed=True,
+        )
+        assert order["status"] == "NEW"
+        with pytest.raises(BinanceAPIError) as info:
+            await client.request(
+                "POST",
+                "/fapi/v1/order",
+                order_params("BUY", price="339.00", newClientOrderId="nb-fib1-1"),
+                signed=True,
+            )
+        assert info.value.code == -4116
+
+        amended = await client.request(
+            "PUT",
+            "/fapi/v1/order",
+            order_params("BUY", price="341.00", orderId=order["orderId"]),
+            signed=True,
+        )
+        assert amended["price"] == "341.00"
+        orders = await client.request(
+            "GET", "/fapi/v1/openOrders", {"symbol": "ETHUSDT"}, signed=True
+        )
+        assert [o["clientOrderId"] for o in orders] == ["nb-fib1-1"]
+
+        params = {"symbol": "ETHUSDT", "origClientOrderId": "nb-fib1-1"}
+        canceled = await client.request("DELETE", "/fapi/v1/order", params, signed=True)
+        assert canceled["status"] == "CANCELED"
+        with pytest.raises(BinanceAPIError) as info:
+            await client.request("DELETE", "/fapi/v1/order", params, signed=True)
+        assert info.value.code == -2011
+        # Still known to order queries
+        queried = await client.request("GET", "/fapi/v1/order", params, signed=True)
+        assert queried["status"] == "CANCELED"
+        return await client.request(
+            "GET", "/fapi/v1/openOrders", {"symbol": "ETHUSDT"}, signed=True
+        )
+
+    assert run_against(server, test) == []
+
+
+def test_fills_and_trigger_orders():
+    server = MockBinanceFutures(seed=1, balance=1000)
+
+    async def test(client):
+        async def place(**params):
+            return await client.request("POST", "/fapi/v1/order", params, signed=True)
+
+        async def position():
+            positions = await client.request(
+                "GET", "/fapi/v2/positionRisk", {"symbol": "ETHUSDT"}, signed=True
+            )
+            return float(positions[0]["positionAmt"])
+
+        await place(**order_params("BUY", "MARKET", qty="1"))
+        assert await position() == 1
+        take_profit = await place(
+            **order_params("SELL", price="360.00", qty="1", reduceOnly="true")
+        )
+        stop_loss = await place(
+            **order_params("SELL", "STOP_MARKET", qty="1", stopPrice="340.00")
+        )
+        with pytest.raises(BinanceAPIError) as info:
+            await client.request(
+                "PUT",
+                "/fapi/v1/order",
+                order_params(
+                    "SELL", qty="1", price="339.00", orderId=stop_loss["orderId"]
+                ),
+                signed=True,
+            )
+        assert info.value.code == -4028
+
+        # Between both: nothing triggered
+        server.set_price("ETHUSDT", 345.0)
+        assert await position() == 1
+        server.set_price("ETHUSDT", 339.5)
+        assert await position() == 0
+        params = {"symbol": "ETHUSDT", "orderId": stop_loss["orderId"]}
+        filled = await client.request("GET", "/fapi/v1/order", params, signed=True)
+        # Triggered at the market price
+        assert (filled["status"], filled["avgPrice"]) == ("FILLED", "339.50000")
+
+        # Reduce only: nothing left to reduce
+        server.set_price("ETHUSDT", 361.0)
+        params["orderId"] = take_profit["orderId"]
+        filled = await client.request("GET", "/fapi/v1/order", params, signed=True)
+        assert (filled["status"], filled["executedQty"]) == ("FILLED", "0.000")
+        assert await position() == 0
+        balance = await client.request("GET", "/fapi/v2/balance", signed=True)
+        return float(balance[0]["balance"])
+
+    assert run_against(server, test) == pytest.approx(1000 - 350 + 339.5)
+
+
+def test_api_key_and_signature_checks():
+    async def test(client):
+        assert await client.request(
+            "GET", "/fapi/v1/ticker/price", {"symbol": "ETHUSDT"}
+        )
+        codes = []
+        for api_key, secret in (("", "secret"), ("key", "wrong"), ("key", "secret")):
+            client.api_key, client.secret = api_key, secret
+            try:
+                await client.request(
+                    "POST",
+                    "/fapi/v1/order",
+                    order_params("BUY", price="340.00"),
+                    signed=True,
+                )
+            except BinanceAPIError as exc:
+                codes.append((exc.status, exc.code))
+            else:
+                codes.append(None)
+        return codes
+
+    server = MockBinanceFutures(seed=1, secret="secret")
+    assert run_against(server, test) == [(401, -2014), (401, -1022), None]
+    # Without a secret, any signature goes
+    server = MockBinanceFutures(seed=1)
+    assert run_against(server, test) == [(401, -2014), None, None]
+
+
+KLINES = """
+import asyncio
+from unittest import mock
+
+from bot.exchanges.binance_native import BinanceFuturesClient
+from bot.exchanges.mock_binance import MockBinanceFutures
+
+
+async def run():
+    server = MockBinanceFutures(seed=1)
+    client = BinanceFuturesClient(api_key="key", secret="secret")
+    client.base_url = await server.start()
+    try:
+        params = {"symbol": "ETHUSDT", "interval": "1m", "limit": 5}
+        with mock.patch("time.time", return_value=1600000000):
+            print(await client.request("GET", "/fapi/v1/klines", params))
+    finally:
+        await client.close()
+        await server.stop()
+
+
+asyncio.run(run())
+"""
+
+
+def test_klines_are_the_same_in_every_process():
+    def klines(hash_seed):
+        env = dict(os.environ, PYTHONHASHSEED=hash_seed)
+        return subprocess.run(
+            [sys.executable, "-c", KLINES],
+            env=env,
+            # The repository root, for the bot package
+            cwd=os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+
+    assert klines("1") == klines("2")
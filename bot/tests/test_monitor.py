@@ -0,0 +1,26 @@
+import asyncio
+import time
+
+from bot.metrics import Metrics
+from bot.monitor import LoopLagMonitor
+
+
+def test_loop_lag_monitor_detects_blocking_call(caplog):
+    metrics = Metrics()
+    monitor = LoopLagMonitor(interval=0.01, threshold=0.05, metrics=metrics)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        time.sleep(0.2)  # blocks the loop
+        await asyncio.sleep(0.05)
+        snapshot = metrics.snapshot()
+        await monitor.stop()
+        return snapshot
+
+    snapshot = asyncio.run(run())
+    assert monitor.blocked_count == 1
+    assert "time.sleep(0.2)" in caplog.text
+    assert snapshot["loop_lag_max_ms"] >= 150
+    assert snapshot["loop_lag_blocked_count"] == 1
+    assert "loop_lag_p50_ms" not in metrics.snapshot()
@@ -0,0 +1,350 @@
+import asyncio
+
+from bot.enums import OrderType
+from bot.exchanges.binance import Binance
+from bot.exchanges.fake import FakeExchange
+from bot.metrics import Metrics
+from bot.orders import OrderTracker
+from bot.indicators import Indicator
+from bot.records import Order, OrderUpdate
+from bot.strategy import Strategy
+
+POSITION = {"qty": 1.5, "side": 1, "liq_price": 300.0, "avg_price": 359.1}
+
+
+def test_client_order_id_roles():
+    tracker = OrderTracker(prefix="nb3")
+    a = tracker.client_order_id("tp")
+    b = tracker.client_order_id("tp")
+    assert a != b
+    assert a.startswith("nb3-tp-") and len(a) <= 36
+    order = Order("ETHUSDT", OrderType.limit, 1, 1.0, client_order_id=a)
+    assert tracker.role(order) == "tp"
+    assert tracker.role(Order("ETHUSDT", OrderType.limit, 1, 1.0)) is None
+    foreign = Order("ETHUSDT", OrderType.limit, 1, 1.0, client_order_id="nb4-tp-1")
+    assert tracker.role(foreign) is None
+
+
+def test_tracker_book_updates():
+    tracker = OrderTracker(snapshot_interval=60)
+    assert tracker.needs_snapshot()
+    tracker.apply_snapshot([])
+    assert not tracker.needs_snapshot()
+
+    order = Order(
+        "ETHUSDT",
+        OrderType.limit,
+        1,
+        1.0,
+        100.0,
+        order_id="1",
+        client_order_id=tracker.client_order_id("fib1"),
+    )
+    tracker.on_placed(order)
+    assert tracker.by_role("fib1") is order
+
+    tracker.on_update(OrderUpdate("PARTIALLY_FILLED", order))
+    assert tracker.open_orders == [order]
+    tracker.on_update(OrderUpdate("FILLED", order))
+    assert tracker.open_orders == []
+
+    tracker.invalidate()
+    assert tracker.needs_snapshot()
+
+
+def test_parse_binance_order_update():
+    message = {
+        "e": "ORDER_TRADE_UPDATE",
+        "E": 1568879465651,
+        "T": 1568879465650,
+        "o": {
+            "s": "ETHUSDT",
+            "c": "nb3-sl-1700000000000",
+            "S": "SELL",
+            "o": "STOP_MARKET",
+            "f": "GTC",
+            "q": "0.500",
+            "p": "0",
+            "ap": "0",
+            "sp": "340.10",
+            "x": "NEW",
+            "X": "NEW",
+            "i": 8886774,
+            "T": 1568879465651,
+        },
+    }
+    update = Binance().parse_stream_message("orders", message)
+    assert update.status == "NEW"
+    assert update.order == Order("ETHUSDT", OrderType.trigger, -1, 0.5, 340.1)
+    assert update.order.client_order_id == "nb3-sl-1700000000000"
+
+
+def make_trading_strategy():
+    exchange = FakeExchange(seed=1)
+    exchange.set_position(POSITION)
+    strategy = Strategy.new(position=POSITION)
+    strategy._exchange = exchange
+    strategy._balance = 10000
+    strategy.sync_store(last_price=350)
+    return exchange, strategy
+
+
+def test_ensure_order_reconciles_from_memory():
+    exchange, strategy = make_trading_strategy()
+
+    async def run():
+        await strategy._sync_position()
+        await strategy.ensure_order()  # snapshot, then place TP/SL
+        count = exchange.request_count
+        await strategy._sync_position()
+        await strategy.ensure_order()
+        assert exchange.request_count - count == 1  # position only
+
+        # A fill changes the position, the book is refreshed
+        exchange.set_position({"qty": 2.0, "avg_price": 355.0})
+        count = exchange.request_count
+        await strategy._sync_position()
+        await strategy.ensure_order()
+        # position, snapshot, amend TP, place the new SL, cancel the old one
+        assert exchange.request_count - count == 5
+
+    asyncio.run(run())
+    assert strategy.orders.snapshot_count == 2
+    roles = sorted(strategy.orders.role(o) for o in exchange._orders)
+    assert roles == ["sl", "tp"]
+    assert [o.qty for o in exchange._orders] == [2.0, 2.0]
+
+
+def test_replace_orders_keeps_matching_orders():
+    exchange, strategy = make_trading_strategy()
+
+    async def run():
+        await strategy._sync_position()
+        orders = strategy.prepare_add_pos_orders(side=1, base_price=350)
+        await strategy._replace_orders(orders)
+        placed = {o.client_order_id for o in exchange._orders}
+
+        # Same TP/SL, entry orders moved with the price
+        count = exchange.request_count
+        orders = strategy.prepare_add_pos_orders(side=1, base_price=349)
+        await strategy._replace_orders(orders)
+        return placed, exchange.request_count - count
+
+    placed, requests = asyncio.run(run())
+    tracker = strategy.orders
+    current = {o.client_order_id: tracker.role(o) for o in exchange._orders}
+    assert sorted(current.values()) == ["fib1", "fib2", "fib3", "sl", "tp"]
+    assert placed == set(current)
+    # Entry orders amended in place, TP/SL untouched
+    assert requests == 3
+
+
+def test_ensure_order_amends_tp_and_replaces_sl():
+    exchange, strategy = make_trading_strategy()
+    metrics = strategy._metrics = Metrics()
+
+    async def run():
+        await strategy._sync_position()
+        await strategy.ensure_order()
+        assert metrics.snapshot()["sl_unprotected_count"] == 1
+        tp = strategy.orders.by_role("tp").client_order_id
+        sl = strategy.orders.by_role("sl").client_order_id
+
+        exchange.set_position({"avg_price": 355.0})
+        await strategy._sync_position()
+        requests = metrics.snapshot()["order_requests"]
+        await strategy.ensure_order()
+        return tp, sl, metrics.snapshot()["order_requests"] - requests
+
+    tp, sl, requests = asyncio.run(run())
+    # Modify TP, place new SL then cancel the old one
+    assert requests == 3
+    by_role = {strategy.orders.role(o): o for o in exchange._orders}
+    assert by_role["tp"].client_order_id == tp
+    assert by_role["tp"].price == 355.5
+    assert by_role["sl"].client_order_id != sl
+    assert by_role["sl"].price == 345.0
+    # The position never went without a stop loss
+    assert metrics.snapshot()["sl_unprotected_count"] == 1
+
+
+def test_missing_sl_reports_unprotected_window():
+    exchange, strategy = make_trading_strategy()
+    metrics = strategy._metrics = Metrics()
+
+    async def run():
+        await strategy._sync_position()
+        await strategy._place_orders(
+            [strategy.get_take_profit_order(), strategy.get_stop_loss_order()]
+        )
+        # The stop loss is gone, ensure_order places it again
+        await strategy._cancel_orders([strategy.orders.by_role("sl")])
+        await strategy.ensure_order()
+
+    asyncio.run(run())
+    snapshot = metrics.snapshot()
+    assert snapshot["sl_unprotected_count"] == 2
+    assert snapshot["sl_unprotected_last_ms"] > 0
+    assert snapshot["sl_unprotected_max_ms"] >= snapshot["sl_unprotected_last_ms"]
+
+
+class Recording(FakeExchange):
+    """
+    Records the order requests as ``(method, role)``.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = []
+        self.tracker = OrderTracker(prefix="nb")
+
+    def _role(self, client_order_id):
+        return self.tracker.role(
+            Order("", OrderType.limit, 1, 0, client_order_id=client_order_id)
+        )
+
+    async def place_order(self, **kwargs):
+        self.calls.append(("place", self._role(kwargs.get("client_order_id"))))
+        return await super().place_order(**kwargs)
+
+    async def cancel_order(self, pair, client_order_id):
+        self.calls.append(("cancel", self._role(client_order_id)))
+        return await super().cancel_order(pair, client_order_id)
+
+    async def cancel_current_orders(self, pair):
+        self.calls.append(("cancel_all", None))
+        return await super().cancel_current_orders(pair)
+
+    async def modify_order(self, order, new):
+        self.calls.append(("modify", self._role(order.client_order_id)))
+        return await super().modify_order(order, new)
+
+
+def test_trade_cycles_keep_tp_sl_with_resting_fib_orders():
+    position = {"qty": 0.1, "side": 1, "liq_price": 300.0, "avg_price": 350.0}
+    exchange = Recording(seed=1)
+    exchange.set_position(position)
+    strategy = Strategy.new(position=position)
+    strategy._exchange = exchange
+    strategy.set_trading_context({"client_order_prefix": "nb"})
+    strategy.parameters = {"allowLong": True, "allowShort": True, "restInterval": 0}
+
+    async def indicator(period):
+        return Indicator(side=1, rw=0.01)
+
+    strategy._indicator = indicator
+
+    async def run():
+        for _ in range(4):
+            await strategy.trade_once()
+
+    asyncio.run(run())
+    roles = sorted(strategy.orders.role(o) for o in exchange._orders)
+    assert roles == ["fib1", "fib2", "fib3", "sl", "tp"]
+    assert ("cancel_all", None) not in exchange.calls
+    # TP and SL placed once, fib orders then only follow the price
+    assert exchange.calls.count(("place", "sl")) == 1
+    assert exchange.calls.count(("place", "tp")) == 1
+    assert ("cancel", "sl") not in exchange.calls
+    assert {call for call in exchange.calls[5:]} <= {
+        ("modify", "fib1"),
+        ("modify", "fib2"),
+        ("modify", "fib3"),
+    }
+
+
+def test_stop_loss_cancelled_by_the_exchange_is_placed_again():
+    exchange, strategy = make_trading_strategy()
+    strategy.parameters = {"allowLong": False, "allowShort": False, "restInterval": 0}
+
+    async def indicator(period):
+        return Indicator(side=1, rw=0.01)
+
+    strategy._indicator = indicator
+
+    async def run():
+        await strategy.trade_once()
+        stop_loss = strategy.orders.by_role("sl")
+        # Cancelled on the exchange, the position is unchanged
+        await FakeExchange.cancel_order(
+            exchange, strategy.pair, stop_loss.client_order_id
+        )
+        await strategy.trade_once()
+        return stop_loss
+
+    stop_loss = asyncio.run(run())
+    current = strategy.orders.by_role("sl")
+    assert current is not None and current.client_order_id != stop_loss.client_order_id
+    assert current in exchange._orders
+
+    # Once the exchange pushes order updates, the book is trusted
+    count = strategy.orders.snapshot_count
+    strategy.on_order_update(OrderUpdate(status="NEW", order=current))
+    asyncio.run(strategy.trade_once())
+    assert strategy.orders.snapshot_count == count
+
+
+def test_ensure_order_cancels_foreign_and_misplaced_orders():
+    exchange, strategy = make_trading_strategy()
+
+    async def run():
+        await strategy._sync_position()
+        # Not ours, and a fib order against the long position
+        await exchange.place_order(
+            pair="ETHUSDT", order_type=OrderType.limit, side=1, qty=1, price=340
+        )
+        await strategy._place_orders(
+            [strategy.get_fib_order(n=1, base_price=350, offset_factor=1, side=-1)]
+        )
+        strategy.orders.invalidate()
+        await strategy.ensure_order()
+
+    asyncio.run(run())
+    roles = sorted(strategy.orders.role(o) for o in exchange._orders)
+    assert roles == ["sl", "tp"]
+
+
+def test_ensure_order_amends_tp_by_role():
+    exchange, strategy = make_trading_strategy()
+
+    async def run():
+        await strategy._sync_position()
+        fib = strategy.get_fib_order(n=1, base_price=350, offset_factor=1, side=1)
+        await strategy._place_orders([fib])
+        await strategy.ensure_order()
+        exchange.set_position({"avg_price": 355.0})
+        await strategy._sync_position()
+        await strategy.ensure_order()
+        return fib
+
+    fib = asyncio.run(run())
+    by_role = {strategy.orders.role(o): o for o in exchange._orders}
+    assert sorted(by_role) == ["fib1", "sl", "tp"]
+    assert (by_role["fib1"].side, by_role["fib1"].price) == (1, fib.price)
+    assert (by_role["tp"].side, by_role["tp"].price) == (-1, 355.5)
+
+
+def test_modify_order_to_another_side_places_a_new_order():
+    exchange = FakeExchange()
+
+    async def run():
+        entry = await exchange.place_order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            side=1,
+            qty=1,
+            price=349.0,
+            client_order_id="nb-entry1-1",
+        )
+        target = Order(
+            "ETHUSDT", OrderType.limit, -1, 1, 351.0, client_order_id="nb-tp-2"
+        )
+        return await exchange.modify_order(entry, target)
+
+    amended = asyncio.run(run())
+    assert exchange._orders == [amended]
+    assert (amended.side, amended.price, amended.client_order_id) == (
+        -1,
+        351.0,
+        "nb-tp-2",
+    )
@@ -0,0 +1,277 @@
+import asyncio
+
+import pytest
+
+from bot.enums import OrderType
+from bot.exceptions import ExchangeException, OrderNotFound
+from bot.exchanges.binance import Binance
+from bot.exchanges.fake import FakeExchange
+from bot.exchanges.paper import PaperExchange, PaperMarket
+from bot.metrics import Metrics
+from bot.records import Candles, Order, OrderBookTicker
+from bot.strategy import Strategy
+
+PARAMETERS = {
+    "openPosPercent": 0.01,
+    "longAdditionDistance": 0.05,
+    "shortAdditionDistance": 0.05,
+    "maxLeverage": 3,
+    "longTakeProfitDistance": 0.5,
+    "shortTakeProfitDistance": 0.5,
+    "longStopLossDistance": 1,
+    "shortStopLossDistance": 1,
+    "maxRw": 100,
+    "maxOpenPosCount": 10,
+    "trendFollowing": True,
+    "allowLong": True,
+    "allowShort": True,
+    "candlePeriod": "5m",
+    "restInterval": 0,
+}
+
+
+class Quotes(FakeExchange):
+    """
+    Market data source with a quote set by the test.
+    """
+
+    def __init__(self, bid0=350.0):
+        super().__init__()
+        self.set_bid(bid0)
+
+    def set_bid(self, bid0):
+        self.quote = OrderBookTicker(ask0=round(bid0 + 0.01, 2), bid0=bid0)
+
+    async def fetch_order_book_ticker(self, pair):
+        self.request_count += 1
+        return self.quote
+
+    get_trigger_order_extras = staticmethod(Binance.get_trigger_order_extras)
+    get_tp_order_extras = staticmethod(Binance.get_tp_order_extras)
+
+
+class Trending(FakeExchange):
+    """
+    Random walk prices, rising candles so the strategy goes long.
+    """
+
+    async def fetch_candles(self, pair, period):
+        candles = Candles()
+        for i in range(200):
+            price = self._price - (200 - i) * 0.1
+            candles.append(i * 60000, price, price, price, price, 1.0)
+        return candles
+
+
+def make_paper(**kwargs):
+    quotes = Quotes()
+    return quotes, PaperExchange(PaperMarket(quotes, ttl=0), **kwargs)
+
+
+def test_limit_entry_take_profit_and_stop_loss():
+    quotes, paper = make_paper(balance=1000, maker_fee=0.001, taker_fee=0.002)
+
+    async def run():
+        entry = await paper.place_order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            side=1,
+            qty=1,
+            price=349.0,
+            client_order_id="entry",
+        )
+        assert (await paper.fetch_current_orders("ETHUSDT")) == [entry]
+        assert (await paper.fetch_position("ETHUSDT")).side == 0
+
+        quotes.set_bid(348.5)
+        position = await paper.fetch_position("ETHUSDT")
+        assert (position.side, position.qty, position.avg_price) == (1, 1, 349.0)
+        # Maker fee on 349 notional
+        assert await paper.fetch_total_balance("USDT") == pytest.approx(1000 - 0.349)
+        assert position.unrealized_pnl == pytest.approx(348.505 - 349.0)
+        # The balance covers any loss
+        assert position.liq_price == 0
+
+        tp = await paper.place_order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            side=-1,
+            qty=1,
+            price=352.0,
+            extras=paper.get_tp_order_extras(),
+            client_order_id="tp",
+        )
+        assert (await paper.fetch_order("ETHUSDT", "tp")) is tp
+        sl = await paper.place_order(
+            pair="ETHUSDT",
+            order_type=OrderType.trigger,
+            side=-1,
+            qty=1,
+            price=345.0,
+            client_order_id="sl",
+        )
+        with pytest.raises(ExchangeException):
+            # Would trigger right away
+            await paper.place_order(
+                pair="ETHUSDT",
+                order_type=OrderType.trigger,
+                side=-1,
+                qty=1,
+                price=349.0,
+                client_order_id="sl2",
+            )
+
+        quotes.set_bid(344.0)
+        position = await paper.fetch_position("ETHUSDT")
+        return sl, position
+
+    sl, position = asyncio.run(run())
+    assert position.side == 0 and position.qty == 0
+    # Stop filled at the bid as taker, the take profit was cancelled with it
+    assert paper.realized_pnl == pytest.approx(344.0 - 349.0)
+    assert paper.fees == pytest.approx(0.349 + 0.688)
+    assert asyncio.run(paper.fetch_current_orders("ETHUSDT")) == []
+    assert asyncio.run(paper.fetch_order("ETHUSDT", "sl")) is sl
+    assert paper.summary()["fills"] == 2
+
+
+def test_market_orders_flip_and_margin():
+    quotes, paper = make_paper(balance=100, leverage=10, taker_fee=0)
+
+    async def run():
+        with pytest.raises(ExchangeException):
+            await paper.place_order(
+                pair="ETHUSDT", order_type=OrderType.market, side=1, qty=3
+            )
+        await paper.place_order(
+            pair="ETHUSDT", order_type=OrderType.market, side=1, qty=2
+        )
+        quotes.set_bid(360.0)
+        await paper.place_order(
+            pair="ETHUSDT", order_type=OrderType.market, side=-1, qty=2.5
+        )
+        return await paper.fetch_position("ETHUSDT")
+
+    position = asyncio.run(run())
+    assert (position.side, position.qty, position.avg_price) == (-1, 0.5, 360.0)
+    assert paper.realized_pnl == pytest.approx(2 * (360.0 - 350.01))
+    with pytest.raises(OrderNotFound):
+        asyncio.run(paper.cancel_order("ETHUSDT", "unknown"))
+
+
+def test_modify_order_keeps_side_and_type():
+    quotes, paper = make_paper(balance=1000)
+
+    async def run():
+        entry = await paper.place_order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            side=1,
+            qty=1,
+            price=349.0,
+            client_order_id="entry",
+        )
+        moved = await paper.modify_order(
+            entry, Order("ETHUSDT", OrderType.limit, 1, 1, 348.0)
+        )
+        # A sell above the bid, not a buy crossing the ask
+        tp = await paper.modify_order(
+            moved,
+            Order("ETHUSDT", OrderType.limit, -1, 1, 352.0, client_order_id="tp"),
+        )
+        return moved, tp, await paper.fetch_current_orders("ETHUSDT")
+
+    moved, tp, orders = asyncio.run(run())
+    assert moved.client_order_id == "entry" and moved.price == 348.0
+    assert orders == [tp]
+    assert (tp.side, tp.price, tp.client_order_id) == (-1, 352.0, "tp")
+    assert paper.fill_count == 0
+
+
+def test_liquidation():
+    quotes, paper = make_paper(balance=100, leverage=20, taker_fee=0)
+
+    async def run():
+        await paper.place_order(
+            pair="ETHUSDT", order_type=OrderType.market, side=1, qty=5
+        )
+        liq_price = (await paper.fetch_position("ETHUSDT")).liq_price
+        quotes.set_bid(round(liq_price - 1, 2))
+        return liq_price, await paper.fetch_position("ETHUSDT")
+
+    liq_price, position = asyncio.run(run())
+    assert 331 < liq_price < 332
+    assert position.side == 0
+    assert paper.liquidation_count == 1
+    assert paper.summary()["balance"] == pytest.approx(0, abs=1)
+
+
+def test_replay_orders_and_candles():
+    quotes, paper = make_paper(balance=100, leverage=20, taker_fee=0, maker_fee=0)
+    quote = OrderBookTicker(ask0=350.0, bid0=350.0)
+    rejected = paper.replace_orders(
+        "ETHUSDT",
+        [
+            Order("ETHUSDT", OrderType.limit, 1, 5, 349.0, client_order_id="entry"),
+            Order("ETHUSDT", OrderType.limit, 1, 0, 348.0, client_order_id="empty"),
+            Order("ETHUSDT", OrderType.trigger, -1, 5, 351.0, client_order_id="now"),
+        ],
+        quote,
+    )
+    assert rejected == 2
+    # Crosses the entry, then falls through the liquidation price
+    paper.sweep_candle("ETHUSDT", 350.0, 350.5, 348.5, 349.5)
+    position = paper.mark_position("ETHUSDT", 351.0)
+    assert (position.side, position.qty, position.unrealized_pnl) == (1, 5, 10.0)
+    assert paper.replace_orders("ETHUSDT", [], quote) == 0
+    paper.sweep_candle("ETHUSDT", 349.5, 349.5, 300.0, 310.0)
+    assert paper.mark_position("ETHUSDT", 310.0).side == 0
+    assert paper.liquidation_count == 1
+    assert paper.balance < 10
+
+
+def test_paper_robots_share_market_data():
+    quotes = Quotes()
+    market = PaperMarket(quotes, ttl=60)
+    robots = [PaperExchange(market) for _ in range(30)]
+
+    async def run():
+        await asyncio.gather(*(r.prepare() for r in robots))
+        await asyncio.gather(*(r.fetch_position("ETHUSDT") for r in robots))
+        await asyncio.gather(*(r.fetch_order_book_ticker("ETHUSDT") for r in robots))
+        await asyncio.gather(*(r.close() for r in robots))
+
+    asyncio.run(run())
+    assert quotes.request_count == 1
+    assert robots[0].code == "fake"
+
+
+def test_strategy_trades_on_paper():
+    market = PaperMarket(Trending(seed=1), ttl=0)
+    paper = PaperExchange(market, balance=10000)
+    strategy = Strategy(paper, metrics=Metrics())
+    strategy.set_trading_context(
+        {
+            "pair": "ETHUSDT",
+            "target_currency": "USDT",
+            "market_type": "linear_perpetual",
+            "price_precision": paper.price_precision("ETHUSDT"),
+            "price_tick": paper.price_ticker("ETHUSDT"),
+            "qty_precision": paper.qty_precision("ETHUSDT"),
+            "client_order_prefix": "nb1",
+        }
+    )
+    strategy.parameters = PARAMETERS
+
+    async def run():
+        for _ in range(200):
+            await strategy.trade_once()
+
+    asyncio.run(run())
+    assert paper.fill_count > 0
+    position = asyncio.run(paper.fetch_position("ETHUSDT"))
+    if position.side:
+        # Protected by its TP/SL
+        orders = asyncio.run(paper.fetch_current_orders("ETHUSDT"))
+        roles = {o.client_order_id.split("-")[1] for o in orders}
+        assert {"tp", "sl"} <= roles
@@ -0,0 +1,27 @@
+from bot.enums import OrderType
+from bot.records import Candles, Order, Position
+
+
+def test_order_equality_ignores_identity_and_extras():
+    a = Order("ETHUSDT", OrderType.limit, 1, 0.5, 350.49, extras={"reduceOnly": True})
+    b = Order("ETHUSDT", OrderType.limit, 1, 0.5, 350.49, order_id="1")
+    assert a == b
+    assert a != Order("ETHUSDT", OrderType.limit, -1, 0.5, 350.49)
+
+
+def test_position_copy():
+    position = Position("ETHUSDT", qty=1.5, side=1, avg_price=350)
+    copied = position.copy()
+    assert copied == position
+    copied.qty = 2
+    assert position.qty == 1.5
+
+
+def test_candles_from_ohlcv():
+    candles = Candles.from_ohlcv(
+        [[1000, 1.0, 3.0, 0.5, 2.0, 10.0], [2000, 2.0, 4.0, 1.5, 3.0, 20.0]]
+    )
+    assert len(candles) == 2
+    assert list(candles.close) == [2.0, 3.0]
+    assert candles[1].low == 1.5
+    assert candles[-1].timestamp == 2000
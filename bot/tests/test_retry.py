@@ -0,0 +1,128 @@
+import asyncio
+
+import pytest
+
+from bot.enums import OrderType
+from bot.exceptions import ExchangeException, OrderNotFound
+from bot.exchanges.binance_native import BinanceAPIError, BinanceNative
+from bot.exchanges.fake import FakeExchange
+from bot.exchanges.mock_binance import MockBinanceFutures, point_to
+from bot.exchanges.retry import RetryingExchange, RetryPolicy
+from bot.metrics import Metrics
+
+
+def wrap(cause):
+    try:
+        raise ExchangeException("Failed") from cause
+    except ExchangeException as exc:
+        return exc
+
+
+def test_retry_policy_delays():
+    policy = RetryPolicy(base_delay=0.2, max_delay=1.0, jitter=0)
+    assert [policy.delay(n) for n in range(1, 5)] == [0.2, 0.4, 0.8, 1.0]
+
+    policy = RetryPolicy(base_delay=1.0, jitter=0.5, seed=1)
+    assert all(0.5 <= policy.delay(1) <= 1.0 for _ in range(100))
+
+    policy = RetryPolicy.from_config({"maxAttempts": 5, "baseDelay": 0.1})
+    assert (policy.max_attempts, policy.base_delay, policy.max_delay) == (5, 0.1, 2.0)
+
+
+def test_adapters_classify_errors():
+    native = BinanceNative()
+    assert native.is_retryable(wrap(asyncio.TimeoutError()))
+    assert native.is_retryable(wrap(BinanceAPIError(503, -1001, "Internal error")))
+    assert native.is_retryable(wrap(BinanceAPIError(429, -1003, "Too many requests")))
+    assert native.is_retryable(wrap(BinanceAPIError(400, -1021, "Timestamp outside")))
+    assert not native.is_retryable(wrap(BinanceAPIError(400, -2019, "Margin")))
+    assert not native.is_retryable(wrap(BinanceAPIError(401, -2014, "API-key")))
+    assert not native.is_retryable(ExchangeException("Failed"))
+    assert native.is_order_not_found(wrap(BinanceAPIError(400, -2011, "Unknown")))
+    assert native.is_duplicate_order(wrap(BinanceAPIError(400, -4116, "Duplicated")))
+    assert not native.is_duplicate_order(wrap(BinanceAPIError(400, -2011, "Unknown")))
+
+    fake = FakeExchange()
+    assert fake.is_retryable(wrap(ConnectionResetError()))
+    assert not fake.is_retryable(wrap(ValueError()))
+    assert fake.is_order_not_found(OrderNotFound("Unknown order"))
+    assert not fake.is_duplicate_order(ExchangeException("Failed"))
+
+
+def run_against_mock(server, policy, run):
+    metrics = Metrics()
+    native = BinanceNative()
+    native.set_market_type("linear_perpetual")
+    native.auth({"api_key": "key", "secret": "secret"})
+    exchange = RetryingExchange(native, policy, metrics=metrics)
+
+    async def main():
+        point_to(native, await server.start())
+        try:
+            await exchange.prepare()
+            return await run(exchange)
+        finally:
+            await exchange.close()
+            await server.stop()
+
+    return asyncio.run(main()), metrics.snapshot()
+
+
+def test_place_order_is_idempotent_when_responses_are_lost():
+    server = MockBinanceFutures(
+        seed=3, endpoint_overrides={"/fapi/v1/order": {"lost_rate": 0.5}}
+    )
+
+    async def run(exchange):
+        placed = []
+        for n in range(10):
+            order = await exchange.place_order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                side=1,
+                qty=0.01,
+                price=300 - n,
+                client_order_id="nb-entry{}-1".format(n),
+            )
+            placed.append(order)
+        return placed, await exchange.fetch_current_orders("ETHUSDT")
+
+    (placed, orders), metrics = run_against_mock(
+        server, RetryPolicy(max_attempts=20, base_delay=0), run
+    )
+    # Every order exists exactly once, though some creates were sent twice
+    assert sorted(o.client_order_id for o in orders) == sorted(
+        o.client_order_id for o in placed
+    )
+    assert len(orders) == 10
+    assert metrics["exchange_orders_recovered"] > 0
+    assert metrics["exchange_retries"] > 0
+
+
+def test_fatal_errors_are_not_retried():
+    server = MockBinanceFutures(seed=1)
+
+    async def run(exchange):
+        with pytest.raises(ExchangeException):
+            await exchange.cancel_order("ETHUSDT", "unknown")
+
+    _, metrics = run_against_mock(server, RetryPolicy(base_delay=0), run)
+    assert server.request_count["/fapi/v1/order"] == 1
+    assert "exchange_retries" not in metrics
+
+
+def test_retries_give_up_after_max_attempts():
+    server = MockBinanceFutures(
+        seed=1, endpoint_overrides={"/fapi/v1/ticker/price": {"error_rate": 1.0}}
+    )
+
+    async def run(exchange):
+        with pytest.raises(ExchangeException):
+            await exchange.fetch_last_price("ETHUSDT")
+
+    _, metrics = run_against_mock(
+        server, RetryPolicy(max_attempts=4, base_delay=0), run
+    )
+    assert server.request_count["/fapi/v1/ticker/price"] == 4
+    assert metrics["exchange_retries"] == 3
+    assert metrics["exchange_retries_exhausted"] == 1
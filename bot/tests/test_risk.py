@@ -0,0 +1,193 @@
+import asyncio
+import random
+
+import pytest
+
+from bot.enums import OrderType
+from bot.exceptions import RiskControlException
+from bot.exchanges.paper import PaperExchange, PaperMarket
+from bot.metrics import Metrics
+from bot.records import Order, Position
+from bot.risk import RiskEngine, RiskLimits, account_key
+from bot.strategy import Strategy
+from bot.tests.test_paper import PARAMETERS, Trending
+
+
+def order(side, qty, price, order_type=OrderType.limit, extras=None):
+    return Order("ETHUSDT", order_type, side, qty, price, extras=extras)
+
+
+def test_account_totals_are_incremental():
+    metrics = Metrics()
+    engine = RiskEngine(metrics=metrics)
+    rng = random.Random(5)
+    robots = [engine.attach(i, "acc{}".format(i % 2)) for i in range(6)]
+    assert metrics.snapshot()["risk_robots"] == 6
+    for _ in range(2000):
+        robot = rng.choice(robots)
+        side = rng.choice((-1, 0, 1))
+        position = Position(
+            qty=rng.uniform(0.1, 5) if side else 0.0,
+            side=side,
+            avg_price=rng.uniform(300, 400) if side else 0.0,
+        )
+        robot.update(
+            balance=rng.uniform(900, 1100),
+            position=position if rng.random() < 0.5 else None,
+            mark=rng.uniform(300, 400),
+        )
+
+    for name in ("acc0", "acc1"):
+        account = engine.account(name)
+        members = [r for r in robots if r.account is account]
+        assert account.robots == 3
+        assert account.exposure == pytest.approx(sum(r.qty * r.mark for r in members))
+        assert account.unrealized_pnl == pytest.approx(
+            sum(r.side * r.qty * (r.mark - r.avg_price) for r in members)
+        )
+        assert account.realized_pnl == pytest.approx(
+            sum(r.realized_pnl for r in members)
+        )
+        assert 0 <= account.drawdown < 1
+
+    exposure = engine.account("acc0").exposure
+    robots[0].close()
+    assert engine.account("acc0").exposure == pytest.approx(
+        exposure - robots[0].exposure
+    )
+    for robot in robots[1:]:
+        robot.close()
+    assert engine.account("acc0") is None
+    assert metrics.snapshot() == {}
+    engine.attach(1, "acc1")
+    with pytest.raises(ValueError):
+        engine.attach(1, "acc1")
+
+
+def test_robot_pnl_drawdown_and_liquidation_distance():
+    engine = RiskEngine()
+    robot = engine.attach(1, "acc")
+    robot.update(1000, Position(qty=2, side=1, avg_price=350, liq_price=315), 350)
+    assert robot.liq_distance == pytest.approx(0.1)
+    robot.update(mark=360)
+    assert (robot.unrealized_pnl, robot.exposure) == (20, 720)
+    # Half closed at the mark
+    robot.update(position=Position(qty=1, side=1, avg_price=350), mark=355)
+    assert robot.realized_pnl == 5
+    assert robot.pnl == 10 and robot.drawdown == 10
+    # Flipped: the long is closed at the mark
+    robot.update(position=Position(qty=1, side=-1, avg_price=340), mark=340)
+    assert robot.realized_pnl == -5 and robot.unrealized_pnl == 0
+    assert robot.drawdown == 25
+    account = engine.account("acc")
+    assert account.realized_pnl == -5
+    assert account.equity == 1000
+    assert account.drawdown == pytest.approx(20 / 1020)
+
+
+def test_vetoes():
+    engine = RiskEngine(
+        RiskLimits(max_exposure=2000, max_robot_exposure=1500, min_liq_distance=0.05)
+    )
+    a = engine.attach("a", "acc")
+    b = engine.attach("b", "acc")
+    a.update(1000, Position(qty=3, side=1, avg_price=350, liq_price=300), 350)
+    b.update(1000, Position(qty=1, side=-1, avg_price=350), 350)
+
+    a.check([order(1, 1, 340)])
+    protection = [
+        order(-1, 3, 351, extras={"reduceOnly": True}),
+        order(-1, 3, 349, OrderType.trigger),
+    ]
+    a.check(protection)
+    with pytest.raises(RiskControlException, match="maxRobotExposure"):
+        a.check([order(1, 1, 340), order(1, 2, 330)])
+    with pytest.raises(RiskControlException, match="maxExposure"):
+        b.check([order(-1, 2, 360)])
+
+    a.update(mark=310)
+    with pytest.raises(RiskControlException, match="minLiqDistance"):
+        a.check([order(1, 0.1, 309)])
+    # Never blocks the TP/SL
+    a.check(protection)
+
+    engine.configure({"maxDrawdown": 0.05})
+    assert engine.limits.max_exposure is None
+    with pytest.raises(RiskControlException, match="maxDrawdown"):
+        a.check([order(1, 0.1, 309)])
+    engine.configure({"maxLoss": 100})
+    with pytest.raises(RiskControlException, match="maxLoss"):
+        a.check([order(1, 0.1, 309)])
+    b.check([order(-1, 1, 311)])
+
+
+def test_veto_cancels_resting_entry_orders():
+    engine = RiskEngine(metrics=Metrics())
+    paper = PaperExchange(PaperMarket(Trending(seed=1), ttl=0), balance=10000)
+    strategy = Strategy(paper, metrics=Metrics(), risk=engine.attach(1, "paper:1"))
+    strategy.set_trading_context(
+        {
+            "pair": "ETHUSDT",
+            "target_currency": "USDT",
+            "market_type": "linear_perpetual",
+            "price_precision": 2,
+            "price_tick": 0.01,
+            "qty_precision": 3,
+            "client_order_prefix": "nb1",
+        }
+    )
+    strategy.parameters = PARAMETERS
+
+    async def run():
+        await strategy.trade_once()
+        placed = await paper.fetch_current_orders("ETHUSDT")
+        engine.configure({"maxRobotExposure": 1})
+        await strategy.trade_once()
+        return placed, await paper.fetch_current_orders("ETHUSDT")
+
+    placed, remaining = asyncio.run(run())
+    roles = {strategy.orders.role(o) for o in placed}
+    assert roles - {"tp", "sl"}
+    assert {strategy.orders.role(o) for o in remaining} <= {"tp", "sl"}
+    strategy.close()
+
+
+def test_account_key():
+    key = account_key("binance", {"api_key": "secret-api-key", "secret": "s"})
+    assert key == account_key("binance", {"api_key": "secret-api-key"})
+    assert key != account_key("binance", {"api_key": "other"})
+    assert key.startswith("binance:") and "secret" not in key
+
+
+def test_strategy_orders_vetoed():
+    metrics = Metrics()
+    engine = RiskEngine(RiskLimits(max_robot_exposure=100), metrics=metrics)
+    paper = PaperExchange(PaperMarket(Trending(seed=1), ttl=0), balance=10000)
+    strategy = Strategy(paper, metrics=metrics, risk=engine.attach(1, "paper:1"))
+    strategy.set_trading_context(
+        {
+            "pair": "ETHUSDT",
+            "target_currency": "USDT",
+            "market_type": "linear_perpetual",
+            "price_precision": 2,
+            "price_tick": 0.01,
+            "qty_precision": 3,
+            "client_order_prefix": "nb1",
+        }
+    )
+    strategy.parameters = PARAMETERS
+
+    async def run():
+        for _ in range(5):
+            await strategy.trade_once()
+        return await paper.fetch_current_orders("ETHUSDT")
+
+    assert asyncio.run(run()) == []
+    snapshot = metrics.snapshot()
+    assert snapshot["risk_vetoes"] == 5
+    assert snapshot["risk_robots"] == 1
+    assert strategy.risk.account.balance == 10000
+    assert strategy.log_queue.qsize() > 0
+
+    strategy.close()
+    assert strategy.risk is None and engine.account("paper:1") is None
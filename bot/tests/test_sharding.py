@@ -0,0 +1,130 @@
+import asyncio
+import logging
+import time
+
+from bot.metrics import Metrics, registry
+from bot.sharding import HashRing, ShardSupervisor
+
+logger = logging.getLogger("bot.tests.sharding")
+
+
+class DummyBot:
+    """
+    Stands for main.Bot in the worker processes.
+    """
+
+    def __init__(self, config, standalone=True):
+        assert not standalone
+        self.robot_id = config["robotId"]
+        self._stopping = asyncio.Event()
+
+    def request_stop(self, signum=None):
+        self._stopping.set()
+
+    async def start(self):
+        logger.info("dummy robot %s started", self.robot_id)
+        registry.incr("dummy_started")
+        if self.robot_id == "crash":
+            raise RuntimeError("crashed")
+        await self._stopping.wait()
+
+
+def test_hash_ring_spreads_keys_and_moves_few():
+    keys = range(2000)
+    ring = HashRing(range(4))
+    before = ring.assign(keys)
+    counts = [list(before.values()).count(n) for n in range(4)]
+    assert all(350 < c < 650 for c in counts)
+
+    ring.add(4)
+    after = ring.assign(keys)
+    moved = [k for k in keys if before[k] != after[k]]
+    # Only keys taken by the new node move, about a fifth of them
+    assert all(after[k] == 4 for k in moved)
+    assert 250 < len(moved) < 550
+
+    ring.remove(1)
+    removed = ring.assign(keys)
+    assert all(removed[k] == after[k] for k in keys if after[k] != 1)
+    assert ring.nodes == {0, 2, 3, 4}
+
+
+def wait_for(shards, predicate, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        shards.poll(timeout=0.1)
+        if predicate():
+            return True
+    return False
+
+
+def test_shard_supervisor_runs_and_rebalances_robots(caplog):
+    caplog.set_level(logging.INFO, logger="bot")
+    config = {"reportInterval": 0.1, "shutdownTimeout": 1}
+    shards = ShardSupervisor(
+        config, "bot.tests.test_sharding:DummyBot", workers=2, metrics=Metrics()
+    )
+    shards.start()
+    try:
+        shards.set_robots(range(6))
+        assert set(shards.assignment.values()) == {0, 1}
+
+        def robots(n):
+            return lambda: shards.metrics().get("robots") == n
+
+        assert wait_for(shards, robots(6))
+        assert wait_for(shards, lambda: shards.metrics().get("dummy_started") == 6)
+        assert shards.metrics()["shard_workers"] == 2
+
+        # Removing robots doesn't move the others
+        before = shards.assignment
+        shards.set_robots(range(4))
+        assert shards.assignment == {r: before[r] for r in range(4)}
+        assert wait_for(shards, robots(4))
+
+        # A robot failing on its own is not restarted
+        shards.set_robots(list(range(4)) + ["crash"])
+        assert wait_for(shards, lambda: "crash" not in shards.assignment)
+        assert wait_for(shards, robots(4))
+
+        # A third worker takes some robots over
+        shards.resize(3)
+        assert wait_for(shards, lambda: set(shards.assignment.values()) == {0, 1, 2})
+        assert wait_for(shards, robots(4))
+        assert shards.assignment == HashRing(range(3)).assign(range(4))
+    finally:
+        shards.stop(timeout=10)
+
+    assert shards.metrics()["shard_workers"] == 0
+    messages = [r.getMessage() for r in caplog.records]
+    assert "dummy robot 0 started" in messages
+    assert any("Robot crash exited on its own" in m for m in messages)
+    assert {getattr(r, "worker", None) for r in caplog.records} >= {0, 1, 2}
+
+
+def test_robots_of_an_account_share_a_worker():
+    def account(robot_id):
+        if robot_id == "unknown":
+            raise LookupError("no credentials")
+        return "acc{}".format(robot_id % 3)
+
+    shards = ShardSupervisor(
+        {"shutdownTimeout": 1},
+        "bot.tests.test_sharding:DummyBot",
+        workers=3,
+        metrics=Metrics(),
+        shard_key=account,
+    )
+    shards.start()
+    try:
+        shards.set_robots(list(range(12)) + ["unknown"])
+        assignment = shards.assignment
+    finally:
+        shards.stop(timeout=10)
+
+    assert "unknown" not in assignment
+    workers = {}
+    for robot_id, worker_id in assignment.items():
+        workers.setdefault(account(robot_id), set()).add(worker_id)
+    assert len(assignment) == 12
+    assert all(len(w) == 1 for w in workers.values())
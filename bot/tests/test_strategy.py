@@ -1,5 +1,6 @@
 import pytest
 
+from bot.records import Order
 from bot.strategy import Indicator, OrderType, Side, Strategy
 
 
@@ -12,52 +13,52 @@ from bot.strategy import Indicator, OrderType, Side, Strategy
             350.5,
             0.01,
             1,
-            {
-                "pair": "ETHUSDT",
-                "order_type": OrderType.limit,
-                "price": 350.49,
-                "side": 1,
-                "qty": 0.5,
-            },
+            Order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                price=350.49,
+                side=1,
+                qty=0.5,
+            ),
         ),
         (
             2,
             350.5,
             0.01,
             1,
-            {
-                "pair": "ETHUSDT",
-                "order_type": OrderType.limit,
-                "price": 350.49,
-                "side": 1,
-                "qty": 0.5,
-            },
+            Order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                price=350.49,
+                side=1,
+                qty=0.5,
+            ),
         ),
         (
             3,
             350.5,
             0.01,
             1,
-            {
-                "pair": "ETHUSDT",
-                "order_type": OrderType.limit,
-                "price": 350.48,
-                "side": 1,
-                "qty": 0.5,
-            },
+            Order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                price=350.48,
+                side=1,
+                qty=0.5,
+            ),
         ),
         (
             4,
             350.5,
             0.01,
             1,
-            {
-                "pair": "ETHUSDT",
-                "order_type": OrderType.limit,
-                "price": 350.47,
-                "side": 1,
-                "qty": 0.5,
-            },
+            Order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                price=350.47,
+                side=1,
+                qty=0.5,
+            ),
         ),
         # sell
         (
@@ -65,52 +66,52 @@ from bot.strategy import Indicator, OrderType, Side, Strategy
             350.5,
             0.01,
             -1,
-            {
-                "pair": "ETHUSDT",
-                "order_type": OrderType.limit,
-                "price": 350.51,
-                "side": -1,
-                "qty": 0.5,
-            },
+            Order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                price=350.51,
+                side=-1,
+                qty=0.5,
+            ),
         ),
         (
             2,
             350.5,
             0.01,
             -1,
-            {
-                "pair": "ETHUSDT",
-                "order_type": OrderType.limit,
-                "price": 350.51,
-                "side": -1,
-                "qty": 0.5,
-            },
+            Order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                price=350.51,
+                side=-1,
+                qty=0.5,
+            ),
         ),
         (
             3,
             350.5,
             0.01,
             -1,
-            {
-                "pair": "ETHUSDT",
-                "order_type": OrderType.limit,
-                "price": 350.52,
-                "side": -1,
-                "qty": 0.5,
-            },
+            Order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                price=350.52,
+                side=-1,
+                qty=0.5,
+            ),
         ),
         (
             4,
             350.5,
             0.01,
             -1,
-            {
-                "pair": "ETHUSDT",
-                "order_type": OrderType.limit,
-                "price": 350.53,
-                "side": -1,
-                "qty": 0.5,
-            },
+            Order(
+                pair="ETHUSDT",
+                order_type=OrderType.limit,
+                price=350.53,
+                side=-1,
+                qty=0.5,
+            ),
         ),
     ],
 )
@@ -144,13 +145,13 @@ def test_get_stop_loss_order():
     }
     strategy = Strategy.new(position=position)
     sl_order = strategy.get_stop_loss_order()
-    expected = {
-        "pair": "ETHUSDT",
-        "order_type": OrderType.trigger,
-        "price": 350.1,
-        "side": Side.long,
-        "qty": 1.5,
-    }
+    expected = Order(
+        pair="ETHUSDT",
+        order_type=OrderType.trigger,
+        price=350.1,
+        side=Side.long,
+        qty=1.5,
+    )
     assert sl_order == expected
 
     # long position
@@ -163,13 +164,13 @@ def test_get_stop_loss_order():
     }
     strategy = Strategy.new(position=position)
     sl_order = strategy.get_stop_loss_order()
-    expected = {
-        "pair": "ETHUSDT",
-        "order_type": OrderType.trigger,
-        "price": 330.1,
-        "side": Side.short,
-        "qty": 1.5,
-    }
+    expected = Order(
+        pair="ETHUSDT",
+        order_type=OrderType.trigger,
+        price=330.1,
+        side=Side.short,
+        qty=1.5,
+    )
     assert sl_order == expected
 
 
@@ -184,13 +185,13 @@ def test_get_take_profit_order():
     }
     strategy = Strategy.new(position=position)
     tp_order = strategy.get_take_profit_order()
-    expected = {
-        "pair": "ETHUSDT",
-        "order_type": OrderType.limit,
-        "price": 339.6,
-        "side": Side.long,
-        "qty": 1.5,
-    }
+    expected = Order(
+        pair="ETHUSDT",
+        order_type=OrderType.limit,
+        price=339.6,
+        side=Side.long,
+        qty=1.5,
+    )
     assert tp_order == expected
 
     # long position
@@ -203,13 +204,13 @@ def test_get_take_profit_order():
     }
     strategy = Strategy.new(position=position)
     tp_order = strategy.get_take_profit_order()
-    expected = {
-        "pair": "ETHUSDT",
-        "order_type": OrderType.limit,
-        "price": 340.6,
-        "side": Side.short,
-        "qty": 1.5,
-    }
+    expected = Order(
+        pair="ETHUSDT",
+        order_type=OrderType.limit,
+        price=340.6,
+        side=Side.short,
+        qty=1.5,
+    )
     assert tp_order == expected
 
 
@@ -293,73 +294,73 @@ def test_prepare_open_pos_orders():
     # long
     orders = strategy.prepare_open_pos_orders(side=1, base_price=350)
     expected = [
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.99,
-            "side": 1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.98,
-            "side": 1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.95,
-            "side": 1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.95,
-            "side": 1,
-            "qty": 0.857,
-        },
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.99,
+            side=1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.98,
+            side=1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.95,
+            side=1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.95,
+            side=1,
+            qty=0.857,
+        ),
     ]
-    assert sorted(orders, key=lambda o: o["price"]) == sorted(
-        expected, key=lambda o: o["price"]
+    assert sorted(orders, key=lambda o: o.price) == sorted(
+        expected, key=lambda o: o.price
     )
 
     # short
     orders = strategy.prepare_open_pos_orders(side=-1, base_price=350)
     expected = [
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.01,
-            "side": -1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.02,
-            "side": -1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.05,
-            "side": -1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.05,
-            "side": -1,
-            "qty": 0.857,
-        },
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.01,
+            side=-1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.02,
+            side=-1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.05,
+            side=-1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.05,
+            side=-1,
+            qty=0.857,
+        ),
     ]
-    assert sorted(orders, key=lambda o: o["price"]) == sorted(
-        expected, key=lambda o: o["price"]
+    assert sorted(orders, key=lambda o: o.price) == sorted(
+        expected, key=lambda o: o.price
     )
 
     # inverse contract
@@ -375,73 +376,73 @@ def test_prepare_open_pos_orders():
     # long
     orders = strategy.prepare_open_pos_orders(side=1, base_price=350)
     expected = [
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.99,
-            "side": 1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.98,
-            "side": 1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.95,
-            "side": 1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.95,
-            "side": 1,
-            "qty": 15,
-        },
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.99,
+            side=1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.98,
+            side=1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.95,
+            side=1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.95,
+            side=1,
+            qty=15,
+        ),
     ]
-    assert sorted(orders, key=lambda o: o["price"]) == sorted(
-        expected, key=lambda o: o["price"]
+    assert sorted(orders, key=lambda o: o.price) == sorted(
+        expected, key=lambda o: o.price
     )
 
     # short
     orders = strategy.prepare_open_pos_orders(side=-1, base_price=350)
     expected = [
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.01,
-            "side": -1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.02,
-            "side": -1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.05,
-            "side": -1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.05,
-            "side": -1,
-            "qty": 15,
-        },
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.01,
+            side=-1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.02,
+            side=-1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.05,
+            side=-1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.05,
+            side=-1,
+            qty=15,
+        ),
     ]
-    assert sorted(orders, key=lambda o: o["price"]) == sorted(
-        expected, key=lambda o: o["price"]
+    assert sorted(orders, key=lambda o: o.price) == sorted(
+        expected, key=lambda o: o.price
     )
 
 
@@ -478,44 +479,44 @@ def test_prepare_add_pos_orders():
     strategy.sync_store(last_price=350)
     orders = strategy.prepare_add_pos_orders(side=1, base_price=350)
     expected = [
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.trigger,
-            "price": 349.1,
-            "side": -1,
-            "qty": 1.5,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 359.6,
-            "side": -1,
-            "qty": 1.5,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.95,
-            "side": 1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.95,
-            "side": 1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.9,
-            "side": 1,
-            "qty": 0.857,
-        },
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.trigger,
+            price=349.1,
+            side=-1,
+            qty=1.5,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=359.6,
+            side=-1,
+            qty=1.5,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.95,
+            side=1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.95,
+            side=1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.9,
+            side=1,
+            qty=0.857,
+        ),
     ]
-    assert sorted(orders, key=lambda o: o["price"]) == sorted(
-        expected, key=lambda o: o["price"]
+    assert sorted(orders, key=lambda o: o.price) == sorted(
+        expected, key=lambda o: o.price
     )
 
     # short position
@@ -549,44 +550,44 @@ def test_prepare_add_pos_orders():
     strategy.sync_store(last_price=350)
     orders = strategy.prepare_add_pos_orders(side=-1, base_price=350)
     expected = [
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.trigger,
-            "price": 359.1,
-            "side": 1,
-            "qty": 1.5,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 348.6,
-            "side": 1,
-            "qty": 1.5,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.05,
-            "side": -1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.05,
-            "side": -1,
-            "qty": 0.857,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.1,
-            "side": -1,
-            "qty": 0.857,
-        },
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.trigger,
+            price=359.1,
+            side=1,
+            qty=1.5,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=348.6,
+            side=1,
+            qty=1.5,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.05,
+            side=-1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.05,
+            side=-1,
+            qty=0.857,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.1,
+            side=-1,
+            qty=0.857,
+        ),
     ]
-    assert sorted(orders, key=lambda o: o["price"]) == sorted(
-        expected, key=lambda o: o["price"]
+    assert sorted(orders, key=lambda o: o.price) == sorted(
+        expected, key=lambda o: o.price
     )
 
     # inverse contract
@@ -620,44 +621,44 @@ def test_prepare_add_pos_orders():
     strategy.sync_store(last_price=350)
     orders = strategy.prepare_add_pos_orders(side=1, base_price=350)
     expected = [
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.trigger,
-            "price": 349.1,
-            "side": -1,
-            "qty": 1000,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 359.6,
-            "side": -1,
-            "qty": 1000,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.95,
-            "side": 1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.95,
-            "side": 1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 349.9,
-            "side": 1,
-            "qty": 15,
-        },
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.trigger,
+            price=349.1,
+            side=-1,
+            qty=1000,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=359.6,
+            side=-1,
+            qty=1000,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.95,
+            side=1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.95,
+            side=1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=349.9,
+            side=1,
+            qty=15,
+        ),
     ]
-    assert sorted(orders, key=lambda o: o["price"]) == sorted(
-        expected, key=lambda o: o["price"]
+    assert sorted(orders, key=lambda o: o.price) == sorted(
+        expected, key=lambda o: o.price
     )
 
     # short position
@@ -690,44 +691,44 @@ def test_prepare_add_pos_orders():
     strategy.sync_store(last_price=350)
     orders = strategy.prepare_add_pos_orders(side=-1, base_price=350)
     expected = [
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.trigger,
-            "price": 359.1,
-            "side": 1,
-            "qty": 1000,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 348.6,
-            "side": 1,
-            "qty": 1000,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.05,
-            "side": -1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.05,
-            "side": -1,
-            "qty": 15,
-        },
-        {
-            "pair": "ETHUSDT",
-            "order_type": OrderType.limit,
-            "price": 350.1,
-            "side": -1,
-            "qty": 15,
-        },
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.trigger,
+            price=359.1,
+            side=1,
+            qty=1000,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=348.6,
+            side=1,
+            qty=1000,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.05,
+            side=-1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.05,
+            side=-1,
+            qty=15,
+        ),
+        Order(
+            pair="ETHUSDT",
+            order_type=OrderType.limit,
+            price=350.1,
+            side=-1,
+            qty=15,
+        ),
     ]
-    assert sorted(orders, key=lambda o: o["price"]) == sorted(
-        expected, key=lambda o: o["price"]
+    assert sorted(orders, key=lambda o: o.price) == sorted(
+        expected, key=lambda o: o.price
     )
 
 
@@ -0,0 +1,68 @@
+import asyncio
+
+from bot.metrics import Metrics
+from bot.supervisor import TaskSupervisor
+
+
+class Crash(BaseException):
+    """
+    Not an Exception, like the errors that used to kill the loops silently.
+    """
+
+
+def test_supervisor_restarts_failed_and_hung_loops():
+    calls = {"ok": 0, "crash": 0, "hang": 0}
+
+    async def ok():
+        calls["ok"] += 1
+
+    async def crash():
+        calls["crash"] += 1
+        if calls["crash"] <= 2:
+            raise Crash()
+
+    async def hang():
+        calls["hang"] += 1
+        await asyncio.sleep(3600)
+
+    async def run():
+        metrics = Metrics()
+        supervisor = TaskSupervisor(base_delay=0.01, max_delay=0.02, metrics=metrics)
+        supervisor.add("ok", ok, interval=0.01)
+        supervisor.add("crash", crash, interval=0.01)
+        supervisor.add("hang", hang, interval=0.01, timeout=0.02)
+        await asyncio.sleep(0.3)
+        health = supervisor.health()
+        snapshot = metrics.snapshot()
+        await supervisor.stop(timeout=1)
+        return health, snapshot, metrics.snapshot()
+
+    health, snapshot, after_stop = asyncio.run(run())
+    assert health["ok"]["restarts"] == 0 and health["ok"]["iterations"] > 5
+    # Failed twice, then recovered
+    assert health["crash"]["restarts"] == 2
+    assert health["crash"]["iterations"] == calls["crash"] - 2
+    assert health["crash"]["state"] == "running"
+    # Every iteration hangs and is cut at the timeout
+    assert health["hang"]["iterations"] == 0
+    assert health["hang"]["timeouts"] == calls["hang"] >= 2
+    assert 20 <= health["hang"]["max_ms"] < 100
+    assert snapshot["task_crash_restarts"] == 2
+    assert "task_ok_iterations" in snapshot
+    assert after_stop == {}
+
+
+def test_supervisor_stops_selected_loops():
+    async def idle():
+        await asyncio.sleep(0)
+
+    async def run():
+        supervisor = TaskSupervisor(metrics=Metrics())
+        supervisor.add("a", idle, interval=0.01)
+        supervisor.add("b", idle, interval=0.01)
+        await supervisor.stop(timeout=1, names=["a"])
+        remaining = list(supervisor.health())
+        await supervisor.stop(timeout=1)
+        return remaining, supervisor.health()
+
+    assert asyncio.run(run()) == (["b"], {})
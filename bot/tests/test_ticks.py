@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from bot.enums import OrderType, Side
+from bot.exchanges.fake import FakeExchange
+from bot.records import Order
+from bot.strategy import Strategy
+from bot.utils.ticks import MarketSpec
+
+
+def test_market_spec_from_precision():
+    market = MarketSpec.from_precision(price_precision=2, qty_precision=3)
+    assert market.price_tick == 0.01
+    assert market.qty_step == 0.001
+    assert MarketSpec(price_tick=0.5, qty_step=1).price_precision == 1
+
+
+@pytest.mark.parametrize(
+    "price,ticks", [(350.49, 35049), (350.5 - 0.01, 35049), (0.07 + 0.02, 9)]
+)
+def test_price_ticks_round_trip(price, ticks):
+    market = MarketSpec(price_tick=0.01, qty_step=0.001)
+    assert market.price_to_ticks(price) == ticks
+    assert market.ticks_to_price(ticks) == round(price, 2)
+
+
+def test_round_price_to_coarse_tick():
+    market = MarketSpec(price_tick=0.5, qty_step=1)
+    assert market.round_price(11000.3) == 11000.5
+    assert market.round_price(11000.2) == 11000.0
+
+
+def test_order_matches():
+    market = MarketSpec(price_tick=0.01, qty_step=0.001)
+    expected = Order("ETHUSDT", OrderType.trigger, 1, 0.3, 0.3)
+    real = Order("ETHUSDT", OrderType.trigger, 1, 0.1 + 0.2, 0.1 + 0.2)
+    assert real != expected
+    assert market.order_matches(real, expected)
+    assert not market.order_matches(
+        Order("ETHUSDT", OrderType.trigger, 1, 0.3, 0.31), expected
+    )
+
+
+def test_ensure_order_does_not_replace_orders_differing_by_float_noise():
+    position = {
+        "qty": 1.5,
+        "side": Side.long,
+        "liq_price": 0.0,
+        "avg_price": 340.1,
+        "unrealized_pnl": 0.0,
+    }
+    exchange = FakeExchange()
+    exchange.set_position(position)
+    strategy = Strategy.new(position=position)
+    strategy._exchange = exchange
+
+    tp_order = strategy.get_take_profit_order()
+    sl_order = strategy.get_stop_loss_order()
+    assert tp_order.price == 340.6
+    assert sl_order.price == 330.1
+    # Float noise as if parsed back from the exchange
+    tp_order.price = 340.6 + 1e-9
+    sl_order.price = 330.1 - 1e-9
+    exchange._orders.extend([tp_order, sl_order])
+
+    asyncio.run(strategy.ensure_order())
+    assert exchange._orders == [tp_order, sl_order]
+    assert exchange.request_count == 1
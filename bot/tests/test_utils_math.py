@@ -8,3 +8,11 @@ from bot.utils import math
 )
 def test_fib(n, f):
     assert math.fib(n) == f
+
+
+@pytest.mark.parametrize(
+    "data,p,expected",
+    [([], 0.5, 0.0), ([1], 0.99, 1), ([3, 1, 2], 0.5, 2), ([1, 2, 3, 4], 0.5, 2.5)],
+)
+def test_percentile(data, p, expected):
+    assert math.percentile(data, p) == expected
@@ -1,10 +1,25 @@
+from typing import List
+
 import pandas as pd
 
 
 def fib(n: int) -> int:
-    f = ((1 + 5 ** 0.5) / 2) ** n / 5 ** 0.5 + 0.5
+    f = ((1 + 5**0.5) / 2) ** n / 5**0.5 + 0.5
     return int(f)
 
 
 def cal_ewm(data: pd.Series, span: int) -> pd.Series:
     return data.ewm(span=span).mean()
+
+
+def percentile(data: List[float], p: float) -> float:
+    """
+    Linear interpolated percentile, p in [0, 1].
+    """
+    if not data:
+        return 0.0
+    data = sorted(data)
+    k = (len(data) - 1) * p
+    f = int(k)
+    c = min(f + 1, len(data) - 1)
+    return data[f] + (data[c] - data[f]) * (k - f)
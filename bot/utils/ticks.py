@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from bot.records import Order
+
+
+def _decimals(step: float) -> int:
+    exponent = Decimal(repr(step)).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
+class MarketSpec:
+    """
+    Price tick and quantity step of a market.
+
+    Prices and quantities are converted to integer multiples of the tick/step
+    so that order builders and comparisons are exact. Floats are only produced
+    at the edge, rounded to the tick precision, e.g. 350.49 rather than
+    350.49000000000001.
+    """
+
+    __slots__ = ("price_tick", "qty_step", "price_precision", "qty_precision")
+
+    def __init__(self, price_tick: float, qty_step: float):
+        self.price_tick = price_tick
+        self.qty_step = qty_step
+        self.price_precision = _decimals(price_tick)
+        self.qty_precision = _decimals(qty_step)
+
+    @classmethod
+    def from_precision(cls, price_precision: int, qty_precision: int) -> "MarketSpec":
+        return cls(
+            price_tick=float(Decimal(1).scaleb(-price_precision)),
+            qty_step=float(Decimal(1).scaleb(-qty_precision)),
+        )
+
+    def price_to_ticks(self, price: float) -> int:
+        return int(round(price / self.price_tick))
+
+    def ticks_to_price(self, ticks: int) -> float:
+        return round(ticks * self.price_tick, self.price_precision)
+
+    def qty_to_steps(self, qty: float) -> int:
+        return int(round(qty / self.qty_step))
+
+    def steps_to_qty(self, steps: int) -> float:
+        return round(steps * self.qty_step, self.qty_precision)
+
+    def round_price(self, price: float) -> float:
+        return self.ticks_to_price(self.price_to_ticks(price))
+
+    def round_qty(self, qty: float) -> float:
+        return self.steps_to_qty(self.qty_to_steps(qty))
+
+    def order_matches(self, a: Order, b: Order) -> bool:
+        """
+        Same side and type, and same price/qty once snapped to tick/step.
+        """
+        if a.side != b.side or a.order_type != b.order_type:
+            return False
+        if self.qty_to_steps(a.qty) != self.qty_to_steps(b.qty):
+            return False
+        if a.price is None or b.price is None:
+            return a.price is b.price
+        return self.price_to_ticks(a.price) == self.price_to_ticks(b.price)
+
+    def __repr__(self):
+        return "MarketSpec(price_tick={}, qty_step={})".format(
+            self.price_tick, self.qty_step
+        )
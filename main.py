@@ -1,8 +1,10 @@
 import argparse
 import asyncio
+import functools
 import json
 import logging
 import pathlib
+import sys
 from typing import Optional
 
 from yufuquantsdk.clients import RESTAPIClient, WebsocketAPIClient
@@ -16,8 +18,25 @@ from bot.exceptions import (
     UnsupportedExchange,
 )
 from bot.exchanges import exchange_factory
+from bot.exchanges.breaker import CircuitBreaker
+from bot.exchanges.hub import default_hub
+from bot.exchanges.paper import PaperExchange, shared_market
+from bot.exchanges.retry import RetryingExchange, RetryPolicy
+from bot.indicators import default_service
+from bot.lifecycle import (
+    EVENT_LOOPS,
+    drain_queue,
+    install_signal_handlers,
+    run_bounded,
+    use_event_loop,
+)
 from bot.log import config_logging
+from bot.metrics import registry
+from bot.monitor import LoopLagMonitor
+from bot.risk import account_key, default_engine
+from bot.sharding import ShardSupervisor
 from bot.strategy import Strategy
+from bot.supervisor import TaskSupervisor
 
 logger = logging.getLogger("bot")
 
@@ -26,8 +45,15 @@ logger = logging.getLogger("bot")
 
 
 class Bot:
-    def __init__(self, config):
+    """
+    One robot. Standalone, it owns the process: event loop, loop monitor,
+    shared market data and indicators. Otherwise it runs next to other robots in a worker
+    process started by bot.sharding, which owns them.
+    """
+
+    def __init__(self, config, standalone=True):
         self._config = config
+        self._standalone = standalone
         self._robot_id = config["robotId"]
         self._rest_client = RESTAPIClient(
             base_url=config["restApiBaseUrl"],
@@ -36,9 +62,25 @@ class Bot:
         self._ws_client = WebsocketAPIClient(
             uri=config["wsApiUri"],
         )
+        self._exchange = None
+        self._breaker: Optional[CircuitBreaker] = None
         self._strategy: Optional[Strategy] = None
+        self._supervisor = TaskSupervisor(
+            prefix="task_" if standalone else "robot{}_task_".format(self._robot_id)
+        )
+        self._stopping = asyncio.Event()
+        # Seconds allowed to each shutdown step
+        self._shutdown_timeout = config.get("shutdownTimeout", 5.0)
+        self._loop_monitor = LoopLagMonitor(
+            threshold=config.get("loopLagThreshold", 0.25)
+        )
 
     async def _prepare(self):
+        if self._standalone:
+            self._loop_monitor.start()
+            default_hub.configure(self._config.get("marketData"))
+            default_service.configure(self._config.get("indicators"))
+            default_engine.configure(self._config.get("risk"))
         await self._ws_client.auth(self._config["apiKey"])
         await self._ws_client.sub(topics=[f"robot#{self._robot_id}.log"])
         robot = await self._rest_client.get_robot(self._robot_id)
@@ -47,16 +89,44 @@ class Bot:
         )
 
         exchange_code = robot["exchange"]["code"]
-        exchange_cls = exchange_factory(exchange_code)
+        exchange_cls = exchange_factory(
+            exchange_code, native=self._config.get("nativeExchange", False)
+        )
         if exchange_cls is None:
             raise UnsupportedExchange(
                 "Unsupported exchange: {}".format(robot["exchange"]["name"])
             )
-        exchange = exchange_cls()
+        breaker = CircuitBreaker.from_config(
+            exchange_code,
+            self._config.get("circuitBreaker"),
+            prefix="" if self._standalone else "robot{}_".format(self._robot_id),
+        )
+        self._breaker = breaker
+        paper = self._config.get("paperTrading")
+        if paper:
+            # Live market data, orders simulated locally
+            market = shared_market(
+                exchange_cls, robot["market_type"], test_net=robot["test_net"]
+            )
+            adapter = PaperExchange.from_config(
+                market, paper if isinstance(paper, dict) else None
+            )
+            logger.info("Paper trading on %s", market.exchange.name)
+            # Every paper robot has its own balance
+            account = "paper:{}".format(self._robot_id)
+        else:
+            adapter = exchange_cls()
+            account = account_key(exchange_code, credential_key)
+        exchange = RetryingExchange(
+            adapter,
+            RetryPolicy.from_config(self._config.get("retry")),
+            breaker=breaker,
+        )
         exchange.set_market_type(market_type=robot["market_type"])
         if robot["test_net"]:
             exchange.use_test_net()
         exchange.auth(credential_key=credential_key)
+        self._exchange = exchange
         await exchange.prepare()
 
         pair = robot["pair"]
@@ -67,6 +137,7 @@ class Bot:
             "price_precision": exchange.price_precision(pair),
             "price_tick": exchange.price_ticker(pair),
             "qty_precision": exchange.qty_precision(pair),
+            "client_order_prefix": "nb{}".format(self._robot_id),
         }
         trading_context_msg = (
             "Current trading context {pair: %s, target_currency: %s, market_type: %s, "
@@ -82,107 +153,133 @@ class Bot:
         )
         logger.info(trading_context_msg)
         await self._ws_client.robot_log(trading_context_msg)
-        self._strategy = Strategy(exchange)
+        self._strategy = Strategy(
+            exchange,
+            indicator_service=default_service,
+            market_data=default_hub,
+            circuit_breaker=breaker,
+            risk=default_engine.attach(self._robot_id, account),
+        )
         self._strategy.set_trading_context(trading_context)
 
-        asyncio.get_event_loop().create_task(self.ping_task())
-        asyncio.get_event_loop().create_task(self.feedback_task())
-        asyncio.get_event_loop().create_task(self.log_task())
-        asyncio.get_event_loop().create_task(self.report())
+        supervisor = self._supervisor
+        supervisor.add("ping", self.ping, interval=5, timeout=10)
+        supervisor.add("feedback", self.feedback, interval=5, timeout=20)
+        supervisor.add("report", self.report, interval=30, timeout=20)
+        supervisor.add("log", self.send_log)
 
-    async def ping_task(self):
-        while True:
-            await asyncio.sleep(5)
-            try:
-                await self._rest_client.ping_robot(self._robot_id)
-                # await self._ws_client.robot_log("ping")
-            except Exception as exc:
-                logger.exception(exc)
+    async def ping(self):
+        await self._rest_client.ping_robot(self._robot_id)
 
-    async def log_task(self):
-        while True:
-            try:
-                msg = await self._strategy.log_queue.get()
-                await self._ws_client.robot_log(text=msg)
-            except Exception as exc:
-                logger.exception(exc)
+    async def send_log(self):
+        msg = await self._strategy.log_queue.get()
+        # Only the send is bounded, waiting for a message is not
+        await asyncio.wait_for(self._ws_client.robot_log(text=msg), 10)
 
-    async def feedback_task(self):
-        while True:
-            await asyncio.sleep(5)
-            try:
-                data = {"total_balance": self._strategy.balance}
-                await self._rest_client.update_robot_asset_record(
-                    self._robot_id, data=data
-                )
-                # print('self._strategy.position', self._strategy.position)
-                if self._strategy.position["side"] != 0:
-                    data = [
-                        {
-                            "side": self._strategy.position["side"],
-                            "qty": self._strategy.position["qty"],
-                            "avgPrice": self._strategy.position["avg_price"],
-                            "liqPrice": self._strategy.position["liq_price"],
-                            "unrealizedPnl": self._strategy.position["unrealized_pnl"],
-                        }
-                    ]
-                    await self._rest_client.update_robot_position_store(
-                        self._robot_id,
-                        data=data,
-                    )
-                    await self._ws_client.robot_position_store(positions=data)
-                else:
-                    await self._rest_client.update_robot_position_store(
-                        self._robot_id,
-                        data=[],
-                    )
-                    await self._ws_client.robot_position_store(positions=[])
-            except Exception as exc:
-                logger.exception(exc)
+    async def feedback(self):
+        data = {"total_balance": self._strategy.balance}
+        await self._rest_client.update_robot_asset_record(self._robot_id, data=data)
+        # print('self._strategy.position', self._strategy.position)
+        if self._strategy.position.side != 0:
+            data = [
+                {
+                    "side": self._strategy.position.side,
+                    "qty": self._strategy.position.qty,
+                    "avgPrice": self._strategy.position.avg_price,
+                    "liqPrice": self._strategy.position.liq_price,
+                    "unrealizedPnl": self._strategy.position.unrealized_pnl,
+                }
+            ]
+            await self._rest_client.update_robot_position_store(
+                self._robot_id,
+                data=data,
+            )
+            await self._ws_client.robot_position_store(positions=data)
+        else:
+            await self._rest_client.update_robot_position_store(
+                self._robot_id,
+                data=[],
+            )
+            await self._ws_client.robot_position_store(positions=[])
 
     async def report(self):
-        while True:
-            await asyncio.sleep(30)
-            try:
-                basic_msg = "总况 <pair: {}, target_currency: {}>".format(
-                    self._strategy.pair,
-                    self._strategy.trading_context["target_currency"],
-                )
-                logger.info(basic_msg)
-                await self._ws_client.robot_log(basic_msg)
+        if self._strategy.degraded:
+            # Balance and store are stale while the exchange is degraded
+            logger.info("Exchange degraded, skipping report")
+            return
 
-                position_msg = "当前持仓情况：{}@{}，强平价格：{}".format(
-                    self._strategy.position["side"] * self._strategy.position["qty"],
-                    self._strategy.position["avg_price"],
-                    self._strategy.position["liq_price"],
-                )
-                logger.info(position_msg)
-                await self._ws_client.robot_log(position_msg)
+        basic_msg = "总况 <pair: {}, target_currency: {}>".format(
+            self._strategy.pair,
+            self._strategy.trading_context["target_currency"],
+        )
+        logger.info(basic_msg)
+        await self._ws_client.robot_log(basic_msg)
 
-                store_msg = "Store：{}".format(self._strategy.store)
-                logger.info(store_msg)
-                await self._ws_client.robot_log(store_msg)
-            except Exception as exc:
-                logger.exception(exc)
+        position_msg = "当前持仓情况：{}@{}，强平价格：{}".format(
+            self._strategy.position.side * self._strategy.position.qty,
+            self._strategy.position.avg_price,
+            self._strategy.position.liq_price,
+        )
+        logger.info(position_msg)
+        await self._ws_client.robot_log(position_msg)
+
+        store_msg = "Store：{}".format(self._strategy.store)
+        logger.info(store_msg)
+        await self._ws_client.robot_log(store_msg)
+
+        logger.info("Metrics: %s", registry.snapshot())
+
+    def request_stop(self, signum: Optional[int] = None) -> None:
+        if not self._stopping.is_set():
+            logger.info("Received signal %s, stopping robot...", signum)
+        self._stopping.set()
+
+    async def _wait(self, aw, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for ``aw`` (or ``timeout`` seconds if ``aw`` is None) unless a
+        stop is requested first, in which case ``aw`` is cancelled. Returns
+        False if stopped.
+        """
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        waiting = asyncio.ensure_future(
+            aw if aw is not None else asyncio.sleep(timeout)
+        )
+        try:
+            await asyncio.wait([stopping, waiting], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for future in (stopping, waiting):
+                if not future.done():
+                    future.cancel()
+        if waiting.done() and not waiting.cancelled():
+            # Propagate the exceptions of ``aw``
+            waiting.result()
+        return not self._stopping.is_set()
 
     async def start(self):
-        await self._prepare()
-        logger.info("Robot is ready to start")
-        await self._ws_client.robot_log("机器人正在启动...")
-        while True:
+        try:
+            await self._prepare()
+            logger.info("Robot is ready to start")
+            await self._ws_client.robot_log("机器人正在启动...")
+            await self._trade()
+        finally:
+            await self.shutdown()
+
+    async def _trade(self):
+        while not self._stopping.is_set():
             try:
                 robot = await self._rest_client.get_robot(self._robot_id)
                 if not robot["enabled"]:
                     logger.info("Robot it not enabled")
                     await self._ws_client.robot_log("未开启机器人...")
-                    await asyncio.sleep(10)
+                    await self._wait(None, 10)
                     continue
 
                 parameters = await self._rest_client.get_robot_strategy_parameters(
                     self._robot_id
                 )
                 self._strategy.parameters = parameters
-                await self._strategy.trade_once()
+                if not await self._wait(self._strategy.trade_once()):
+                    break
             except InvalidParameter as exc:
                 logger.error(exc)
             except ExchangeException as exc:
@@ -192,10 +289,6 @@ class Bot:
             except ImproperConfig as exc:
                 logger.exception(exc)
                 break
-            except KeyboardInterrupt:
-                logger.info("Ctrl + c pressed, stop trading...")
-                await self._strategy.ensure_order()
-                break
             except Exception as exc:
                 logger.exception(
                     "Unexpected exception (%s) occurred, stop trading...",
@@ -208,20 +301,92 @@ class Bot:
                 await self._strategy.ensure_order()
                 # break
 
-            await asyncio.sleep(10)
+            await self._wait(None, 10)
+
+    async def shutdown(self):
+        """
+        Leave the position protected, flush what the server should know and
+        release every connection. Each step is bounded by shutdownTimeout.
+        """
+        timeout = self._shutdown_timeout
+        self._stopping.set()
+        await self._supervisor.stop(timeout, names=["ping", "feedback", "report"])
+
+        strategy = self._strategy
+        if strategy is not None:
+            logger.info("Checking TP/SL orders before exit...")
+            await run_bounded(
+                [("orders", strategy.ensure_order), ("feedback", self.feedback)],
+                timeout,
+            )
+            # Stopped last, so the shutdown messages above reach the server
+            await self._supervisor.stop(timeout)
+            await drain_queue(
+                strategy.log_queue,
+                lambda msg: self._ws_client.robot_log(text=msg),
+                timeout,
+            )
+            strategy.close()
+
+        await self._supervisor.stop(timeout)
+        closers = []
+        if self._standalone:
+            closers.append(("market data", default_hub.close))
+            closers.append(("loop monitor", self._loop_monitor.stop))
+            closers.append(("indicators", default_service.close))
+        if self._exchange is not None:
+            closers.append(("exchange", self._exchange.close))
+        await run_bounded(closers, timeout)
+        if self._breaker is not None:
+            self._breaker.close()
+        logger.info("Robot stopped")
 
     def run(self):
         logger.info("Starting robot...")
         loop = asyncio.get_event_loop()
         loop.set_debug(enabled=False)
+        install_signal_handlers(loop, self.request_stop)
         # note: asyncio.run doesn't work? why?
-        loop.run_until_complete(self.start())
-        loop.stop()
+        try:
+            loop.run_until_complete(self.start())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+
+def robot_account(config, robot_id) -> str:
+    """
+    Account of a robot for the risk engine, also its shard key: the robots of
+    an account run on the same worker so that account limits see all of them.
+    """
+    if config.get("paperTrading"):
+        return "paper:{}".format(robot_id)
+
+    async def fetch():
+        client = RESTAPIClient(
+            base_url=config["restApiBaseUrl"], api_key=config["apiKey"]
+        )
+        robot = await client.get_robot(robot_id)
+        credential_key = await client.get_robot_credential_key(robot_id)
+        return account_key(robot["exchange"]["code"], credential_key)
+
+    return asyncio.run(fetch())
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run dynamic grid robot.")
     parser.add_argument("--config-file", default="config.json")
+    parser.add_argument(
+        "--event-loop",
+        choices=EVENT_LOOPS,
+        help="Event loop implementation, overrides eventLoop of the config.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Run the robots of robotIds on this many processes (0: one per core), "
+        "overrides workers of the config.",
+    )
 
     # load settings
     args = parser.parse_args()
@@ -234,8 +399,30 @@ if __name__ == "__main__":
     text = config_file.read_text(encoding="utf-8")
     bot_config = json.loads(text)
 
-    config_logging()
+    log_listener = config_logging(bot_config.get("logging"))
+    workers = args.workers if args.workers is not None else bot_config.get("workers")
+    if workers is not None:
+        # Workers pick their own event loop and send their logs here
+        shards = ShardSupervisor(
+            bot_config,
+            "main:Bot",
+            workers=workers or None,
+            shard_key=functools.partial(robot_account, bot_config),
+        )
+        try:
+            shards.run(lambda: json.loads(config_file.read_text(encoding="utf-8")))
+        finally:
+            log_listener.stop()
+        sys.exit(0)
+
+    event_loop = use_event_loop(
+        args.event_loop or bot_config.get("eventLoop", "asyncio")
+    )
+    logger.info("Using %s event loop", event_loop)
 
     # start bot
     bot = Bot(config=bot_config)
-    bot.run()
+    try:
+        bot.run()
+    finally:
+        log_listener.stop()